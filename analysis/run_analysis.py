@@ -114,7 +114,7 @@ class VarianceAnalyzer:
             return list(result)
     
     def get_top_variance_orders(self, limit=10):
-        """차이가 큰 TOP 생산오더"""
+        """차이가 큰 TOP 생산오더 (합계는 HAS_VARIANCE에서 직접 집계 - 롤업 이후 바뀐 차이도 반영)"""
         with self.driver.session() as session:
             result = session.run("""
                 MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
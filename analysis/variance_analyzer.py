@@ -98,10 +98,21 @@ class VarianceAnalyzer:
         """
         return self.run_query(query)
     
-    def get_monthly_variance_trend(self):
-        """월별 차이 트렌드"""
+    def get_monthly_variance_trend(self, month=None):
+        """월별 차이 트렌드 (주문일 order_date 월 기준, month='YYYY-MM' 지정 시 해당 월만)
+
+        월 필터는 po_order_date 인덱스 범위 조회로 처리한다.
+        (po.month는 완료일 finish_date 기준이므로 이 보고서에는 사용하지 않음)
+        """
         query = """
         MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
+        """
+        if month:
+            query += """
+        WHERE po.order_date >= date($month + '-01')
+          AND po.order_date < date($month + '-01') + duration({months: 1})
+        """
+        query += """
         WITH date.truncate('month', po.order_date) as month,
              v.cost_element as cost_element,
              SUM(v.variance_amount) as total_variance,
@@ -113,7 +124,7 @@ class VarianceAnalyzer:
             variance_count
         ORDER BY month, cost_element
         """
-        return self.run_query(query)
+        return self.run_query(query, {'month': month})
     
     # ============================================================
     # 2. 원인 분석
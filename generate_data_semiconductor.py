@@ -951,6 +951,7 @@ def main():
     po_neo = orders_df.copy()
     po_neo.rename(columns={'order_no': 'id'}, inplace=True)
     po_neo['yield_rate'] = (po_neo['good_qty'] / po_neo['actual_qty'] * 100).round(2)
+    po_neo['month'] = po_neo['finish_date'].str[:7]  # 월 필터용 인덱스 키 (YYYY-MM)
     po_neo.to_csv(f'{NEO4J_DIR}/production_orders.csv', index=False)
 
     # Variance
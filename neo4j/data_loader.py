@@ -6,6 +6,8 @@ Neo4j 데이터 로더
 
 import os
 import ssl
+import json
+import urllib.request
 import pandas as pd
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
@@ -23,6 +25,11 @@ class Neo4jDataLoader:
         self.database = os.getenv('NEO4J_DATABASE', 'neo4j')
         self.driver = None
         self.data_dir = 'data/neo4j_import'
+        # 모든 세션이 공유 → 마지막 쓰기까지의 인과 북마크를 API 서버에 넘길 수 있다
+        self.bookmark_manager = GraphDatabase.bookmark_manager()
+        # 이번 적재에서 원인 추적 링크를 쓴 증상/요인 id → build_root_cause_closure 증분 대상
+        self.linked_symptom_ids = set()
+        self.linked_factor_ids = set()
         
     def connect(self):
         """Neo4j 데이터베이스에 연결"""
@@ -49,6 +56,51 @@ class Neo4jDataLoader:
             print(f"[X] Neo4j 연결 실패: {str(e)}")
             return False
     
+    def _session(self):
+        return self.driver.session(database=self.database, bookmark_manager=self.bookmark_manager)
+    
+    def write_data_version(self):
+        """공유 데이터 버전 마커 갱신 (모든 적재 쓰기 후)
+
+        API 워커마다 캐시를 따로 가지므로 flush POST는 한 워커에만 닿는다.
+        각 워커가 DATA_VERSION_CHECK_INTERVAL마다 이 마커를 읽어 버전이 바뀌면 캐시를 비우고
+        여기 저장된 북마크를 등록한다.
+        """
+        bookmarks = sorted(self.bookmark_manager.get_bookmarks().raw_values)
+        with self._session() as session:
+            result = session.run("""
+                MERGE (m:DataVersion {id: 'current'})
+                SET m.version = randomUUID(),
+                    m.updated_at = datetime(),
+                    m.bookmarks = $bookmarks
+                RETURN m.version as version
+            """, bookmarks=bookmarks)
+            print(f"\n[OK] 데이터 버전 마커 갱신: {result.single()['version']}")
+    
+    def notify_api(self):
+        """API 서버 캐시 비우기 + 쓰기 북마크 전달 (GRAPH_API_URL 설정 시)
+        
+        API의 읽기 세션은 이 북마크 이후 상태가 반영된 복제본에서만 실행된다.
+        """
+        api_url = os.getenv('GRAPH_API_URL')
+        bookmarks = sorted(self.bookmark_manager.get_bookmarks().raw_values)
+        if not api_url:
+            print("\n[i] GRAPH_API_URL 미설정 - API 서버 캐시 비우기를 건너뜁니다.")
+            return False
+        request = urllib.request.Request(
+            api_url.rstrip('/') + '/api/admin/cache/flush',
+            data=json.dumps({'bookmarks': bookmarks}).encode('utf-8'),
+            headers={'Content-Type': 'application/json', 'X-Admin-Token': os.getenv('ADMIN_TOKEN', '')},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                print(f"[OK] API 서버 캐시 비우기 완료 (북마크 {len(bookmarks)}개 전달): {response.read().decode('utf-8')}")
+            return True
+        except Exception as e:
+            print(f"[!] API 서버 알림 실패: {e}")
+            return False
+    
     def close(self):
         """연결 종료"""
         if self.driver:
@@ -58,7 +110,7 @@ class Neo4jDataLoader:
     def clear_database(self):
         """데이터베이스 초기화 (주의!)"""
         print("\n[!]  데이터베이스 초기화 중...")
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             # 모든 노드와 관계 삭제
             session.run("MATCH (n) DETACH DELETE n")
         print("[OK] 데이터베이스 초기화 완료")
@@ -67,7 +119,7 @@ class Neo4jDataLoader:
         """스키마 (제약조건, 인덱스) 생성"""
         print("\n[1단계] 스키마 생성")
         
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             # 제약조건
             constraints = [
                 "CREATE CONSTRAINT product_id IF NOT EXISTS FOR (p:Product) REQUIRE p.id IS UNIQUE",
@@ -99,9 +151,18 @@ class Neo4jDataLoader:
                 "CREATE INDEX material_type IF NOT EXISTS FOR (m:Material) ON (m.type)",
                 "CREATE INDEX workcenter_process IF NOT EXISTS FOR (wc:WorkCenter) ON (wc.process_type)",
                 "CREATE INDEX po_order_date IF NOT EXISTS FOR (po:ProductionOrder) ON (po.order_date)",
+                "CREATE INDEX po_month IF NOT EXISTS FOR (po:ProductionOrder) ON (po.month)",
                 "CREATE INDEX variance_element IF NOT EXISTS FOR (v:Variance) ON (v.cost_element)",
                 "CREATE INDEX variance_type IF NOT EXISTS FOR (v:Variance) ON (v.variance_type)",
-                "CREATE INDEX variance_severity IF NOT EXISTS FOR (v:Variance) ON (v.severity)"
+                "CREATE INDEX variance_severity IF NOT EXISTS FOR (v:Variance) ON (v.severity)",
+                # 월별 차이 롤업 (build_variance_rollups)
+                "CREATE INDEX rollup_product IF NOT EXISTS FOR (r:VarianceRollup) ON (r.product_cd)",
+                "CREATE INDEX rollup_workcenter IF NOT EXISTS FOR (r:VarianceRollup) ON (r.work_center)",
+                "CREATE INDEX rollup_month IF NOT EXISTS FOR (r:VarianceRollup) ON (r.month)",
+                "CREATE INDEX rollup_element IF NOT EXISTS FOR (r:VarianceRollup) ON (r.cost_element)",
+                "CREATE INDEX rollup_type IF NOT EXISTS FOR (r:VarianceRollup) ON (r.variance_type)",
+                "CREATE INDEX po_abs_total_variance IF NOT EXISTS FOR (po:ProductionOrder) ON (po.abs_total_variance)",
+                "CREATE INDEX variance_abs_amount IF NOT EXISTS FOR (v:Variance) ON (v.abs_variance_amount)"
             ]
             
             for index in indexes:
@@ -125,7 +186,7 @@ class Neo4jDataLoader:
         
         df = pd.read_csv(csv_file)
         
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             for _, row in tqdm(df.iterrows(), total=len(df), desc="  Products"):
                 # 배터리 데이터 구조 확인
                 params = {
@@ -157,7 +218,7 @@ class Neo4jDataLoader:
         
         df = pd.read_csv(csv_file)
         
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             for _, row in tqdm(df.iterrows(), total=len(df), desc="  Materials"):
                 params = {
                     'id': row['id'],
@@ -188,7 +249,7 @@ class Neo4jDataLoader:
         
         df = pd.read_csv(csv_file)
         
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             for _, row in tqdm(df.iterrows(), total=len(df), desc="  WorkCenters"):
                 params = {
                     'id': row['id'],
@@ -219,8 +280,12 @@ class Neo4jDataLoader:
         
         df = pd.read_csv(csv_file)
         
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             for _, row in tqdm(df.iterrows(), total=len(df), desc="  ProductionOrders"):
+                params = dict(row)
+                # 월 필터용 키 (YYYY-MM) - 구버전 CSV는 finish_date에서 계산
+                if 'month' not in params or pd.isna(params['month']):
+                    params['month'] = str(row['finish_date'])[:7]
                 session.run("""
                     CREATE (po:ProductionOrder {
                         id: $id,
@@ -234,9 +299,10 @@ class Neo4jDataLoader:
                         start_date: date($start_date),
                         finish_date: date($finish_date),
                         status: $status,
-                        yield_rate: $yield_rate
+                        yield_rate: $yield_rate,
+                        month: $month
                     })
-                """, dict(row))
+                """, params)
         
         print(f"  [OK] ProductionOrder 노드: {len(df)}개")
     
@@ -249,7 +315,7 @@ class Neo4jDataLoader:
         
         df = pd.read_csv(csv_file)
         
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             for _, row in tqdm(df.iterrows(), total=len(df), desc="  Variances"):
                 params = {
                     'id': row['id'],
@@ -282,7 +348,7 @@ class Neo4jDataLoader:
         
         df = pd.read_csv(csv_file)
         
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             for _, row in tqdm(df.iterrows(), total=len(df), desc="  Causes"):
                 params = {
                     'code': row['code'],
@@ -312,7 +378,7 @@ class Neo4jDataLoader:
 
         df = pd.read_csv(csv_file)
 
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             for _, row in tqdm(df.iterrows(), total=len(df), desc="  CostPools"):
                 params = dict(row)
                 session.run("""
@@ -331,7 +397,7 @@ class Neo4jDataLoader:
 
         df = pd.read_csv(csv_file)
 
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             for _, row in tqdm(df.iterrows(), total=len(df), desc="  MonthlyStates"):
                 params = dict(row)
                 session.run("""
@@ -350,7 +416,7 @@ class Neo4jDataLoader:
 
         df = pd.read_csv(csv_file)
 
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             for _, row in tqdm(df.iterrows(), total=len(df), desc="  Symptoms"):
                 params = dict(row)
                 session.run("""
@@ -369,7 +435,7 @@ class Neo4jDataLoader:
 
         df = pd.read_csv(csv_file)
 
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             for _, row in tqdm(df.iterrows(), total=len(df), desc="  Factors"):
                 params = dict(row)
                 session.run("""
@@ -388,7 +454,7 @@ class Neo4jDataLoader:
         
         df = pd.read_csv(csv_file)
         
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             for _, row in tqdm(df.iterrows(), total=len(df), desc="  QualityDefects"):
                 params = dict(row)
                 session.run("""
@@ -407,7 +473,7 @@ class Neo4jDataLoader:
         
         df = pd.read_csv(csv_file)
         
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             for _, row in tqdm(df.iterrows(), total=len(df), desc="  EquipmentFailures"):
                 params = dict(row)
                 session.run("""
@@ -426,7 +492,7 @@ class Neo4jDataLoader:
         
         df = pd.read_csv(csv_file)
         
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             for _, row in tqdm(df.iterrows(), total=len(df), desc="  MaterialMarkets"):
                 params = dict(row)
                 session.run("""
@@ -444,7 +510,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_uses_material.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  USES_MATERIAL"):
                     session.run("""
                         MATCH (p:Product {id: $from})
@@ -460,7 +526,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_produces.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  PRODUCES"):
                     session.run("""
                         MATCH (po:ProductionOrder {id: $from})
@@ -473,7 +539,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_has_variance.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  HAS_VARIANCE"):
                     session.run("""
                         MATCH (po:ProductionOrder {id: $from})
@@ -486,7 +552,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_caused_by.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  CAUSED_BY"):
                     session.run("""
                         MATCH (v:Variance {id: $from})
@@ -499,7 +565,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_consumes.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  CONSUMES"):
                     params = {
                         'from': row['from'],
@@ -532,7 +598,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_works_at.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  WORKS_AT"):
                     params = {
                         'from': row['from'],
@@ -573,7 +639,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_has_defect.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  HAS_DEFECT"):
                     session.run("""
                         MATCH (c:Cause {code: $from})
@@ -586,7 +652,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_has_failure.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  HAS_FAILURE"):
                     session.run("""
                         MATCH (c:Cause {code: $from})
@@ -599,7 +665,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_market_price.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  MARKET_PRICE"):
                     session.run("""
                         MATCH (m:Material {id: $from})
@@ -614,7 +680,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_incurred_cost.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  INCURRED_COST"):
                     session.run("""
                         MATCH (wc:WorkCenter {id: $from})
@@ -627,7 +693,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_allocates.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  ALLOCATES"):
                     session.run("""
                         MATCH (cp:CostPool {id: $from})
@@ -643,7 +709,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_has_monthly_state.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  HAS_MONTHLY_STATE"):
                     session.run("""
                         MATCH (p:Product {id: $from})
@@ -656,7 +722,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_next_month.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  NEXT_MONTH"):
                     session.run("""
                         MATCH (ms1:MonthlyProductState {id: $from})
@@ -669,39 +735,43 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_linked_to_symptom.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  LINKED_TO_SYMPTOM"):
                     session.run("""
                         MATCH (v:Variance {id: $from})
                         MATCH (s:Symptom {id: $to})
                         CREATE (v)-[:LINKED_TO_SYMPTOM]->(s)
                     """, dict(row))
+                    self.linked_symptom_ids.add(row['to'])
             print(f"  [OK] LINKED_TO_SYMPTOM: {len(df)}개")
 
         # CAUSED_BY_FACTOR (Symptom -> Factor)
         csv_file = f'{self.data_dir}/rel_caused_by_factor.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  CAUSED_BY_FACTOR"):
                     session.run("""
                         MATCH (s:Symptom {id: $from})
                         MATCH (f:Factor {id: $to})
                         CREATE (s)-[:CAUSED_BY_FACTOR]->(f)
                     """, dict(row))
+                    self.linked_symptom_ids.add(row['from'])
+                    self.linked_factor_ids.add(row['to'])
             print(f"  [OK] CAUSED_BY_FACTOR: {len(df)}개")
 
         # TRACED_TO_ROOT (Factor -> Cause)
         csv_file = f'{self.data_dir}/rel_traced_to_root.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  TRACED_TO_ROOT"):
                     session.run("""
                         MATCH (f:Factor {id: $from})
                         MATCH (c:Cause {code: $to})
                         CREATE (f)-[:TRACED_TO_ROOT]->(c)
                     """, dict(row))
+                    self.linked_factor_ids.add(row['from'])
             print(f"  [OK] TRACED_TO_ROOT: {len(df)}개")
 
         # === "Spider Legs" Relationships for Variance ===
@@ -710,7 +780,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_variance_material.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  RELATED_TO_MATERIAL (Direct)"):
                     session.run("""
                         MATCH (v:Variance {id: $from})
@@ -723,7 +793,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_variance_workcenter.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  OCCURRED_AT"):
                     session.run("""
                         MATCH (v:Variance {id: $from})
@@ -736,7 +806,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_variance_defect.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  HAS_DEFECT (Direct)"):
                     session.run("""
                         MATCH (v:Variance {id: $from})
@@ -749,7 +819,7 @@ class Neo4jDataLoader:
         csv_file = f'{self.data_dir}/rel_variance_failure.csv'
         if os.path.exists(csv_file):
             df = pd.read_csv(csv_file)
-            with self.driver.session(database=self.database) as session:
+            with self._session() as session:
                 for _, row in tqdm(df.iterrows(), total=len(df), desc="  HAS_FAILURE (Direct)"):
                     session.run("""
                         MATCH (v:Variance {id: $from})
@@ -762,7 +832,7 @@ class Neo4jDataLoader:
         """추가 관계 생성 (분석 최적화용)"""
         print("\n[4단계] 추가 관계 생성")
         
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             # NEXT_ORDER: 시계열 순서 관계
             print("  - NEXT_ORDER 관계 생성 중...")
             result = session.run("""
@@ -789,11 +859,160 @@ class Neo4jDataLoader:
             count = result.single()['count']
             print(f"  [OK] SAME_PRODUCT: {count}개")
     
+    def build_variance_rollups(self):
+        """월별 원가차이 롤업 노드 생성 (대시보드/비교 집계용)
+        
+        키: (product_cd, work_center, month, cost_element, variance_type)
+        work_center = '' 행은 공정 구분 없는 전체 합계 (오더당 1회 집계),
+        공정별 행은 해당 공정에서 작업한 오더의 차이 합계.
+        오더별 합계는 ProductionOrder.total_variance / abs_total_variance 에,
+        Variance별 |차이금액|은 Variance.abs_variance_amount 에 저장 (상위 N개를 인덱스 순서로 조회).
+        """
+        print("\n[5단계] 월별 차이 롤업 생성")
+        
+        with self._session() as session:
+            # month 키가 없는 기존 오더 보정
+            session.run("""
+                MATCH (po:ProductionOrder)
+                WHERE po.month IS NULL AND po.finish_date IS NOT NULL
+                SET po.month = substring(toString(po.finish_date), 0, 7)
+            """)
+            
+            # 기존 롤업 제거 후 재생성
+            session.run("MATCH (r:VarianceRollup) DETACH DELETE r")
+            
+            print("  - 전체 공정 롤업 생성 중...")
+            result = session.run("""
+                MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
+                WITH po.product_cd as product_cd,
+                     po.month as month,
+                     v.cost_element as cost_element,
+                     v.variance_type as variance_type,
+                     SUM(v.variance_amount) as amount,
+                     COUNT(v) as cnt
+                CREATE (:VarianceRollup {
+                    product_cd: product_cd,
+                    work_center: '',
+                    month: month,
+                    cost_element: cost_element,
+                    variance_type: variance_type,
+                    amount: amount,
+                    count: cnt
+                })
+                RETURN COUNT(*) as count
+            """)
+            print(f"  [OK] VarianceRollup (전체): {result.single()['count']}개")
+            
+            print("  - 공정별 롤업 생성 중...")
+            result = session.run("""
+                MATCH (po:ProductionOrder)-[:WORKS_AT]->(wc:WorkCenter)
+                WITH DISTINCT po, wc
+                MATCH (po)-[:HAS_VARIANCE]->(v:Variance)
+                WITH po.product_cd as product_cd,
+                     wc.id as work_center,
+                     po.month as month,
+                     v.cost_element as cost_element,
+                     v.variance_type as variance_type,
+                     SUM(v.variance_amount) as amount,
+                     COUNT(v) as cnt
+                CREATE (:VarianceRollup {
+                    product_cd: product_cd,
+                    work_center: work_center,
+                    month: month,
+                    cost_element: cost_element,
+                    variance_type: variance_type,
+                    amount: amount,
+                    count: cnt
+                })
+                RETURN COUNT(*) as count
+            """)
+            print(f"  [OK] VarianceRollup (공정별): {result.single()['count']}개")
+            
+            print("  - 오더별 차이 합계 저장 중...")
+            result = session.run("""
+                MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
+                WITH po, SUM(v.variance_amount) as total
+                SET po.total_variance = total,
+                    po.abs_total_variance = abs(total)
+                RETURN COUNT(po) as count
+            """)
+            print(f"  [OK] ProductionOrder 차이 합계: {result.single()['count']}개")
+            
+            result = session.run("""
+                MATCH (v:Variance)
+                WHERE v.variance_amount IS NOT NULL
+                SET v.abs_variance_amount = abs(v.variance_amount)
+                RETURN COUNT(v) as count
+            """)
+            print(f"  [OK] Variance 차이 절대값: {result.single()['count']}개")
+    
+    def build_root_cause_closure(self, symptom_ids=None, factor_ids=None):
+        """원인 추적 closure - Variance-[:ROOT_CAUSE]->Cause 직접 관계 생성
+
+        Variance→Symptom→Factor→Cause 경로를 (Variance, Cause) 쌍으로 묶어 한 관계에 저장한다.
+            path_count   경로 수
+            weight       해당 Variance의 전체 원인 경로 중 이 원인의 비율 (0~1)
+            amount       weight × variance_amount (원인별 기여 금액)
+            symptom_ids / factor_ids   경로별 중간 노드 id (같은 위치끼리 한 경로)
+        API의 원인 추적(/api/analysis/root-cause)은 4홉 경로 대신 이 관계 한 홉만 읽는다.
+
+        symptom_ids / factor_ids를 주면 해당 증상/요인 링크가 바뀐 Variance만 다시 계산한다
+        (load_all은 초기화 없이 적재할 때 load_relationships가 모은 linked_symptom_ids /
+        linked_factor_ids로 호출하고 notify_api()로 API 캐시를 비운다). 없으면 전체 재생성.
+        """
+        print("\n[6단계] 원인 추적 closure 생성")
+        
+        with self._session() as session:
+            variance_ids = None
+            if symptom_ids is not None or factor_ids is not None:
+                # 현재 링크로 닿는 Variance + 기존 closure가 바뀐 증상/요인을 거치던 Variance
+                result = session.run("""
+                    CALL {
+                        MATCH (v:Variance)-[:LINKED_TO_SYMPTOM]->(s:Symptom)
+                        WHERE s.id IN $symptom_ids
+                           OR EXISTS { MATCH (s)-[:CAUSED_BY_FACTOR]->(f:Factor) WHERE f.id IN $factor_ids }
+                        RETURN v.id as variance_id
+                        UNION
+                        MATCH (v:Variance)-[rc:ROOT_CAUSE]->(:Cause)
+                        WHERE any(x IN rc.symptom_ids WHERE x IN $symptom_ids)
+                           OR any(x IN rc.factor_ids WHERE x IN $factor_ids)
+                        RETURN v.id as variance_id
+                    }
+                    RETURN collect(DISTINCT variance_id) as variance_ids
+                """, symptom_ids=list(symptom_ids or []), factor_ids=list(factor_ids or []))
+                variance_ids = result.single()['variance_ids']
+                print(f"  - 링크 변경 영향 Variance: {len(variance_ids)}개")
+            
+            session.run("""
+                MATCH (v:Variance)-[rc:ROOT_CAUSE]->(:Cause)
+                WHERE $variance_ids IS NULL OR v.id IN $variance_ids
+                DELETE rc
+            """, variance_ids=variance_ids)
+            
+            result = session.run("""
+                MATCH (v:Variance)-[:LINKED_TO_SYMPTOM]->(s:Symptom)-[:CAUSED_BY_FACTOR]->(f:Factor)-[:TRACED_TO_ROOT]->(c:Cause)
+                WHERE $variance_ids IS NULL OR v.id IN $variance_ids
+                WITH v, c, collect(s.id) as symptom_ids, collect(f.id) as factor_ids
+                WITH v, collect({cause: c, symptom_ids: symptom_ids, factor_ids: factor_ids}) as causes,
+                     sum(size(symptom_ids)) as total_paths
+                UNWIND causes as item
+                WITH v, item.cause as c, item, size(item.symptom_ids) as path_count, total_paths
+                CREATE (v)-[:ROOT_CAUSE {
+                    path_count: path_count,
+                    weight: toFloat(path_count) / total_paths,
+                    amount: coalesce(v.variance_amount, 0) * toFloat(path_count) / total_paths,
+                    symptom_ids: item.symptom_ids,
+                    factor_ids: item.factor_ids
+                }]->(c)
+                RETURN COUNT(*) as count
+            """, variance_ids=variance_ids)
+            print(f"  [OK] ROOT_CAUSE: {result.single()['count']}개")
+    
     def verify_data(self):
         """데이터 로드 검증"""
-        print("\n[5단계] 데이터 검증")
+        print("\n[7단계] 데이터 검증")
         
-        with self.driver.session(database=self.database) as session:
+        with self._session() as session:
             # 노드 개수 확인
             result = session.run("""
                 MATCH (n)
@@ -866,9 +1085,22 @@ class Neo4jDataLoader:
             # 추가 관계 생성
             self.create_additional_relationships()
             
+            # 집계 롤업 생성
+            self.build_variance_rollups()
+            
+            # 원인 추적 closure 생성 (초기화 적재는 전체, 추가 적재는 이번에 링크를 쓴 증상/요인만)
+            if clear_first:
+                self.build_root_cause_closure()
+            else:
+                self.build_root_cause_closure(self.linked_symptom_ids, self.linked_factor_ids)
+            
             # 검증
             self.verify_data()
             
+            # 모든 API 워커가 따라오는 데이터 버전 마커 + 요청 받은 워커 즉시 비우기
+            self.write_data_version()
+            self.notify_api()
+            
             print("\n" + "=" * 60)
             print("데이터 로드 완료!")
             print("=" * 60)
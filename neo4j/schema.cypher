@@ -24,10 +24,20 @@ CREATE INDEX product_type IF NOT EXISTS FOR (p:Product) ON (p.type);
 CREATE INDEX material_type IF NOT EXISTS FOR (m:Material) ON (m.type);
 CREATE INDEX workcenter_process IF NOT EXISTS FOR (wc:WorkCenter) ON (wc.process_type);
 CREATE INDEX po_order_date IF NOT EXISTS FOR (po:ProductionOrder) ON (po.order_date);
+CREATE INDEX po_month IF NOT EXISTS FOR (po:ProductionOrder) ON (po.month);
 CREATE INDEX variance_element IF NOT EXISTS FOR (v:Variance) ON (v.cost_element);
 CREATE INDEX variance_severity IF NOT EXISTS FOR (v:Variance) ON (v.severity);
 CREATE INDEX cause_category IF NOT EXISTS FOR (c:Cause) ON (c.category);
 
+// 월별 차이 롤업 (Neo4jDataLoader.build_variance_rollups)
+CREATE INDEX rollup_product IF NOT EXISTS FOR (r:VarianceRollup) ON (r.product_cd);
+CREATE INDEX rollup_workcenter IF NOT EXISTS FOR (r:VarianceRollup) ON (r.work_center);
+CREATE INDEX rollup_month IF NOT EXISTS FOR (r:VarianceRollup) ON (r.month);
+CREATE INDEX rollup_element IF NOT EXISTS FOR (r:VarianceRollup) ON (r.cost_element);
+CREATE INDEX rollup_type IF NOT EXISTS FOR (r:VarianceRollup) ON (r.variance_type);
+CREATE INDEX po_abs_total_variance IF NOT EXISTS FOR (po:ProductionOrder) ON (po.abs_total_variance);
+CREATE INDEX variance_abs_amount IF NOT EXISTS FOR (v:Variance) ON (v.abs_variance_amount);
+
 -- ============================================================
 -- 3. 풀텍스트 인덱스 (Full-text Indexes) - 이름 검색용
 -- ============================================================
@@ -3,9 +3,22 @@
 # Use PORT environment variable provided by Cloud Run, default to 8080
 PORT="${PORT:-8080}"
 
+# SERVER_MODE=wsgi (default): Flask app on sync gunicorn workers
+# SERVER_MODE=asgi: async graph API (neo4j AsyncGraphDatabase) on uvicorn workers
+#   graph/analysis/dashboard routes run on the async driver; the rest (README_DOCKER.md list,
+#   ?stream=1 requests) stay thread-bound on ASGI_WSGI_THREADS threads with the sync driver
+SERVER_MODE="${SERVER_MODE:-wsgi}"
+
 echo "Starting Services on PORT $PORT..."
 
+# Using --chdir visualization so imports within graph_api_server work
+if [ "$SERVER_MODE" = "asgi" ]; then
+    echo "Starting async graph API (ASGI) on port $PORT..."
+    exec gunicorn --bind "0.0.0.0:$PORT" --chdir visualization \
+        --worker-class uvicorn.workers.UvicornWorker \
+        --workers "${WEB_CONCURRENCY:-1}" --timeout 600 graph_api_asgi:app
+fi
+
 # Start Flask API in foreground (Primary Service for Cloud Run)
 echo "Starting Flask API on port $PORT..."
-# Using --chdir visualization so imports within graph_api_server work
 exec gunicorn --bind "0.0.0.0:$PORT" --chdir visualization --timeout 600 graph_api_server:app
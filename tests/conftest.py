@@ -0,0 +1,18 @@
+"""
+visualization/ 모듈 단위 테스트 공통 설정
+
+API 모듈은 import 시점에 Neo4j 연결과 캐시 예열을 시작하므로,
+.env가 있어도 연결하지 않도록 import 전에 환경 변수를 비워 둔다 (load_dotenv는 기존 값을 덮지 않음).
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'visualization'))
+
+os.environ['NEO4J_URI'] = ''
+os.environ['NEO4J_PASSWORD'] = ''
+os.environ['RESPONSE_CACHE_ENABLED'] = '0'
+os.environ['CACHE_WARMUP_ENABLED'] = '0'
+os.environ['GRAPH_SNAPSHOT_ENABLED'] = '0'
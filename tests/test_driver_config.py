@@ -0,0 +1,134 @@
+"""driver_config - 예열이 연결 N개를 동시에 점유하는지 (명시적 트랜잭션을 모두 열 때까지 유지)"""
+
+import asyncio
+import threading
+
+import driver_config
+from driver_config import async_warm_up, warm_up
+
+
+class _Pool:
+    """열린 트랜잭션 = 점유된 연결 - 동시에 열린 최대 수를 기록"""
+
+    def __init__(self, fail_after=None):
+        self.lock = threading.Lock()
+        self.open = 0
+        self.peak = 0
+        self.opened = 0
+        self.fail_after = fail_after
+
+    def acquire(self):
+        with self.lock:
+            self.opened += 1
+            if self.fail_after is not None and self.opened > self.fail_after:
+                raise RuntimeError('pool exhausted')
+            self.open += 1
+            self.peak = max(self.peak, self.open)
+
+    def release(self):
+        with self.lock:
+            self.open -= 1
+
+
+class _Transaction:
+    def __init__(self, pool):
+        self.pool = pool
+        pool.acquire()
+
+    def run(self, query):
+        assert query == driver_config.WARMUP_QUERY
+        return self
+
+    def consume(self):
+        return None
+
+    def close(self):
+        self.pool.release()
+
+
+class _Session:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def begin_transaction(self):
+        return _Transaction(self.pool)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Driver:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def verify_connectivity(self):
+        return None
+
+    def session(self, **config):
+        return _Session(self.pool)
+
+
+def test_warm_up_holds_all_connections_at_once():
+    pool = _Pool()
+    assert warm_up(_Driver(pool), 6, timeout=5) == 6
+    assert pool.peak == 6
+    assert pool.open == 0
+
+
+def test_warm_up_reports_connections_held_when_some_fail():
+    pool = _Pool(fail_after=3)
+    assert warm_up(_Driver(pool), 5, timeout=5) == 3
+    assert pool.open == 0
+
+
+def test_warm_up_disabled():
+    assert warm_up(_Driver(_Pool()), 0) == 0
+    assert warm_up(None, 4) == 0
+
+
+class _AsyncTransaction(_Transaction):
+    async def run(self, query):
+        assert query == driver_config.WARMUP_QUERY
+        return self
+
+    async def consume(self):
+        await asyncio.sleep(0)
+
+    async def close(self):
+        self.pool.release()
+
+
+class _AsyncSession(_Session):
+    async def begin_transaction(self):
+        await asyncio.sleep(0)
+        return _AsyncTransaction(self.pool)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _AsyncDriver(_Driver):
+    async def verify_connectivity(self):
+        return None
+
+    def session(self, **config):
+        return _AsyncSession(self.pool)
+
+
+def test_async_warm_up_holds_all_connections_at_once():
+    pool = _Pool()
+    assert asyncio.run(async_warm_up(_AsyncDriver(pool), 6, timeout=5)) == 6
+    assert pool.peak == 6
+    assert pool.open == 0
+
+
+def test_async_warm_up_reports_connections_held_when_some_fail():
+    pool = _Pool(fail_after=2)
+    assert asyncio.run(async_warm_up(_AsyncDriver(pool), 4, timeout=5)) == 2
+    assert pool.open == 0
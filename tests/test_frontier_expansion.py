@@ -0,0 +1,135 @@
+"""FrontierExpansion - 홉별 프론티어 BFS의 가중치 순서, 동률, 노드 예산, 종료 조건"""
+
+import pytest
+
+from graph_snapshot import GraphSnapshot
+from graph_api_server import FRONTIER_QUERIES, FrontierExpansion, snapshot_frontier_expansion
+
+# PO0 ─HAS_VARIANCE→ V1..V5, PO0 ─WORKS_AT→ WC1, V1/V2 ─CAUSED_BY→ C1
+NODES = [
+    ('4:t:0', ['ProductionOrder'], {'id': 'PO0'}),
+    ('4:t:1', ['Variance'], {'id': 'V1', 'variance_amount': -50.0}),
+    ('4:t:2', ['Variance'], {'id': 'V2', 'variance_amount': 30.0}),
+    ('4:t:3', ['Variance'], {'id': 'V3', 'variance_amount': -30.0}),
+    ('4:t:4', ['Variance'], {'id': 'V4', 'variance_amount': 5.0}),
+    ('4:t:5', ['Variance'], {'id': 'V5', 'variance_amount': 0.5}),
+    ('4:t:6', ['WorkCenter'], {'id': 'WC1'}),
+    ('4:t:7', ['Cause'], {'code': 'C1'}),
+]
+
+RELATIONSHIPS = [
+    ('5:t:0', 'HAS_VARIANCE', '4:t:0', '4:t:1', {}),
+    ('5:t:1', 'HAS_VARIANCE', '4:t:0', '4:t:2', {}),
+    ('5:t:2', 'HAS_VARIANCE', '4:t:0', '4:t:3', {}),
+    ('5:t:3', 'HAS_VARIANCE', '4:t:0', '4:t:4', {}),
+    ('5:t:4', 'HAS_VARIANCE', '4:t:0', '4:t:5', {}),
+    ('5:t:5', 'WORKS_AT', '4:t:0', '4:t:6', {}),
+    ('5:t:6', 'CAUSED_BY', '4:t:1', '4:t:7', {}),
+    ('5:t:7', 'CAUSED_BY', '4:t:2', '4:t:7', {}),
+]
+
+
+@pytest.fixture
+def snapshot():
+    return GraphSnapshot.from_records(NODES, RELATIONSHIPS)
+
+
+def options(**overrides):
+    return dict({'depth': 2, 'fanout': 10, 'min_amount': 0.0, 'max_nodes': 100,
+                 'rel_types': None, 'direction': 'both'}, **overrides)
+
+
+def hop_rows(snapshot, source, rel_type, weights):
+    """source의 rel_type 관계 → (출발 id, 관계, 이웃, 가중치) 행 (weights: 이웃 id → 가중치)"""
+    n = snapshot.find(source)
+    return [(snapshot.element_id(n), snapshot.relationship(rel_type, edge), snapshot.node(other),
+             weights.get(snapshot.node(other).get('id')))
+            for edge, other in snapshot.edges(n, rel_type, 'out')]
+
+
+def node_ids(expansion):
+    return [node['properties'].get('id') or node['properties'].get('code') for node in expansion.nodes]
+
+
+def test_add_hop_spends_budget_on_heaviest_neighbours_first(snapshot):
+    expansion = FrontierExpansion(snapshot.node(snapshot.find('PO0')), options(max_nodes=3))
+    expansion.add_hop(hop_rows(snapshot, 'PO0', 'HAS_VARIANCE', {'V1': 50, 'V2': 30, 'V3': 30, 'V4': 5}))
+    assert node_ids(expansion) == ['PO0', 'V1', 'V2']
+    assert expansion.truncated
+    assert [edge['to'] for edge in expansion.edges] == ['4:t:1', '4:t:2']
+    assert expansion.frontier == ['4:t:1', '4:t:2']
+    assert expansion.hops == [{'hop': 1, 'frontier': 1, 'added': 2}]
+    assert expansion.done                   # 예산이 찼으면 다음 홉 없음
+
+
+def test_add_hop_keeps_row_order_for_equal_weights(snapshot):
+    expansion = FrontierExpansion(snapshot.node(snapshot.find('PO0')), options())
+    rows = hop_rows(snapshot, 'PO0', 'HAS_VARIANCE', {'V1': 30, 'V2': 30, 'V3': 30, 'V4': None})
+    expansion.add_hop(list(reversed(rows)))
+    assert node_ids(expansion) == ['PO0', 'V3', 'V2', 'V1', 'V5', 'V4']
+    assert not expansion.truncated
+
+
+def test_add_hop_adds_edges_to_known_nodes_once(snapshot):
+    expansion = FrontierExpansion(snapshot.node(snapshot.find('PO0')), options())
+    expansion.add_hop(hop_rows(snapshot, 'PO0', 'HAS_VARIANCE', {}))
+    cause_rows = hop_rows(snapshot, 'V1', 'CAUSED_BY', {}) + hop_rows(snapshot, 'V2', 'CAUSED_BY', {})
+    expansion.add_hop(cause_rows + cause_rows)
+    assert node_ids(expansion).count('C1') == 1
+    assert [edge['from'] for edge in expansion.edges if edge['label'] == 'CAUSED_BY'] == ['4:t:1', '4:t:2']
+    assert len(expansion.relationships) == len(expansion.edges) == 7
+    assert expansion.hops[-1] == {'hop': 2, 'frontier': 5, 'added': 1}
+
+
+def test_done_on_depth_or_empty_frontier(snapshot):
+    expansion = FrontierExpansion(snapshot.node(snapshot.find('WC1')), options(depth=1))
+    assert not expansion.done
+    expansion.add_hop([])
+    assert expansion.done
+    assert expansion.frontier == []
+
+    expansion = FrontierExpansion(snapshot.node(snapshot.find('PO0')), options(depth=1))
+    expansion.add_hop(hop_rows(snapshot, 'PO0', 'HAS_VARIANCE', {}))
+    assert expansion.frontier and expansion.done
+
+
+def test_hop_query_and_add_rows(snapshot):
+    center = snapshot.node(snapshot.find('PO0'))
+    expansion = FrontierExpansion(center, options(rel_types=['HAS_VARIANCE'], direction='out',
+                                                  fanout=3, min_amount=1.0))
+    query, params = expansion.hop_query()
+    assert query == FRONTIER_QUERIES['out']
+    assert params == {'frontier': ['4:t:0'], 'visited': ['4:t:0'], 'rel_types': ['HAS_VARIANCE'],
+                      'min_amount': 1.0, 'fanout': 3}
+    expansion.add_rows([{'source_id': source, 'r': rel, 'other': other, 'weight': weight}
+                        for source, rel, other, weight in hop_rows(snapshot, 'PO0', 'HAS_VARIANCE',
+                                                                   {'V4': 5})])
+    assert node_ids(expansion)[1] == 'V4'
+    assert expansion.hop_query()[1]['frontier'][0] == '4:t:4'
+
+
+def test_snapshot_expansion_fanout_breaks_ties_by_element_id(snapshot):
+    expansion = snapshot_frontier_expansion(snapshot, snapshot.find('PO0'),
+                                            options(depth=1, fanout=3, rel_types=['HAS_VARIANCE']))
+    assert node_ids(expansion) == ['PO0', 'V1', 'V2', 'V3']
+    assert not expansion.truncated          # fanout 제한은 예산 초과가 아님
+
+
+def test_snapshot_expansion_min_amount_keeps_nodes_without_amount(snapshot):
+    expansion = snapshot_frontier_expansion(snapshot, snapshot.find('PO0'), options(depth=1, min_amount=10))
+    assert sorted(node_ids(expansion)) == ['PO0', 'V1', 'V2', 'V3', 'WC1']
+
+
+def test_snapshot_expansion_walks_both_directions_within_budget(snapshot):
+    expansion = snapshot_frontier_expansion(snapshot, snapshot.find('V1'), options(depth=3))
+    assert node_ids(expansion)[:3] == ['V1', 'PO0', 'C1']
+    assert sorted(node_ids(expansion)) == ['C1', 'PO0', 'V1', 'V2', 'V3', 'V4', 'V5', 'WC1']
+    assert [hop['added'] for hop in expansion.hops] == [2, 5, 0]
+
+    limited = snapshot_frontier_expansion(snapshot, snapshot.find('V1'), options(depth=3, max_nodes=4))
+    assert len(limited.nodes) == 4
+    assert limited.truncated
+    payload = limited.payload('V1')
+    assert payload['center'] == 'V1'
+    assert payload['expansion']['truncated'] is True
+    assert payload['expansion']['max_nodes'] == 4
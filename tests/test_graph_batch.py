@@ -0,0 +1,135 @@
+"""POST /api/graph/batch 쿼리 계획 - 요청 검증, 중심별 노드 예산, 홉 단위 병렬 쿼리, 중복 제거"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import graph_api_server as server
+from graph_snapshot import GraphSnapshot
+
+# V1, V2 ← PO1 → WC1,  PO1 → V3 → C1
+NODES = [
+    ('4:b:0', ['ProductionOrder'], {'id': 'PO1'}),
+    ('4:b:1', ['Variance'], {'id': 'V1', 'variance_amount': 10.0}),
+    ('4:b:2', ['Variance'], {'id': 'V2', 'variance_amount': -40.0}),
+    ('4:b:3', ['Variance'], {'id': 'V3', 'variance_amount': 20.0}),
+    ('4:b:4', ['WorkCenter'], {'id': 'WC1'}),
+    ('4:b:5', ['Cause'], {'code': 'C1'}),
+]
+
+RELATIONSHIPS = [
+    ('5:b:0', 'HAS_VARIANCE', '4:b:0', '4:b:1', {}),
+    ('5:b:1', 'HAS_VARIANCE', '4:b:0', '4:b:2', {}),
+    ('5:b:2', 'HAS_VARIANCE', '4:b:0', '4:b:3', {}),
+    ('5:b:3', 'WORKS_AT', '4:b:0', '4:b:4', {}),
+    ('5:b:4', 'CAUSED_BY', '4:b:3', '4:b:5', {}),
+]
+
+
+@pytest.fixture
+def snapshot():
+    return GraphSnapshot.from_records(NODES, RELATIONSHIPS)
+
+
+def drive(plan, answer):
+    """쿼리 계획 실행 - answer(단계 dict) → 결과 dict, (반환값, 단계 목록)"""
+    steps = []
+    try:
+        step = next(plan)
+        while True:
+            steps.append(step)
+            step = plan.send(answer(step))
+    except StopIteration as stop:
+        return stop.value, steps
+
+
+def body(*items):
+    return {'requests': [dict(zip(('kind', 'id', 'depth'), item)) for item in items]}
+
+
+def test_parse_batch_requests_defaults_and_clamps():
+    parsed = server.parse_batch_requests({'requests': [{'id': 'V1'}, {'kind': 'cause', 'id': 'C1', 'depth': 9},
+                                                       {'kind': 'variance', 'id': 7, 'depth': 0}]})
+    assert parsed == [('node', 'V1', 1), ('cause', 'C1', server.BATCH_MAX_DEPTH), ('variance', '7', 1)]
+
+
+@pytest.mark.parametrize('payload', [
+    None,
+    {'requests': []},
+    {'requests': [{'kind': 'variance'}]},
+    {'requests': [{'kind': 'planet', 'id': 'X'}]},
+    {'requests': [{'kind': 'variance', 'id': 'V1', 'depth': 'deep'}]},
+])
+def test_parse_batch_requests_rejects_invalid_bodies(payload):
+    with pytest.raises(server.InvalidArguments):
+        server.parse_batch_requests(payload)
+
+
+def test_parse_batch_requests_limits_center_count(monkeypatch):
+    monkeypatch.setattr(server, 'BATCH_MAX_CENTERS', 2)
+    with pytest.raises(server.InvalidArguments):
+        server.parse_batch_requests(body(('node', 'A'), ('node', 'B'), ('node', 'C')))
+
+
+def test_snapshot_batch_respects_per_center_budget_and_dedupes(monkeypatch, snapshot):
+    monkeypatch.setattr(server, 'graph_snapshot', SimpleNamespace(current=snapshot))
+    monkeypatch.setattr(server, 'BATCH_MAX_NODES_PER_CENTER', 3)
+    payload, steps = drive(server.graph_batch_plan({}, body(('variance', 'V1', 3), ('production_order', 'PO1', 1),
+                                                           ('variance', 'V9', 1))),
+                           lambda step: {name: [] for name in step})
+    # 스냅샷에 없는 중심만 Neo4j에서 찾는다
+    assert [{name: params for name, (_, params) in step.items()} for step in steps] == [
+        {'variance': {'center_ids': ['V9']}}]
+    v1, po1, missing = payload['centers']
+    assert v1['center'] == '4:b:1' and len(v1['nodes']) == 3
+    # V1 → PO1 → 가중치 큰 V2 (|-40|)까지만
+    assert v1['nodes'] == ['4:b:1', '4:b:0', '4:b:2']
+    assert po1['nodes'] == ['4:b:0', '4:b:2', '4:b:3']
+    assert missing['center'] is None and missing['nodes'] == []
+    ids = [node['id'] for node in payload['nodes']]
+    assert sorted(ids) == ['4:b:0', '4:b:1', '4:b:2', '4:b:3']
+    edge_ids = [edge['id'] for edge in payload['edges']]
+    assert len(edge_ids) == len(set(edge_ids))
+    assert set(v1['edges']) | set(po1['edges']) == set(edge_ids)
+
+
+def test_neo4j_batch_resolves_centers_per_kind_then_runs_hops_in_parallel(monkeypatch, snapshot):
+    monkeypatch.setattr(server, 'graph_snapshot', SimpleNamespace(current=None))
+    monkeypatch.setattr(server, 'BATCH_MAX_NODES_PER_CENTER', 4)
+
+    def hop_rows(params):
+        rows = []
+        for source_id in params['frontier']:
+            source = snapshot.find(source_id)
+            for rel_type in snapshot.relationships:
+                for direction in ('out', 'in'):
+                    for edge, other in snapshot.edges(source, rel_type, direction):
+                        if snapshot.element_id(other) in params['visited']:
+                            continue
+                        node = snapshot.node(other)
+                        rows.append({'source_id': source_id, 'r': snapshot.relationship(rel_type, edge),
+                                     'other': node, 'weight': abs(node.get('variance_amount') or 0)})
+        return rows
+
+    def answer(step):
+        results = {}
+        for name, (query, params, *_) in step.items():
+            if 'UNWIND $center_ids' in query:
+                results[name] = [{'center_id': key, 'n': snapshot.node(snapshot.find(key))}
+                                 for key in params['center_ids'] if snapshot.find(key) is not None]
+            else:
+                results[name] = hop_rows(params)
+        return results
+
+    payload, steps = drive(server.graph_batch_plan({}, body(('variance', 'V3', 3), ('cause', 'C1', 1),
+                                                           ('variance', 'V9', 2))), answer)
+    assert sorted(steps[0]) == ['cause', 'variance']
+    assert steps[0]['variance'][1] == {'center_ids': ['V3', 'V9']}
+    # 홉 1: 중심 두 개 병렬, 이후 depth 1인 C1은 빠지고 V3만 예산이 찰 때까지
+    assert [len(step) for step in steps[1:]] == [2, 1]
+    v3, c1, missing = payload['centers']
+    assert len(v3['nodes']) == 4
+    assert v3['nodes'][:3] == ['4:b:3', '4:b:0', '4:b:5']
+    assert v3['nodes'][3] == '4:b:2'        # 홉 2에서 가중치 큰 V2가 남은 예산 하나를 씀
+    assert c1['nodes'] == ['4:b:5', '4:b:3']
+    assert missing['center'] is None
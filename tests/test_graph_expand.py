@@ -0,0 +1,56 @@
+"""GET /api/node/<id>/expand 커서 - 스냅샷 버전 / Neo4j 키 발급처가 바뀌면 만료"""
+
+from types import SimpleNamespace
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import graph_api_server as server
+from graph_snapshot import GraphSnapshot
+
+NODES = [('4:e:0', ['ProductionOrder'], {'id': 'PO1'})] + [
+    (f'4:e:{i}', ['Variance'], {'id': f'V{i}'}) for i in range(1, 4)]
+RELATIONSHIPS = [(f'5:e:{i}', 'HAS_VARIANCE', '4:e:0', f'4:e:{i}', {}) for i in range(1, 4)]
+
+
+def snapshot(version):
+    return GraphSnapshot.from_records(NODES, RELATIONSHIPS, version)
+
+
+def run(plan, answer=None):
+    try:
+        step = next(plan)
+        while True:
+            step = plan.send(answer(step))
+    except StopIteration as stop:
+        return stop.value
+
+
+def expand(monkeypatch, current, **args):
+    monkeypatch.setattr(server, 'graph_snapshot', SimpleNamespace(current=current))
+    return run(server.expand_node_plan(MultiDict(dict(args, limit='2')), None, node_id='PO1'))
+
+
+def test_snapshot_cursor_pages_within_one_version(monkeypatch):
+    first = expand(monkeypatch, snapshot(7))
+    cursor = first['page']['next_cursor']
+    second = expand(monkeypatch, snapshot(7), cursor=cursor)
+    assert len(first['edges']) == 2 and len(second['edges']) == 1
+    assert second['page']['has_more'] is False
+
+
+@pytest.mark.parametrize('current', [snapshot(8), None])
+def test_cursor_from_another_source_is_expired(monkeypatch, current):
+    cursor = expand(monkeypatch, snapshot(7))['page']['next_cursor']
+    with pytest.raises(server.InvalidExpandCursor, match='Cursor expired'):
+        expand(monkeypatch, current, cursor=cursor)
+
+
+def test_neo4j_cursor_is_rejected_by_snapshot(monkeypatch):
+    signature = server._expand_filter_signature('PO1', None, 'both')
+    cursor = server.encode_expand_cursor('5:e:1', signature, server.expand_cursor_source(None))
+    with pytest.raises(server.InvalidExpandCursor, match='Cursor expired'):
+        expand(monkeypatch, snapshot(7), cursor=cursor)
+    # 필터가 다르면 만료가 아니라 필터 불일치
+    with pytest.raises(server.InvalidExpandCursor, match='filters'):
+        expand(monkeypatch, snapshot(7), cursor=cursor, direction='out')
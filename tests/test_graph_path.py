@@ -0,0 +1,71 @@
+"""GET /api/path 쿼리 계획 - 스냅샷 탐색과 Neo4j allShortestPaths 대체 경로의 근사 표시"""
+
+from types import SimpleNamespace
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import graph_api_server as server
+from graph_snapshot import GraphSnapshot
+
+# A ─R→ B ─R→ D,  A ─R→ C ─R→ D
+NODES = [(f'4:q:{name}', ['Factor'], {'id': name}) for name in 'ABCD']
+RELATIONSHIPS = [
+    ('5:q:0', 'R', '4:q:A', '4:q:B', {}),
+    ('5:q:1', 'R', '4:q:B', '4:q:D', {}),
+    ('5:q:2', 'R', '4:q:A', '4:q:C', {}),
+    ('5:q:3', 'R', '4:q:C', '4:q:D', {}),
+]
+
+
+@pytest.fixture
+def snapshot():
+    return GraphSnapshot.from_records(NODES, RELATIONSHIPS)
+
+
+def run(plan, answer=None):
+    try:
+        step = next(plan)
+        while True:
+            step = plan.send(answer(step))
+    except StopIteration as stop:
+        return stop.value
+
+
+def neo4j_rows(snapshot):
+    """스냅샷 객체로 만든 allShortestPaths 결과 두 줄 (A-B-D, A-C-D)"""
+    rows = []
+    for middle, (first, second) in (('B', (0, 1)), ('C', (2, 3))):
+        nodes = [snapshot.node(snapshot.find(name)) for name in ('A', middle, 'D')]
+        rels = [snapshot.relationship('R', edge) for edge in (first, second)]
+        rows.append({'p': SimpleNamespace(nodes=nodes, relationships=rels), 'totals': None})
+    return rows
+
+
+def test_path_query_uses_indexed_lookup():
+    query = server.build_path_query(server.parse_path_args(MultiDict({'source': 'A', 'target': 'D'})))
+    assert 'a.id = $source' not in query and 'b.id = $target' not in query
+    assert 'MATCH (n:ExternalEvent {id: $source}) RETURN n' in query
+    assert 'WITH a MATCH (n:Cause {code: $target}) RETURN n' in query
+
+
+def test_snapshot_paths_are_exact(monkeypatch, snapshot):
+    monkeypatch.setattr(server, 'graph_snapshot', SimpleNamespace(current=snapshot))
+    payload = run(server.path_plan(MultiDict({'source': 'A', 'target': 'D', 'k': '2'}), None))
+    assert payload['index'] == 'snapshot' and payload['approximate'] is False
+    assert len(payload['paths']) == 2
+
+
+@pytest.mark.parametrize('args, approximate', [
+    ({}, False),
+    ({'k': '2'}, True),
+    ({'weight': 'amount'}, True),
+])
+def test_neo4j_fallback_flags_reranked_results_as_approximate(monkeypatch, snapshot, args, approximate):
+    monkeypatch.setattr(server, 'graph_snapshot', SimpleNamespace(current=None))
+    rows = neo4j_rows(snapshot)
+    payload = run(server.path_plan(MultiDict(dict(args, source='A', target='D')), None),
+                  lambda step: {'paths': rows})
+    assert payload['algorithm'] == 'all_shortest_paths' and payload['index'] == 'neo4j'
+    assert payload['approximate'] is approximate
+    assert [p['hops'] for p in payload['paths']] == [2] * min(int(args.get('k', 1)), 2)
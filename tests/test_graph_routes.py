@@ -0,0 +1,137 @@
+"""그래프 / 분석 라우트의 공유 쿼리 계획 - 스냅샷 응답, 404(NotFound), 가상 제품 노드, 원인 추적 대체 경로"""
+
+from types import SimpleNamespace
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import graph_api_server as server
+from graph_snapshot import GraphSnapshot
+
+# PO1 → V1 → C1,  PO1 → P1,  WC1 → CP1 → PO1
+NODES = [
+    ('4:r:0', ['ProductionOrder'], {'id': 'PO1'}),
+    ('4:r:1', ['Variance'], {'id': 'V1', 'variance_amount': -30.0}),
+    ('4:r:2', ['Cause'], {'code': 'C1', 'description': 'price'}),
+    ('4:r:3', ['Product'], {'id': 'P1'}),
+    ('4:r:4', ['WorkCenter'], {'id': 'WC1'}),
+    ('4:r:5', ['CostPool'], {'id': 'CP1'}),
+]
+RELATIONSHIPS = [
+    ('5:r:0', 'HAS_VARIANCE', '4:r:0', '4:r:1', {}),
+    ('5:r:1', 'CAUSED_BY', '4:r:1', '4:r:2', {}),
+    ('5:r:2', 'PRODUCES', '4:r:0', '4:r:3', {}),
+    ('5:r:3', 'INCURRED_COST', '4:r:4', '4:r:5', {}),
+    ('5:r:4', 'ALLOCATES', '4:r:5', '4:r:0', {'amount': 10.0}),
+]
+
+
+@pytest.fixture
+def snapshot(monkeypatch):
+    snapshot = GraphSnapshot.from_records(NODES, RELATIONSHIPS)
+    monkeypatch.setattr(server, 'graph_snapshot', SimpleNamespace(current=snapshot))
+    return snapshot
+
+
+@pytest.fixture
+def no_snapshot(monkeypatch):
+    monkeypatch.setattr(server, 'graph_snapshot', SimpleNamespace(current=None))
+
+
+def drive(plan, answer=None):
+    """쿼리 계획 실행 - answer(단계 dict) → 결과 dict, (반환값, 쿼리 이름 목록)"""
+    names = []
+    try:
+        step = next(plan)
+        while True:
+            names += list(step)
+            step = plan.send(answer(step))
+    except StopIteration as stop:
+        return stop.value, names
+
+
+def labels(payload):
+    return sorted(node['label'] for node in payload['nodes'])
+
+
+@pytest.mark.parametrize('plan, key, expected', [
+    (server.variance_graph_plan, 'V1', ['P1', 'PO1', 'V1', 'price']),
+    (server.cause_graph_plan, 'C1', ['PO1', 'V1', 'price']),
+    (server.production_order_graph_plan, 'PO1', ['P1', 'PO1', 'V1', 'price']),
+    (server.cost_allocation_graph_plan, 'WC1', ['CP1', 'PO1', 'WC1']),
+])
+def test_entity_graphs_are_served_from_the_snapshot(snapshot, plan, key, expected):
+    payload, names = drive(plan(MultiDict(), {}, key))
+    assert names == []
+    assert labels(payload) == expected and payload['center'] == key
+
+
+def test_missing_center_raises_not_found(no_snapshot):
+    with pytest.raises(server.NotFound, match='Material not found'):
+        drive(server.material_graph_plan(MultiDict(), {}, 'M9'), lambda step: {'subgraph': None})
+    # 배부 그래프는 404 대신 빈 그래프
+    payload, _ = drive(server.cost_allocation_graph_plan(MultiDict(), {}, 'WC9'), lambda step: {'subgraph': None})
+    assert payload == {'nodes': [], 'edges': [], 'center': 'WC9'}
+
+
+def test_product_without_node_falls_back_to_order_product_code(snapshot, monkeypatch):
+    order = snapshot.node(snapshot.find('PO1'))
+    row = {'center': None, 'orders': [order]}
+    monkeypatch.setattr(server, 'graph_snapshot', SimpleNamespace(current=None))
+    queries = []
+
+    def answer(step):
+        queries.append(step['subgraph'][0])
+        return {'subgraph': row if len(queries) == 2 else None}
+
+    payload, names = drive(server.product_graph_plan(MultiDict(), {}, 'P9'), answer)
+    assert queries == [server.GRAPH_SUBGRAPH_QUERIES['product'], server.PRODUCT_BY_CODE_SUBGRAPH_QUERY]
+    assert payload['nodes'][0]['id'] == 'product_P9'
+    assert payload['edges'][0] == {'from': order.element_id, 'to': 'product_P9', 'label': 'PRODUCES',
+                                   'color': '#FF6B6B'}
+
+
+def test_variance_depth_expansion_from_snapshot(snapshot):
+    payload, names = drive(server.variance_graph_plan(MultiDict({'depth': '2'}), {}, 'V1'))
+    assert names == [] and payload['expansion']['depth'] == 2
+    with pytest.raises(server.InvalidArguments):
+        drive(server.variance_graph_plan(MultiDict({'depth': '99'}), {}, 'V1'))
+
+
+def test_root_cause_without_paths_falls_back_to_expand(snapshot):
+    payload, names = drive(server.root_cause_graph_plan(MultiDict(), {}, 'V1'))
+    assert names == []
+    assert 'page' in payload and payload['center'] == '4:r:1'
+
+
+def test_root_cause_legacy_and_expand_in_one_plan(no_snapshot, monkeypatch):
+    monkeypatch.setitem(server._root_cause_state, 'checked_at', 0.0)
+
+    def answer(step):
+        if 'paths' in step:
+            return {'paths': []}
+        if 'center' in step:
+            return {'center': None}
+        return {name: [] for name in step}     # closure 확인 - ROOT_CAUSE 관계 없음
+
+    payload, names = drive(server.root_cause_graph_plan(MultiDict(), {}, 'V1'), answer)
+    assert names[-2:] == ['paths', 'center']
+    assert payload == server.empty_graph()
+
+
+def test_mom_comparison_plan(no_snapshot):
+    rows = [{'curr': {'month': '2024-02', 'actual_unit_cost': 12.0, 'total_yield': 0.9},
+             'prev': {'actual_unit_cost': 10.0}},
+            {'curr': {'month': '2024-01', 'actual_unit_cost': 10.0, 'total_yield': 0.8}, 'prev': None}]
+    data, _ = drive(server.mom_comparison_plan(MultiDict(), {}, 'P1'), lambda step: {'months': rows})
+    assert data[0]['change_amount'] == 2.0 and data[0]['change_percent'] == pytest.approx(20.0)
+    assert data[1]['prev_cost'] is None
+
+
+def test_flask_route_returns_404_for_not_found(no_snapshot, monkeypatch):
+    monkeypatch.setattr(server.neo4j_conn, 'driver', object())
+    monkeypatch.setattr(server, 'run_plan',
+                        lambda fanout, driver, plan: drive(plan, lambda step: {'subgraph': None})[0])
+    response = server.app.test_client().get('/api/workcenter/WC9/graph')
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'WorkCenter not found'}
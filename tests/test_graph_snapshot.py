@@ -0,0 +1,195 @@
+"""graph_snapshot - Neo4j 레코드 → CSR 스냅샷 구축과 조회, SnapshotEngine 재구축 규칙"""
+
+import threading
+
+import pytest
+
+from graph_snapshot import GraphSnapshot, SnapshotEngine, read_snapshot
+
+NODES = [
+    ('4:db:0', ['ProductionOrder'], {'id': 'PO1', 'product_cd': 'P1'}),
+    ('4:db:1', ['Variance'], {'id': 'V1', 'variance_amount': -50.0}),
+    ('4:db:2', ['Variance'], {'id': 'V2', 'variance_amount': 30.0}),
+    ('4:db:3', ['Cause'], {'code': 'C1', 'description': '설비 고장'}),
+    ('4:db:4', ['Material', 'Tracked'], {'id': 'M1'}),
+]
+
+RELATIONSHIPS = [
+    ('5:db:0', 'HAS_VARIANCE', '4:db:0', '4:db:1', {}),
+    ('5:db:1', 'HAS_VARIANCE', '4:db:0', '4:db:2', {}),
+    ('5:db:2', 'CAUSED_BY', '4:db:1', '4:db:3', {'weight': 0.5}),
+    ('5:db:3', 'CONSUMES', '4:db:0', '4:db:4', {'quantity': 3}),
+    ('5:db:4', 'CONSUMES', '4:db:0', '4:db:99', {}),  # 끝점이 스냅샷에 없음
+]
+
+
+@pytest.fixture
+def snapshot():
+    return GraphSnapshot.from_records(NODES, RELATIONSHIPS, version='v1')
+
+
+def test_counts_skip_relationships_with_missing_endpoints(snapshot):
+    assert snapshot.node_count == 5
+    assert snapshot.relationship_count == 4
+    assert snapshot.stats()['version'] == 'v1'
+    assert snapshot.built_at is not None
+
+
+def test_csr_neighbours_by_type_and_direction(snapshot):
+    po = snapshot.find('4:db:0')
+    assert [other for _, other in snapshot.edges(po, 'HAS_VARIANCE', 'out')] == [1, 2]
+    assert list(snapshot.edges(po, 'HAS_VARIANCE', 'in')) == []
+    assert [other for _, other in snapshot.edges(2, 'HAS_VARIANCE', 'in')] == [po]
+    assert snapshot.degree(po, 'HAS_VARIANCE', 'out') == 2
+    assert snapshot.degree(po, 'CONSUMES', 'out') == 1
+    assert snapshot.degree(po, 'MISSING_TYPE', 'out') == 0
+    assert list(snapshot.edges(po, 'MISSING_TYPE', 'out')) == []
+
+
+def test_edges_range_slicing(snapshot):
+    po = snapshot.find('PO1')
+    assert [other for _, other in snapshot.edges(po, 'HAS_VARIANCE', 'out', start=1)] == [2]
+    assert [other for _, other in snapshot.edges(po, 'HAS_VARIANCE', 'out', stop=1)] == [1]
+    assert list(snapshot.edges(po, 'HAS_VARIANCE', 'out', start=2)) == []
+
+
+def test_find_by_element_id_then_key(snapshot):
+    assert snapshot.find('4:db:1') == 1
+    assert snapshot.find('V1') == 1
+    assert snapshot.find('C1') == 3            # Cause는 code가 키
+    assert snapshot.find_labeled('Cause', 'C1') == 3
+    assert snapshot.find_labeled('Variance', 'C1') is None
+    assert snapshot.find_labeled('Tracked', 'M1') == 4
+    assert snapshot.find('Variance:V1') is None
+    assert snapshot.find(None) is None
+
+
+def test_node_view_matches_neo4j_node(snapshot):
+    node = snapshot.node(snapshot.find('V1'))
+    assert node.element_id == '4:db:1'
+    assert node.labels == frozenset({'Variance'})
+    assert dict(node) == {'id': 'V1', 'variance_amount': -50.0}
+    assert node.get('product_cd') is None
+    with pytest.raises(KeyError):
+        node['product_cd']
+    assert snapshot.node(4).labels == frozenset({'Material', 'Tracked'})
+
+
+def test_relationship_view_keeps_element_ids_and_properties(snapshot):
+    edge, other = next(snapshot.edges(snapshot.find('V1'), 'CAUSED_BY', 'out'))
+    rel = snapshot.relationship('CAUSED_BY', edge)
+    assert rel.element_id == '5:db:2'
+    assert rel.type == 'CAUSED_BY'
+    assert rel.start_node.element_id == '4:db:1'
+    assert rel.end_node.element_id == snapshot.element_id(other) == '4:db:3'
+    assert dict(rel) == {'weight': 0.5}
+    # 같은 타입 안에서 속성이 없는 관계는 속성 없음
+    rel = snapshot.relationship('HAS_VARIANCE', 0)
+    assert dict(rel) == {}
+
+
+class _Result(list):
+    def single(self):
+        return self[0] if self else None
+
+
+class _Transaction:
+    def __init__(self, version):
+        self.version = version
+
+    def run(self, query):
+        if 'DataVersion {id' in query:
+            return _Result([{'version': self.version}])
+        if 'labels(n)' in query:
+            return _Result([{'id': i, 'labels': labels, 'props': props} for i, labels, props in NODES])
+        return _Result([{'id': i, 'type': t, 'start': a, 'end': b, 'props': props}
+                        for i, t, a, b, props in RELATIONSHIPS])
+
+
+def test_read_snapshot_uses_marker_version():
+    snapshot = read_snapshot(_Transaction('marker-2'))
+    assert snapshot.version == 'marker-2'
+    assert snapshot.relationship_count == 4
+    assert snapshot.build_ms is not None
+
+
+def _engine(versions, **kwargs):
+    loaded = []
+
+    def load():
+        version = versions[min(len(loaded), len(versions) - 1)]
+        loaded.append(version)
+        return GraphSnapshot.from_records(NODES, RELATIONSHIPS, version=version)
+
+    return SnapshotEngine(load, enabled=True, **kwargs), loaded
+
+
+def _wait(engine):
+    for thread in threading.enumerate():
+        if thread.name == 'graph-snapshot':
+            thread.join(5)
+    assert not engine._building
+
+
+def test_engine_refresh_skips_current_version():
+    engine, loaded = _engine(['v1', 'v2'])
+    assert engine.start().version == 'v1'
+    assert engine.refresh('v1') is False
+    assert engine.refresh('v2') is True
+    _wait(engine)
+    assert engine.current.version == 'v2'
+    assert loaded == ['v1', 'v2']
+
+
+def test_engine_refresh_without_version_always_rebuilds():
+    engine, loaded = _engine(['v1'])
+    engine.start()
+    assert engine.refresh() is True
+    _wait(engine)
+    assert len(loaded) == 2
+    assert engine.rebuilds == 2
+
+
+def test_engine_refresh_during_build_queues_one_more_build():
+    release = threading.Event()
+    loaded = []
+
+    def load():
+        loaded.append(len(loaded))
+        if len(loaded) == 1:
+            release.wait(5)
+        return GraphSnapshot.from_records(NODES, RELATIONSHIPS, version=f'v{len(loaded)}')
+
+    engine = SnapshotEngine(load, enabled=True)
+    assert engine.refresh() is True
+    assert engine.refresh() is False
+    assert engine.refresh() is False
+    release.set()
+    _wait(engine)
+    assert len(loaded) == 2
+    assert engine.current.version == 'v2'
+
+
+def test_engine_swap_callback_and_failures():
+    swaps = []
+    engine, _ = _engine(['v1', 'v2'], on_swap=lambda: swaps.append(True))
+    engine.start()
+    assert swaps == []                      # 첫 구축은 교체가 아님
+    engine.refresh('v2')
+    _wait(engine)
+    assert swaps == [True]
+
+    def fail():
+        raise RuntimeError('no driver')
+
+    broken = SnapshotEngine(fail, enabled=True)
+    assert broken.start() is None
+    assert broken.current is None
+    assert broken.stats()['last_error'] == 'no driver'
+
+
+def test_disabled_engine_serves_nothing():
+    engine = SnapshotEngine(lambda: GraphSnapshot.from_records(NODES, RELATIONSHIPS), enabled=False)
+    assert engine.start() is None
+    assert engine.current is None
+    assert engine.refresh() is False
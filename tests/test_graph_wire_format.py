@@ -0,0 +1,105 @@
+"""graph_wire_format - compact 열 포맷 변환과 fields= 속성 프로젝션"""
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from graph_wire_format import compact_graph, format_graph_payload, parse_graph_format
+
+PAYLOAD = {
+    'nodes': [
+        {'id': 'n0', 'label': 'PO1', 'type': 'ProductionOrder', 'color': '#111', 'size': 30,
+         'properties': {'id': 'PO1', 'month': '2024-01'}},
+        {'id': 'n1', 'label': 'V1', 'type': 'Variance', 'color': '#222', 'size': 25,
+         'properties': {'id': 'V1', 'variance_amount': -5.0}},
+        {'id': 'n2', 'label': 'V2', 'type': 'Variance', 'color': '#111', 'size': 25,
+         'properties': {'id': 'V2'}},
+    ],
+    'edges': [
+        {'id': 'e0', 'from': 'n0', 'to': 'n1', 'label': 'HAS_VARIANCE', 'color': '#222'},
+        {'id': 'e1', 'from': 'n0', 'to': 'n2', 'label': 'HAS_VARIANCE', 'color': '#333',
+         'properties': {'weight': 2}},
+        {'id': 'e2', 'from': 'n1', 'to': 'missing', 'label': 'CAUSED_BY', 'color': '#222'},
+    ],
+    'center': 'PO1'
+}
+
+
+@pytest.mark.parametrize('args, expected', [
+    ({}, None),
+    ({'format': 'json'}, None),
+    ({'format': 'COMPACT'}, (True, None)),
+    ({'fields': 'id, variance_amount,,'}, (False, ['id', 'variance_amount'])),
+    ({'format': 'compact', 'fields': ''}, (True, [])),
+])
+def test_parse_graph_format(args, expected):
+    assert parse_graph_format(MultiDict(args)) == expected
+
+
+def test_compact_graph_columns_and_code_tables():
+    result = compact_graph(PAYLOAD)
+    assert result['format'] == 'compact'
+    assert result['center'] == 'PO1'
+    assert result['types'] == ['ProductionOrder', 'Variance']
+    assert result['rel_types'] == ['HAS_VARIANCE']
+    # 노드와 엣지가 색상 코드표 하나를 공유한다 (처음 나온 순서)
+    assert result['palette'] == ['#111', '#222', '#333']
+    nodes = result['nodes']
+    assert nodes['id'] == ['n0', 'n1', 'n2']
+    assert nodes['type'] == [0, 1, 1]
+    assert nodes['color'] == [0, 1, 0]
+    assert nodes['props'] == {'id': ['PO1', 'V1', 'V2'], 'month': ['2024-01', None, None],
+                              'variance_amount': [None, -5.0, None]}
+    edges = result['edges']
+    assert edges['from'] == [0, 0]
+    assert edges['to'] == [1, 2]
+    assert edges['label'] == [0, 0]
+    assert edges['color'] == [1, 2]
+    assert edges['props'] == {'weight': [None, 2]}
+
+
+def test_compact_graph_drops_edges_to_unknown_nodes():
+    result = compact_graph(PAYLOAD)
+    assert result['dropped_edges'] == 1
+    assert result['edges']['id'] == ['e0', 'e1']
+    assert 'CAUSED_BY' not in result['rel_types']
+
+
+def test_compact_graph_empty_payload_keeps_edge_endpoint_columns():
+    result = compact_graph({'nodes': [], 'edges': []})
+    assert result['nodes'] == {}
+    assert result['edges'] == {'from': [], 'to': []}
+    assert 'dropped_edges' not in result
+
+
+def test_compact_graph_maps_batch_membership_to_rows():
+    payload = dict(PAYLOAD, centers=[
+        {'kind': 'production_order', 'id': 'PO1', 'nodes': ['n0', 'n2', 'gone'], 'edges': ['e1', 'e2']},
+        {'kind': 'variance', 'id': 'V9', 'center': None, 'nodes': [], 'edges': []},
+    ])
+    centers = compact_graph(payload)['centers']
+    assert centers[0]['nodes'] == [0, 2]
+    assert centers[0]['edges'] == [1]        # e2는 끝점이 없어 제외됨
+    assert centers[1] == {'kind': 'variance', 'id': 'V9', 'center': None, 'nodes': [], 'edges': []}
+    assert payload['centers'][0]['nodes'] == ['n0', 'n2', 'gone']   # 원본은 그대로
+
+
+def test_compact_graph_projects_fields():
+    result = compact_graph(PAYLOAD, ['variance_amount'])
+    assert result['nodes']['props'] == {'variance_amount': [None, -5.0, None]}
+    assert 'props' not in result['edges']
+
+
+def test_format_graph_payload_projection_only():
+    result = format_graph_payload(PAYLOAD, (False, ['id']))
+    assert [node['properties'] for node in result['nodes']] == [{'id': 'PO1'}, {'id': 'V1'}, {'id': 'V2'}]
+    assert result['edges'][1]['properties'] == {}
+    assert 'properties' not in result['edges'][0]
+    assert PAYLOAD['nodes'][0]['properties'] == {'id': 'PO1', 'month': '2024-01'}
+
+
+def test_format_graph_payload_passes_through_non_graph_responses():
+    error = {'error': 'Variance not found'}
+    assert format_graph_payload(error, (True, None)) is error
+    assert format_graph_payload(PAYLOAD, None) is PAYLOAD
+    assert format_graph_payload(PAYLOAD, (False, None)) is PAYLOAD
+    assert format_graph_payload(PAYLOAD, (True, None))['format'] == 'compact'
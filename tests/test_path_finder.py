@@ -0,0 +1,109 @@
+"""path_finder - 양방향 BFS 최단 경로, Yen k-최단 경로, 배부 금액 가중치"""
+
+import math
+
+import pytest
+
+from graph_snapshot import GraphSnapshot
+from path_finder import path_index, step_cost
+
+# A ─R→ B ─R→ D,  A ─R→ C ─R→ D,  A ─S→ E ─S→ F ─S→ D
+# X ─ALLOCATES(90)→ Y ─R→ W,  X ─ALLOCATES(10)→ Z ─R→ W,  X ─ALLOCATES(0)→ Q ─R→ W
+NAMES = ['A', 'B', 'C', 'D', 'E', 'F', 'X', 'Y', 'Z', 'Q', 'W']
+EDGES = [
+    ('R', 'A', 'B', {}), ('R', 'B', 'D', {}), ('R', 'A', 'C', {}), ('R', 'C', 'D', {}),
+    ('S', 'A', 'E', {}), ('S', 'E', 'F', {}), ('S', 'F', 'D', {}),
+    ('ALLOCATES', 'X', 'Y', {'amount': 90.0}), ('ALLOCATES', 'X', 'Z', {'amount': -10.0}),
+    ('ALLOCATES', 'X', 'Q', {'amount': 0}),
+    ('R', 'Y', 'W', {}), ('R', 'Z', 'W', {}), ('R', 'Q', 'W', {}),
+]
+
+
+@pytest.fixture
+def snapshot():
+    nodes = [(f'4:p:{name}', ['Node'], {'id': name}) for name in NAMES]
+    rels = [(f'5:p:{i}', rel_type, f'4:p:{a}', f'4:p:{b}', props)
+            for i, (rel_type, a, b, props) in enumerate(EDGES)]
+    return GraphSnapshot.from_records(nodes, rels)
+
+
+def names(snapshot, path):
+    return [snapshot.node_key[n] for n in path[1]]
+
+
+def test_step_cost():
+    assert step_cost(None, 100) == 1.0
+    assert step_cost(5, 0) == 1.0
+    assert step_cost(0, 100) is None
+    assert step_cost(-50, 100) == pytest.approx(1 + math.log(2))
+    assert step_cost(100, 100) == 1.0
+
+
+def test_shortest_path_bidirectional_bfs(snapshot):
+    index = path_index(snapshot)
+    a, d = snapshot.find('A'), snapshot.find('D')
+    algorithm, paths = index.find_paths(a, d)
+    assert algorithm == 'bidirectional_bfs'
+    [path] = paths
+    assert path[0] == 2.0
+    assert names(snapshot, path)[0] == 'A' and names(snapshot, path)[-1] == 'D'
+    assert len(path[2]) == 2
+    assert all(rel_type == 'R' for rel_type, _ in path[2])
+    # 단계의 엣지는 경로의 연속한 두 노드를 잇는다
+    for (rel_type, edge), start, end in zip(path[2], path[1], path[1][1:]):
+        table = snapshot.relationships[rel_type]
+        assert (table.src[edge], table.dst[edge]) == (start, end)
+
+
+def test_shortest_path_direction_hops_and_types(snapshot):
+    index = path_index(snapshot)
+    a, d = snapshot.find('A'), snapshot.find('D')
+    assert index.find_paths(a, d, direction='out')[1][0][0] == 2.0
+    assert index.find_paths(d, a, direction='out')[1] == []
+    assert index.find_paths(d, a, direction='in')[1][0][0] == 2.0
+    assert index.find_paths(d, a, direction='both')[1][0][0] == 2.0
+    assert index.find_paths(a, d, max_hops=1)[1] == []
+    [path] = index.find_paths(a, d, rel_types=['S'])[1]
+    assert names(snapshot, path) == ['A', 'E', 'F', 'D']
+    assert index.find_paths(a, a)[1] == [(0.0, (a,), ())]
+
+
+def test_yen_k_shortest_paths_are_distinct_simple_and_ordered(snapshot):
+    index = path_index(snapshot)
+    algorithm, paths = index.find_paths(snapshot.find('A'), snapshot.find('D'), rel_types=['R', 'S'],
+                                        direction='out', k=5)
+    assert algorithm == 'yen_k_shortest'
+    assert [cost for cost, _, _ in paths] == [2.0, 2.0, 3.0]
+    assert sorted(tuple(names(snapshot, path)) for path in paths[:2]) == [('A', 'B', 'D'), ('A', 'C', 'D')]
+    assert names(snapshot, paths[2]) == ['A', 'E', 'F', 'D']
+    assert len({steps for _, _, steps in paths}) == 3
+    for _, nodes, _ in paths:
+        assert len(set(nodes)) == len(nodes)
+
+
+def test_yen_respects_k_and_max_hops(snapshot):
+    index = path_index(snapshot)
+    a, d = snapshot.find('A'), snapshot.find('D')
+    assert len(index.find_paths(a, d, direction='out', k=2)[1]) == 2
+    paths = index.find_paths(a, d, direction='out', k=5, max_hops=2)[1]
+    assert [cost for cost, _, _ in paths] == [2.0, 2.0]
+
+
+def test_weighted_paths_follow_the_larger_allocation_share(snapshot):
+    index = path_index(snapshot)
+    x, w = snapshot.find('X'), snapshot.find('W')
+    algorithm, paths = index.find_paths(x, w, direction='out', k=3, weighted=True)
+    assert algorithm == 'yen_k_shortest'
+    # amount 0 관계(X→Q)는 흐름이 없어 지나가지 않는다
+    assert [names(snapshot, path) for path in paths] == [['X', 'Y', 'W'], ['X', 'Z', 'W']]
+    assert paths[0][0] == pytest.approx(2 + math.log(100 / 90))
+    assert paths[1][0] == pytest.approx(2 + math.log(100 / 10))
+    # 가중치 없이는 세 경로 모두 2홉
+    unweighted = index.find_paths(x, w, direction='out', k=3)[1]
+    assert [cost for cost, _, _ in unweighted] == [2.0, 2.0, 2.0]
+
+
+def test_path_index_is_cached_per_snapshot(snapshot):
+    assert path_index(snapshot) is path_index(snapshot)
+    other = GraphSnapshot.from_records([], [])
+    assert path_index(other) is not path_index(snapshot)
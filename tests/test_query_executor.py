@@ -0,0 +1,86 @@
+"""query_executor - 쿼리 계획 전체에 마감 시간 하나 (단계마다 남은 시간만 전달)"""
+
+import asyncio
+
+import pytest
+
+import query_executor
+from query_executor import QueryDeadlineExceeded, run_plan, run_plan_async
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(query_executor.time, 'monotonic', clock.monotonic)
+    return clock
+
+
+class FanOut:
+    """단계마다 step_seconds가 흐르는 실행기 - 받은 deadline 기록"""
+
+    request_deadline = 10.0
+
+    def __init__(self, clock, step_seconds):
+        self.clock = clock
+        self.step_seconds = step_seconds
+        self.deadlines = []
+
+    def run(self, driver, queries, deadline=None):
+        self.deadlines.append(deadline)
+        self.clock.now += self.step_seconds
+        return {name: [name] for name in queries}
+
+
+class AsyncFanOut(FanOut):
+    async def run(self, driver, queries, deadline=None):
+        return FanOut.run(self, driver, queries, deadline)
+
+
+def steps(count, caught=None):
+    results = []
+    for i in range(count):
+        try:
+            results.append((yield {f'q{i}': ('RETURN 1', None)}))
+        except QueryDeadlineExceeded as e:
+            if caught is None:
+                raise
+            caught.append(str(e))
+            return results
+    return results
+
+
+def test_plan_shares_one_deadline_across_steps(clock):
+    fanout = FanOut(clock, step_seconds=3)
+    assert run_plan(fanout, None, steps(3)) == [{'q0': ['q0']}, {'q1': ['q1']}, {'q2': ['q2']}]
+    assert fanout.deadlines == [10.0, 7.0, 4.0]
+
+
+def test_plan_raises_once_the_budget_is_spent(clock):
+    fanout = FanOut(clock, step_seconds=4)
+    with pytest.raises(QueryDeadlineExceeded):
+        run_plan(fanout, None, steps(5))
+    # 세 번째 단계 뒤에는 남은 시간이 없으므로 네 번째 쿼리는 보내지 않는다
+    assert fanout.deadlines == [10.0, 6.0, 2.0]
+
+
+def test_deadline_error_is_thrown_into_the_plan(clock):
+    fanout = FanOut(clock, step_seconds=6)
+    caught = []
+    assert run_plan(fanout, None, steps(4, caught), deadline=8) == [{'q0': ['q0']}, {'q1': ['q1']}]
+    assert caught == ['Request deadline exceeded']
+    assert fanout.deadlines == [8.0, 2.0]
+
+
+def test_async_plan_shares_one_deadline(clock):
+    fanout = AsyncFanOut(clock, step_seconds=4)
+    with pytest.raises(QueryDeadlineExceeded):
+        asyncio.run(run_plan_async(fanout, None, steps(5)))
+    assert fanout.deadlines == [10.0, 6.0, 2.0]
@@ -0,0 +1,233 @@
+"""top_variance_index - 정렬 배열 추가/삭제/필터 조회와 refresh_step의 전체 / 증분 재적재 경로 (마커 버전 변경 신호)"""
+
+import pytest
+
+from top_variance_index import (RankedIndex, TopVarianceIndex, TOP_VARIANCE_DELTA_QUERY,
+                                TOP_VARIANCE_FULL_QUERY, TOP_VARIANCE_STATE_QUERY)
+
+
+def record(key, amount, product='P1', work_centers=('WC1',), month='2024-01'):
+    return key, {'id': key, 'amount': amount, 'product': product, 'work_centers': list(work_centers),
+                 'month': month}
+
+
+def ids(records):
+    return [r['id'] for r in records]
+
+
+# ---------- RankedIndex ----------
+
+@pytest.fixture
+def ranked():
+    index = RankedIndex('amount')
+    index.load([record('V1', -50), record('V2', 30, product='P2', work_centers=('WC2',)),
+                record('V3', 30, month='2024-02'), record('V4', None), record('V5', 80, work_centers=())])
+    return index
+
+
+def test_ranked_top_orders_by_absolute_amount_then_key(ranked):
+    assert ids(ranked.top(10)) == ['V5', 'V1', 'V2', 'V3', 'V4']
+    assert ids(ranked.top(2)) == ['V5', 'V1']
+    assert len(ranked) == 5
+
+
+def test_ranked_top_filters(ranked):
+    assert ids(ranked.top(10, product='P1')) == ['V5', 'V1', 'V3', 'V4']
+    assert ids(ranked.top(10, work_center='WC1')) == ['V1', 'V3', 'V4']
+    assert ids(ranked.top(10, product='P1', month='2024-02')) == ['V3']
+    assert ids(ranked.top(1, product='P1', work_center='WC1')) == ['V1']
+    assert ranked.top(10, product='P9') == []
+
+
+def test_ranked_add_replaces_and_remove_cleans_dimensions(ranked):
+    ranked.add(*record('V3', -100, product='P3', work_centers=('WC3',)))
+    assert ids(ranked.top(2)) == ['V3', 'V5']
+    assert ids(ranked.top(10, month='2024-02')) == []
+    assert ids(ranked.top(10, product='P3')) == ['V3']
+    assert len(ranked) == 5
+
+    ranked.remove('V3')
+    ranked.remove('V3')                      # 없는 키는 무시
+    assert 'P3' not in ranked.by_dimension['product']
+    assert 'WC3' not in ranked.by_dimension['work_center']
+    assert ids(ranked.top(10)) == ['V5', 'V1', 'V2', 'V4']
+
+
+def test_ranked_insert_keeps_tie_order(ranked):
+    ranked.add(*record('V0', 30))
+    assert ids(ranked.top(10))[2:5] == ['V0', 'V2', 'V3']
+
+
+# ---------- TopVarianceIndex.refresh_step ----------
+
+def variance(key, amount):
+    return {'id': key, 'variance_amount': amount, 'element_id': f'4:v:{key}', 'cost_element': 'MAT',
+            'variance_type': 'PRICE', 'variance_percent': None, 'severity': 'LOW'}
+
+
+def order_row(order_no, variances, product='P1', work_centers=('WC1',), month='2024-01'):
+    return {'order_no': order_no, 'product': product if order_no else None, 'month': month if order_no else None,
+            'work_centers': list(work_centers) if order_no else [], 'variances': variances}
+
+
+FULL_ROWS = [
+    order_row('PO1', [variance('V1', -50), variance('V2', 10)]),
+    order_row('PO2', [variance('V3', 30)], product='P2', work_centers=('WC2',)),
+    order_row(None, [variance('V4', 90)]),   # 오더 없는 Variance
+]
+
+
+class Database:
+    """쿼리 계획이 yield한 쿼리 → 고정 결과 (실행한 쿼리 이름 기록)"""
+
+    def __init__(self, count, max_variance, full_rows=FULL_ROWS, delta_rows=None, data_version='v1'):
+        self.state = {'data_version': data_version, 'variance_count': count, 'max_variance': max_variance}
+        self.full_rows = full_rows
+        self.delta_rows = delta_rows
+        self.calls = []
+
+    def refresh(self, index):
+        plan = index.refresh_step()
+        try:
+            step = next(plan)
+            while True:
+                results = {}
+                for name, (query, params, *_) in step.items():
+                    self.calls.append((name, params))
+                    if query is TOP_VARIANCE_STATE_QUERY:
+                        results[name] = self.state
+                    elif query is TOP_VARIANCE_DELTA_QUERY:
+                        results[name] = self.delta_rows
+                    else:
+                        assert query is TOP_VARIANCE_FULL_QUERY
+                        results[name] = self.full_rows
+                step = plan.send(results)
+        except StopIteration as stop:
+            return stop.value
+
+
+@pytest.fixture
+def index():
+    index = TopVarianceIndex(check_interval=0)
+    Database(4, 'V4').refresh(index)
+    return index
+
+
+def test_full_load_builds_both_rankings(index):
+    assert index.stats()['full_loads'] == 1
+    assert ids(index.top('variance', 10)) == ['V4', 'V1', 'V3', 'V2']
+    orders = index.top('order', 10)
+    assert [o['order_no'] for o in orders] == ['PO1', 'PO2']
+    assert orders[0]['total_variance'] == -40 and orders[0]['variance_count'] == 2
+    assert ids(index.top('variance', 10, product='P2')) == ['V3']
+    assert index.top('variance', 1)[0]['order_no'] is None
+    # 반환값은 복사본
+    index.top('order', 1)[0]['total_variance'] = 0
+    assert index.top('order', 1)[0]['total_variance'] == -40
+
+
+def test_unchanged_state_skips_reload(index):
+    db = Database(4, 'V4')
+    assert db.refresh(index) is index
+    assert db.calls == [('state', None)]
+    assert index.stats()['full_loads'] == 1
+
+
+def test_check_interval_skips_state_query():
+    index = TopVarianceIndex(check_interval=3600)
+    Database(4, 'V4').refresh(index)
+    db = Database(5, 'V5')
+    assert db.refresh(index) is index
+    assert db.calls == []
+
+
+def test_appended_variances_merge_through_delta(index):
+    delta = [order_row('PO2', [variance('V3', 30), variance('V5', -70)], product='P2', work_centers=('WC2',)),
+             order_row(None, [variance('V6', 1)])]
+    db = Database(6, 'V6', delta_rows=delta)
+    db.refresh(index)
+    assert [name for name, _ in db.calls] == ['state', 'delta']
+    assert db.calls[1][1] == {'after': 'V4'}
+    assert index.stats()['delta_loads'] == 1 and index.stats()['full_loads'] == 1
+    assert ids(index.top('variance', 10)) == ['V4', 'V5', 'V1', 'V3', 'V2', 'V6']
+    # 같은 금액은 키 순
+    orders = [(o['order_no'], o['total_variance']) for o in index.top('order', 10)]
+    assert orders == [('PO1', -40), ('PO2', -40)]
+    assert ids(index.top('variance', 10, work_center='WC2')) == ['V5', 'V3']
+
+
+def test_delta_that_does_not_explain_the_count_falls_back_to_full(index):
+    db = Database(7, 'V6', delta_rows=[order_row(None, [variance('V6', 1)])],
+                  full_rows=FULL_ROWS + [order_row(None, [variance('V5', 2), variance('V6', 1), variance('V0', 3)])])
+    db.refresh(index)
+    assert [name for name, _ in db.calls] == ['state', 'delta', 'rows']
+    assert index.stats()['full_loads'] == 2 and index.stats()['delta_loads'] == 0
+    assert len(index.variances) == 7
+
+
+def test_deleted_variances_reload_in_full(index):
+    db = Database(3, 'V4', full_rows=FULL_ROWS[1:])
+    db.refresh(index)
+    assert [name for name, _ in db.calls] == ['state', 'rows']
+    assert ids(index.top('variance', 10)) == ['V4', 'V3']
+    assert [o['order_no'] for o in index.top('order', 10)] == ['PO2']
+
+
+def test_invalidate_forces_full_reload_with_same_state(index):
+    index.invalidate()
+    changed = [order_row('PO1', [variance('V1', 5), variance('V2', 10)])] + FULL_ROWS[1:]
+    db = Database(4, 'V4', full_rows=changed)
+    db.refresh(index)
+    assert [name for name, _ in db.calls] == ['state', 'rows']
+    assert index.top('order', 10)[-1]['total_variance'] == 15
+
+
+def test_marker_change_reloads_in_full_even_when_count_and_max_id_match(index):
+    # 마커 없이는 구분할 수 없는 삭제(V2) + 추가(V0): 개수 4, 마지막 id V4 그대로
+    changed = [order_row('PO1', [variance('V1', -50), variance('V0', 70)])] + FULL_ROWS[1:]
+    db = Database(4, 'V4', full_rows=changed, data_version='v2')
+    db.refresh(index)
+    assert [name for name, _ in db.calls] == ['state', 'rows']
+    assert ids(index.top('variance', 10)) == ['V4', 'V0', 'V1', 'V3']
+    # 같은 마커로 다시 확인하면 변화 없음
+    db = Database(4, 'V4', data_version='v2')
+    db.refresh(index)
+    assert db.calls == [('state', None)]
+
+
+def test_appends_with_another_id_shape_reload_in_full(index):
+    delta = [order_row(None, [variance('V40', 1)])]
+    db = Database(5, 'V40', delta_rows=delta,
+                  full_rows=FULL_ROWS + [order_row(None, [variance('V40', 1)])])
+    db.refresh(index)
+    assert [name for name, _ in db.calls] == ['state', 'delta', 'rows']
+    assert index.stats()['full_loads'] == 2
+    # 자리수가 섞였으므로 이후 추가는 증분 없이 전체 조회
+    db = Database(6, 'V41', full_rows=FULL_ROWS + [order_row(None, [variance('V40', 1), variance('V41', 2)])])
+    db.refresh(index)
+    assert [name for name, _ in db.calls] == ['state', 'rows']
+
+
+def test_non_sequential_ids_disable_delta():
+    index = TopVarianceIndex(check_interval=0)
+    rows = [order_row('PO1', [variance('b-var', 5), variance('a-var', 7)])]
+    Database(2, 'b-var', full_rows=rows).refresh(index)
+    db = Database(3, 'c-var', full_rows=rows + [order_row(None, [variance('c-var', 1)])])
+    db.refresh(index)
+    assert [name for name, _ in db.calls] == ['state', 'rows']
+    assert len(index.variances) == 3
+
+
+def test_refresh_failure_keeps_previous_index(index):
+    plan = index.refresh_step()
+    next(plan)
+    with pytest.raises(StopIteration) as stop:
+        plan.throw(RuntimeError('database unavailable'))
+    assert stop.value.value is index
+    assert ids(index.top('variance', 1)) == ['V4']
+
+    cold = TopVarianceIndex(check_interval=0)
+    plan = cold.refresh_step()
+    next(plan)
+    with pytest.raises(RuntimeError):
+        plan.throw(RuntimeError('database unavailable'))
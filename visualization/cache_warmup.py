@@ -0,0 +1,104 @@
+"""
+응답 캐시 예열 (랜딩 페이지 쿼리)
+
+대시보드가 처음 여는 API(/api/filters, /api/overview, /api/summary, 기본 /api/dashboard-data,
+/api/skhynix/process-status)를 기동 직후와 데이터 갱신(캐시 비우기) 직후에
+백그라운드 스레드에서 한 번씩 호출해 응답 캐시를 채운다.
+Flask 테스트 클라이언트로 실제 라우트를 통과시키므로 캐시 키, 압축 결과 보관, 오류 처리가
+사용자 요청과 완전히 같다. 예열 중에도 서버는 바로 요청을 받는다.
+
+환경 변수:
+    CACHE_WARMUP_ENABLED   1/0 (기본 1, RESPONSE_CACHE_ENABLED=0 이면 실행하지 않음)
+"""
+
+import os
+import time
+import threading
+
+# (메서드, 경로, JSON 본문) - 본문은 대시보드가 보내는 기본(필터 없음) 요청과 같아야 캐시 키가 맞는다
+WARMUP_REQUESTS = [
+    ('GET', '/api/filters', None),
+    ('GET', '/api/overview', None),
+    ('GET', '/api/summary', None),
+    ('POST', '/api/dashboard-data', {'product': '', 'work_center': '', 'month': ''}),
+    ('GET', '/api/skhynix/process-status', None)
+]
+
+# 브라우저 기본값 - 압축 결과 보관(LRU)도 함께 채움
+_WARMUP_HEADERS = {'Accept-Encoding': 'gzip, deflate, br'}
+
+
+class CacheWarmer:
+    def __init__(self, app, requests=None, enabled=None):
+        self.app = app
+        self.requests = requests or WARMUP_REQUESTS
+        self.enabled = (os.getenv('CACHE_WARMUP_ENABLED', '1') not in ('0', 'false', 'False')
+                        if enabled is None else enabled)
+        self._lock = threading.Lock()
+        self._running = False
+        self._pending = False
+        self.runs = 0
+        self.last_run = None
+
+    def trigger(self):
+        """예열 시작 - 이미 실행 중이면 끝난 뒤 한 번 더 실행 (요청을 막지 않음)"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            if self._running:
+                self._pending = True
+                return False
+            self._running = True
+        threading.Thread(target=self._run, name='cache-warmup', daemon=True).start()
+        return True
+
+    def _run(self):
+        try:
+            while True:
+                self._warm_once()
+                with self._lock:
+                    if not self._pending:
+                        self._running = False
+                        return
+                    self._pending = False
+        except Exception as e:
+            print(f"Warning: cache warm-up failed: {e}")
+            with self._lock:
+                self._running = False
+                self._pending = False
+
+    def _warm_once(self):
+        started = time.perf_counter()
+        results = []
+        client = self.app.test_client()
+        for method, path, body in self.requests:
+            request_started = time.perf_counter()
+            try:
+                response = client.open(path, method=method, json=body, headers=_WARMUP_HEADERS)
+                status = response.status_code
+                response.close()
+            except Exception as e:
+                print(f"Warning: cache warm-up request {method} {path} failed: {e}")
+                status = None
+            results.append({
+                'method': method,
+                'path': path,
+                'status': status,
+                'ms': round((time.perf_counter() - request_started) * 1000, 1)
+            })
+        self.runs += 1
+        self.last_run = {
+            'finished_at': time.time(),
+            'ms': round((time.perf_counter() - started) * 1000, 1),
+            'requests': results
+        }
+        print(f"Response cache warmed: {sum(1 for r in results if r['status'] == 200)}/{len(results)} "
+              f"routes in {self.last_run['ms']} ms")
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'running': self._running,
+            'runs': self.runs,
+            'last_run': self.last_run
+        }
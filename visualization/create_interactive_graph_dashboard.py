@@ -60,8 +60,28 @@ class InteractiveGraphDashboard:
             return session.run(query).data()
     
     def get_top_variances(self, limit=20):
-        """상위 차이 항목 (그래프 탐색용)"""
+        """상위 차이 항목 (그래프 탐색용) - 로더가 저장한 abs_variance_amount 인덱스 순서로 상위 limit개만 읽음"""
         with self.driver.session() as session:
+            query = """
+            MATCH (v:Variance)
+            WHERE v.abs_variance_amount IS NOT NULL
+            WITH v
+            ORDER BY v.abs_variance_amount DESC
+            LIMIT $limit
+            RETURN 
+                elementId(v) as element_id,
+                v.id as id,
+                v.order_no as order_no,
+                v.cost_element as cost_element,
+                v.variance_type as variance_type,
+                v.variance_amount as amount,
+                v.variance_percent as percent,
+                v.severity as severity
+            """
+            result = session.run(query, limit=limit).data()
+            if result:
+                return result
+            # 롤업 생성 전 DB - 전체 정렬
             query = """
             MATCH (v:Variance)
             RETURN 
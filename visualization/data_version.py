@@ -0,0 +1,125 @@
+"""
+공유 데이터 버전 마커 (워커 간 캐시 무효화 + 인과 북마크)
+
+gunicorn 워커(WEB_CONCURRENCY)마다 응답 캐시, 롤업/closure 확인 상태, 필터 카탈로그,
+상위 차이 인덱스, 그래프 스냅샷을 따로 가지므로 /api/admin/cache/flush POST는 그 요청을 받은
+워커 하나만 비운다. 그래서 로더는 적재가 끝나면 Neo4j에 마커 노드 하나를 쓴다:
+
+    (:DataVersion {id: 'current', version: 새 UUID, updated_at, bookmarks: 적재 쓰기 북마크})
+
+각 워커의 DataVersionWatcher가 DATA_VERSION_CHECK_INTERVAL마다 이 노드를 읽어
+버전이 바뀌었으면 북마크를 등록하고(이후 읽기는 적재가 반영된 복제본에서만) 무효화 콜백을 실행한다.
+
+- 기동 시 처음 읽은 버전은 기준값으로만 보관 (북마크만 등록, 무효화 없음)
+- flush 요청을 받은 워커는 바로 무효화한 뒤 sync()로 기준값을 맞춘다 (같은 적재로 두 번 비우지 않음)
+- 마커가 없으면(마커를 쓰지 않는 로더로 적재) 아무것도 하지 않는다
+- 로더 없이 수동으로 flush하면 API가 DATA_VERSION_BUMP_QUERY로 버전만 새로 써서 다른 워커도 따라오게 한다
+
+환경 변수:
+    DATA_VERSION_CHECK_INTERVAL   마커 확인 주기 초 (기본 15, 0이면 확인 스레드를 띄우지 않음)
+"""
+
+import os
+import threading
+
+DATA_VERSION_QUERY = """
+MATCH (m:DataVersion {id: 'current'})
+RETURN m.version as version, m.bookmarks as bookmarks, toString(m.updated_at) as updated_at
+"""
+
+# 수동 flush - 북마크는 그대로 두고 버전만 교체
+DATA_VERSION_BUMP_QUERY = """
+MERGE (m:DataVersion {id: 'current'})
+SET m.version = randomUUID(), m.updated_at = datetime()
+RETURN m.version as version, m.bookmarks as bookmarks, toString(m.updated_at) as updated_at
+"""
+
+
+class DataVersionWatcher:
+    """read()로 마커 행(없으면 None)을 읽고 버전이 바뀌면 on_change(버전) 실행"""
+
+    def __init__(self, read, on_change, register_bookmarks=None, check_interval=None):
+        self.read = read
+        self.on_change = on_change
+        self.register_bookmarks = register_bookmarks
+        self.check_interval = (check_interval if check_interval is not None
+                               else float(os.getenv('DATA_VERSION_CHECK_INTERVAL', '15')))
+        self.version = None
+        self.updated_at = None
+        self._initialized = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.changes = 0
+        self.last_error = None
+
+    def _read(self):
+        try:
+            marker = self.read()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Warning: data version check failed: {e}")
+            return False, None
+        self.last_error = None
+        return True, marker
+
+    def check(self):
+        """마커를 한 번 읽어 버전이 바뀌었으면 무효화 - 바뀌었으면 True"""
+        ok, marker = self._read()
+        if not ok or marker is None:
+            return False
+        with self._lock:
+            version = marker['version']
+            first = not self._initialized
+            changed = not first and version != self.version
+            self._initialized = True
+            self.version = version
+            self.updated_at = marker['updated_at']
+        if first or changed:
+            if self.register_bookmarks and marker['bookmarks']:
+                self.register_bookmarks(marker['bookmarks'])
+        if changed:
+            self.changes += 1
+            print(f"Data version changed ({version}) - invalidating worker caches")
+            try:
+                self.on_change(version)
+            except Exception as e:
+                print(f"Warning: data version invalidation failed: {e}")
+        return changed
+
+    def sync(self):
+        """이 워커가 방금 직접 무효화함 - 현재 마커를 기준값으로만 받아들인다"""
+        ok, marker = self._read()
+        if not ok:
+            return
+        self.accept(marker or {'version': None, 'updated_at': None})
+
+    def accept(self, marker):
+        """이 워커가 방금 직접 무효화하고 쓴 마커 - 기준값으로만 받아들인다"""
+        with self._lock:
+            self._initialized = True
+            self.version = marker['version']
+            self.updated_at = marker['updated_at']
+
+    def _run(self):
+        self.check()
+        while not self._stop.wait(self.check_interval):
+            self.check()
+
+    def start(self):
+        if self.check_interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='data-version', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'updated_at': self.updated_at,
+            'check_interval': self.check_interval,
+            'changes': self.changes,
+            'last_error': self.last_error
+        }
@@ -0,0 +1,204 @@
+"""
+Neo4j 드라이버 연결 풀 설정 + 기동 시 연결 예열
+
+Flask 서버(Neo4jConnection)와 ASGI 서버(AsyncNeo4jConnection)가 같은 설정을 사용한다.
+예열을 켜면 워커가 요청을 받기 전에 verify_connectivity()로 라우팅/인증을 확인하고
+N개의 연결을 동시에 열어 풀에 채워 두므로, 배포/스케일 아웃 직후 첫 요청들이
+TLS 핸드셰이크 비용을 치르지 않는다.
+
+환경 변수:
+    NEO4J_MAX_POOL_SIZE                 최대 연결 수 (기본 100)
+    NEO4J_MAX_CONNECTION_LIFETIME       연결 최대 수명 초 (기본 3600)
+    NEO4J_CONNECTION_ACQUISITION_TIMEOUT  풀에서 연결을 얻기까지 대기 초 (기본 60)
+    NEO4J_CONNECTION_TIMEOUT            새 연결 수립 타임아웃 초 (기본 30)
+    NEO4J_KEEP_ALIVE                    TCP keep-alive 1/0 (기본 1)
+    NEO4J_WARMUP_CONNECTIONS            기동 시 미리 열 연결 수 (기본 0 = 예열 안 함)
+    NEO4J_WARMUP_TIMEOUT                예열 전체 대기 초 (기본 30)
+    NEO4J_DATABASE                      조회 대상 데이터베이스 (미설정 시 서버 기본 DB)
+
+API의 모든 세션은 읽기 모드(READ_ACCESS)로 열리므로 클러스터/Aura에서는 팔로워/읽기 복제본으로
+라우팅된다. 로더가 쓰기 후 넘겨준 북마크(register_bookmarks)가 있으면 이후 읽기는
+해당 쓰기가 반영된 서버에서만 실행된다.
+"""
+
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from neo4j import READ_ACCESS, Bookmarks
+
+WARMUP_QUERY = "RETURN 1"
+
+# 로더(관리자 쓰기)가 전달한 마지막 인과 북마크
+_bookmarks = {'values': frozenset()}
+
+
+def driver_options():
+    """GraphDatabase.driver / AsyncGraphDatabase.driver 공용 풀 설정"""
+    return {
+        'max_connection_pool_size': int(os.getenv('NEO4J_MAX_POOL_SIZE', '100')),
+        'max_connection_lifetime': float(os.getenv('NEO4J_MAX_CONNECTION_LIFETIME', '3600')),
+        'connection_acquisition_timeout': float(os.getenv('NEO4J_CONNECTION_ACQUISITION_TIMEOUT', '60')),
+        'connection_timeout': float(os.getenv('NEO4J_CONNECTION_TIMEOUT', '30')),
+        'keep_alive': os.getenv('NEO4J_KEEP_ALIVE', '1') not in ('0', 'false', 'False')
+    }
+
+
+def register_bookmarks(values):
+    """쓰기 트랜잭션의 북마크 등록 - 이후 읽기 세션은 이 쓰기 이후 상태를 보장받는다"""
+    _bookmarks['values'] = frozenset(v for v in (values or []) if v)
+    return len(_bookmarks['values'])
+
+
+def read_session_config():
+    """읽기 전용 라우트 세션 설정 (읽기 라우팅 + 데이터베이스 + 인과 북마크)"""
+    config = {'default_access_mode': READ_ACCESS}
+    database = os.getenv('NEO4J_DATABASE')
+    if database:
+        config['database'] = database
+    if _bookmarks['values']:
+        config['bookmarks'] = Bookmarks.from_raw_values(_bookmarks['values'])
+    return config
+
+
+def warmup_size(options=None):
+    """예열할 연결 수 (풀 크기를 넘지 않음)"""
+    size = int(os.getenv('NEO4J_WARMUP_CONNECTIONS', '0'))
+    pool_size = (options or driver_options())['max_connection_pool_size']
+    return max(0, min(size, pool_size))
+
+
+def warm_up(driver, connections, timeout=None):
+    """연결 확인 후 connections개 연결을 동시에 점유했다가 반납해 풀을 채움 → 동시에 잡은 연결 수
+
+    실패해도 예외를 올리지 않는다.
+    """
+    if not driver or connections <= 0:
+        return 0
+    timeout = timeout or float(os.getenv('NEO4J_WARMUP_TIMEOUT', '30'))
+    try:
+        driver.verify_connectivity()
+    except Exception as e:
+        print(f"Warning: Neo4j connectivity check failed during warm-up: {e}")
+        return 0
+
+    # 자동 커밋 결과는 consume() 직후 연결을 풀에 돌려주므로, 세션 N개가 기다려도 연결 하나로
+    # 모두 처리될 수 있다. 명시적 트랜잭션을 열어 두면 닫을 때까지 연결을 점유하므로
+    # 모든 세션이 트랜잭션을 연 뒤에 함께 닫아야 서로 다른 연결 N개가 열린다.
+    # 실패한 세션은 기다릴 수를 줄이고, 나머지가 모두 트랜잭션을 열면 함께 닫는다
+    lock = threading.Lock()
+    released = threading.Event()
+    state = {'held': 0, 'expected': connections, 'peak': None}
+
+    def arrive(held=0, expected=0):
+        with lock:
+            state['held'] += held
+            state['expected'] += expected
+            if state['held'] >= state['expected']:
+                release_locked()
+
+    def release_locked():
+        if state['peak'] is None:
+            state['peak'] = state['held']  # 이 시점까지 연 트랜잭션은 모두 아직 연결을 잡고 있음
+        released.set()
+
+    def release():
+        with lock:
+            release_locked()
+
+    def hold_connection():
+        with driver.session(**read_session_config()) as session:
+            tx = None
+            try:
+                tx = session.begin_transaction()
+                tx.run(WARMUP_QUERY).consume()
+            except Exception:
+                arrive(expected=-1)
+                if tx is not None:
+                    tx.close()
+                raise
+            try:
+                arrive(held=1)
+                released.wait(timeout=timeout)
+            finally:
+                tx.close()
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=connections, thread_name_prefix='neo4j-warmup') as pool:
+        futures = [pool.submit(hold_connection) for _ in range(connections)]
+        for future in futures:
+            try:
+                future.result(timeout=timeout)
+            except Exception as e:
+                failed += 1
+                print(f"Warning: Neo4j warm-up connection failed: {e}")
+        release()
+    opened = state['peak']
+    print(f"Neo4j connection pool warmed: {opened}/{connections} connections held at once"
+          + (f" ({failed} failed)" if failed else ""))
+    return opened
+
+
+async def async_warm_up(driver, connections, timeout=None):
+    """warm_up의 AsyncDriver 버전"""
+    if not driver or connections <= 0:
+        return 0
+    timeout = timeout or float(os.getenv('NEO4J_WARMUP_TIMEOUT', '30'))
+    try:
+        await driver.verify_connectivity()
+    except Exception as e:
+        print(f"Warning: Neo4j connectivity check failed during warm-up: {e}")
+        return 0
+
+    # warm_up과 같이 명시적 트랜잭션으로 연결을 점유한 채 모두 열릴 때까지 기다린다
+    released = asyncio.Event()
+    state = {'held': 0, 'expected': connections, 'peak': None}
+
+    def arrive(held=0, expected=0):
+        state['held'] += held
+        state['expected'] += expected
+        if state['held'] >= state['expected']:
+            release()
+
+    def release():
+        if state['peak'] is None:
+            state['peak'] = state['held']
+        released.set()
+
+    async def hold_connection():
+        async with driver.session(**read_session_config()) as session:
+            tx = None
+            try:
+                tx = await session.begin_transaction()
+                result = await tx.run(WARMUP_QUERY)
+                await result.consume()
+            except Exception:
+                arrive(expected=-1)
+                if tx is not None:
+                    await tx.close()
+                raise
+            try:
+                arrive(held=1)
+                await released.wait()
+            finally:
+                await tx.close()
+
+    tasks = [asyncio.ensure_future(hold_connection()) for _ in range(connections)]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    release()
+    if pending:
+        # 시간 안에 모두 열리지 않음 - 연 트랜잭션은 release()로 닫히고 나머지는 취소
+        done_late, pending = await asyncio.wait(pending, timeout=1)
+        done |= done_late
+        for task in pending:
+            task.cancel()
+    failed = 0
+    for task in done:
+        if task.exception() is not None:
+            failed += 1
+            print(f"Warning: Neo4j warm-up connection failed: {task.exception()}")
+    opened = state['peak']
+    print(f"Neo4j connection pool warmed: {opened}/{connections} connections held at once"
+          + (f" ({failed} failed)" if failed else ""))
+    return opened
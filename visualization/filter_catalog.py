@@ -0,0 +1,215 @@
+"""
+필터 카탈로그 (제품 / 공정 / 원자재 / 기간)
+
+/api/filters 목록을 쿼리 하나로 한 번에 만들고 프로세스 메모리에 보관한다.
+CATALOG_CHECK_INTERVAL마다 가벼운 상태 쿼리(오더/원자재 개수, 마지막 오더 id)로 변경을 확인하고,
+- 변화 없음: 보관한 카탈로그를 그대로 사용
+- 새 오더만 추가됨(마지막 id 이후): 추가된 오더의 제품/공정/기간만 조회해 병합
+- 그 외(삭제, 원자재 변경, 재적재): 전체 다시 조회
+목록마다 소문자 정렬 인덱스를 두어 접두어 검색을 이분 탐색으로 처리한다.
+
+refresh_step()은 graph_api_server의 쿼리 계획 단계로 yield from 으로 사용한다.
+
+환경 변수:
+    FILTER_CATALOG_CHECK_INTERVAL   변경 확인 주기 초 (기본 60)
+"""
+
+import os
+import time
+import threading
+from bisect import bisect_left
+
+from query_executor import fetch_single
+
+# 한 번의 조회로 네 목록 + 변경 확인용 상태값
+CATALOG_FULL_QUERY = """
+CALL {
+    MATCH (po:ProductionOrder)
+    RETURN count(po) as order_count,
+           max(po.id) as max_order,
+           collect(DISTINCT po.product_cd) as products,
+           collect(DISTINCT po.month) as months
+}
+CALL {
+    OPTIONAL MATCH (:ProductionOrder)-[:WORKS_AT]->(wc:WorkCenter)
+    RETURN collect(DISTINCT wc.id) as work_centers
+}
+CALL {
+    MATCH (m:Material)
+    RETURN count(m) as material_count,
+           collect({id: m.id, name: m.name}) as materials
+}
+RETURN order_count, max_order, products, months, work_centers, material_count, materials
+"""
+
+# 변경 확인 - 개수는 카운트 저장소, 마지막 id는 인덱스 역순 조회로 읽는다
+CATALOG_STATE_QUERY = """
+CALL {
+    MATCH (po:ProductionOrder)
+    RETURN count(po) as order_count
+}
+CALL {
+    MATCH (m:Material)
+    RETURN count(m) as material_count
+}
+CALL {
+    MATCH (po:ProductionOrder)
+    WHERE po.id IS NOT NULL
+    RETURN po.id as max_order
+    ORDER BY po.id DESC
+    LIMIT 1
+}
+RETURN order_count, material_count, max_order
+"""
+
+# 마지막으로 본 오더 이후 추가된 오더만
+CATALOG_DELTA_QUERY = """
+MATCH (po:ProductionOrder)
+WHERE po.id > $after
+OPTIONAL MATCH (po)-[:WORKS_AT]->(wc:WorkCenter)
+RETURN count(DISTINCT po) as order_count,
+       max(po.id) as max_order,
+       collect(DISTINCT po.product_cd) as products,
+       collect(DISTINCT po.month) as months,
+       collect(DISTINCT wc.id) as work_centers
+"""
+
+SEARCH_KINDS = ('products', 'work_centers', 'materials', 'months')
+
+
+def _prefix_index(values):
+    """[(검색 키, 원래 위치)] 소문자 정렬 인덱스"""
+    return sorted((str(key).lower(), position) for position, key in values if key is not None)
+
+
+class CatalogState:
+    """불변 카탈로그 - 갱신 시 새 객체를 만들어 참조만 교체"""
+
+    def __init__(self, products, work_centers, materials, months, order_count, max_order, material_count):
+        self.products = sorted(p for p in set(products) if p)
+        self.work_centers = sorted(w for w in set(work_centers) if w)
+        self.materials = sorted(
+            ({'id': m['id'], 'name': m.get('name') or m['id']} for m in materials if m and m.get('id')),
+            key=lambda m: m['id'])
+        self.months = sorted((m for m in set(months) if m), reverse=True)
+        self.order_count = order_count
+        self.max_order = max_order
+        self.material_count = material_count
+        self.loaded_at = time.time()
+        self._indexes = {
+            'products': _prefix_index(enumerate(self.products)),
+            'work_centers': _prefix_index(enumerate(self.work_centers)),
+            'months': _prefix_index(enumerate(self.months)),
+            # 원자재는 코드와 이름 모두 접두어로 찾음
+            'materials': _prefix_index(
+                [(i, m['id']) for i, m in enumerate(self.materials)]
+                + [(i, m['name']) for i, m in enumerate(self.materials)])
+        }
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row['products'] or [], row['work_centers'] or [], row['materials'] or [],
+                   row['months'] or [], row['order_count'], row['max_order'], row['material_count'])
+
+    def merged(self, delta):
+        """추가된 오더 조회 결과 병합"""
+        return CatalogState(
+            self.products + list(delta['products'] or []),
+            self.work_centers + list(delta['work_centers'] or []),
+            self.materials,
+            self.months + list(delta['months'] or []),
+            self.order_count + delta['order_count'],
+            max(filter(None, (self.max_order, delta['max_order'])), default=None),
+            self.material_count)
+
+    def payload(self):
+        return {
+            'products': self.products,
+            'work_centers': self.work_centers,
+            'materials': self.materials,
+            'months': self.months
+        }
+
+    def search(self, kind, prefix, limit):
+        """kind 목록에서 접두어(대소문자 무시)로 시작하는 항목 최대 limit개"""
+        index = self._indexes[kind]
+        items = getattr(self, kind)
+        prefix = prefix.lower()
+        matches = []
+        seen = set()
+        for key, position in index[bisect_left(index, (prefix, -1)):]:
+            if not key.startswith(prefix):
+                break
+            if position in seen:
+                continue
+            seen.add(position)
+            matches.append(position)
+            if len(matches) >= limit:
+                break
+        return [items[position] for position in sorted(matches)]
+
+
+class FilterCatalog:
+    def __init__(self, check_interval=None):
+        self.check_interval = (check_interval if check_interval is not None
+                               else float(os.getenv('FILTER_CATALOG_CHECK_INTERVAL', '60')))
+        self._state = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.full_loads = 0
+        self.delta_loads = 0
+
+    def invalidate(self):
+        """데이터 재적재 후 - 다음 요청에서 바로 변경 확인"""
+        self._checked_at = 0.0
+
+    def refresh_step(self):
+        """쿼리 계획 단계 - 필요할 때만 상태/증분/전체 쿼리를 yield하고 최신 CatalogState 반환"""
+        state = self._state
+        now = time.monotonic()
+        if state is not None and now - self._checked_at < self.check_interval:
+            return state
+        try:
+            if state is not None:
+                probe = (yield {'state': (CATALOG_STATE_QUERY, None, fetch_single)})['state']
+                if probe is None:
+                    state = None
+                elif (probe['order_count'] == state.order_count and probe['max_order'] == state.max_order
+                      and probe['material_count'] == state.material_count):
+                    self._checked_at = now
+                    return state
+                elif (probe['material_count'] == state.material_count and state.max_order is not None
+                      and probe['order_count'] > state.order_count):
+                    delta = (yield {'delta': (CATALOG_DELTA_QUERY, {'after': state.max_order}, fetch_single)})['delta']
+                    # 마지막 id 이후에만 추가된 경우에만 병합 (중간 삽입/삭제는 전체 조회)
+                    if delta and state.order_count + delta['order_count'] == probe['order_count']:
+                        state = state.merged(delta)
+                        self.delta_loads += 1
+                    else:
+                        state = None
+                else:
+                    state = None
+            if state is None:
+                row = (yield {'catalog': (CATALOG_FULL_QUERY, None, fetch_single)})['catalog']
+                state = CatalogState.from_row(row) if row else CatalogState([], [], [], [], 0, None, 0)
+                self.full_loads += 1
+        except Exception as e:
+            if self._state is None:
+                raise
+            # 확인 실패 시 이전 카탈로그로 응답 (다음 요청에서 다시 확인)
+            print(f"Warning: filter catalog refresh failed: {e}")
+            return self._state
+        with self._lock:
+            self._state = state
+            self._checked_at = now
+        return state
+
+    def stats(self):
+        state = self._state
+        return {
+            'loaded': state is not None,
+            'loaded_at': state.loaded_at if state else None,
+            'full_loads': self.full_loads,
+            'delta_loads': self.delta_loads,
+            'counts': {kind: len(getattr(state, kind)) for kind in SEARCH_KINDS} if state else None
+        }
@@ -0,0 +1,258 @@
+"""
+그래프 API 비동기(ASGI) 서버
+
+graph_api_server의 공유 쿼리 계획을 neo4j AsyncGraphDatabase 드라이버 위에서 실행한다.
+요청 하나가 Neo4j 응답을 기다리는 동안 스레드를 점유하지 않으므로
+프로세스 하나가 수백 개의 대시보드 요청을 동시에 처리할 수 있다.
+공유 계획이 없는 나머지 라우트는 같은 Flask 앱을 WSGI 어댑터로 마운트해 그대로 제공하며
+ASGI_WSGI_THREADS개 스레드에서 동기 드라이버로 실행된다 (THREAD_BOUND_ROUTES 참고).
+그래프 라우트의 ?stream=1 (NDJSON 스트리밍) 요청도 Flask 스트리밍 응답으로 위임한다.
+
+실행:
+    gunicorn -k uvicorn.workers.UvicornWorker --chdir visualization graph_api_asgi:app
+    (또는 SERVER_MODE=asgi ./run_services.sh)
+
+환경 변수:
+    ASGI_WSGI_THREADS   WSGI로 위임된 라우트를 실행할 스레드 수 (기본 16)
+    그 외 NEO4J_* / QUERY_* / RESPONSE_CACHE_* / HTTP_* 설정은 Flask 서버와 동일
+"""
+
+import os
+import re
+import time
+import contextlib
+
+from a2wsgi import WSGIMiddleware
+from neo4j import AsyncGraphDatabase
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route, Mount
+from werkzeug.datastructures import MultiDict
+
+import graph_api_server as shared
+from driver_config import driver_options, warmup_size, async_warm_up
+from json_encoder import dumps_bytes
+from graph_wire_format import parse_graph_format, format_graph_payload
+from query_executor import AsyncQueryFanOut, run_plan_async
+from metrics import query_scope, observe_request, observe_serialization, register_collector, driver_pool_metrics
+
+
+# (Flask 경로, 메서드, Flask 엔드포인트 이름, 쿼리 계획, 빈 응답, 캐시 TTL - None이면 캐시하지 않음)
+# 엔드포인트 이름을 Flask 라우트와 맞춰 응답 캐시 통계/비우기가 동일하게 동작한다.
+SHARED_ROUTES = [
+    ('/api/overview', 'GET', 'get_overview', shared.overview_plan, shared.empty_graph, 600),
+    ('/api/summary', 'GET', 'get_summary', shared.summary_plan, list, 600),
+    ('/api/filters', 'GET', 'get_filters', shared.filters_plan, shared.empty_filters, 60),
+    ('/api/filters/search', 'GET', 'search_filters', shared.filters_search_plan, shared.empty_filter_search, None),
+    ('/api/filtered_summary', 'POST', 'get_filtered_summary',
+     shared.filtered_summary_plan, shared.empty_filtered_summary, 300),
+    ('/api/dashboard-data', 'POST', 'get_dashboard_data',
+     shared.dashboard_data_plan, shared.empty_dashboard_response, 300),
+    ('/api/variances/top', 'GET', 'get_top_variances', shared.top_variances_plan, shared.empty_top_variances, 60),
+    ('/api/comparison-data', 'POST', 'get_comparison_data',
+     shared.comparison_data_plan, shared.empty_comparison, 300),
+    ('/api/node/<node_id>/expand', 'GET', 'expand_node', shared.expand_node_plan, shared.empty_graph, 300),
+    ('/api/graph/batch', 'POST', 'get_graph_batch', shared.graph_batch_plan, shared.empty_graph_batch, 300),
+    ('/api/skhynix/process-status', 'GET', 'get_skhynix_process_status',
+     shared.skhynix_process_status_plan, list, 300),
+    ('/api/variance/<variance_id>/graph', 'GET', 'get_variance_graph',
+     shared.variance_graph_plan, shared.empty_graph, 300),
+    ('/api/cause/<cause_code>/graph', 'GET', 'get_cause_graph', shared.cause_graph_plan, shared.empty_graph, 300),
+    ('/api/product/<product_cd>/graph', 'GET', 'get_product_graph',
+     shared.product_graph_plan, shared.empty_graph, 300),
+    ('/api/material/<material_id>/graph', 'GET', 'get_material_graph',
+     shared.material_graph_plan, shared.empty_graph, 300),
+    ('/api/workcenter/<workcenter_id>/graph', 'GET', 'get_workcenter_graph',
+     shared.workcenter_graph_plan, shared.empty_graph, 300),
+    ('/api/production-order/<order_no>/graph', 'GET', 'get_production_order_graph',
+     shared.production_order_graph_plan, shared.empty_graph, 300),
+    ('/api/analysis/cost-allocation/<workcenter_id>', 'GET', 'get_cost_allocation_graph',
+     shared.cost_allocation_graph_plan, shared.empty_graph, 300),
+    ('/api/analysis/comparison/mom/<product_id>', 'GET', 'get_mom_comparison', shared.mom_comparison_plan, list, 600),
+    ('/api/analysis/root-cause/<variance_id>', 'GET', 'get_root_cause_graph',
+     shared.root_cause_graph_plan, shared.empty_graph, 300),
+    ('/api/path', 'GET', 'get_path', shared.path_plan, shared.empty_path, 300),
+]
+
+# ?stream=1 이면 Flask의 NDJSON 스트리밍 응답으로 위임하는 라우트
+STREAMING_ENDPOINTS = {'get_product_graph', 'get_material_graph', 'get_workcenter_graph',
+                       'get_production_order_graph', 'get_cost_allocation_graph'}
+
+# 공유 계획이 없어 WSGI 스레드(ASGI_WSGI_THREADS)에서 동기 드라이버로 실행되는 API 라우트
+# (README_DOCKER.md에도 같은 목록) - 정적 페이지와 위 스트리밍 요청 외에는 이것뿐이어야 한다.
+THREAD_BOUND_ROUTES = [
+    '/api/variances/by-type',
+    '/api/variances/by-element',
+    '/api/process-status',
+    '/api/order-costs/<order_id>',
+    '/api/graph-data',
+    '/api/skhynix/alerts',
+    '/api/skhynix/waterfall/<node_id>',
+    '/api/skhynix/mom/<product_id>',
+    '/api/skhynix/events',
+    '/api/test/produces/<order_no>',
+    '/api/admin/*',
+    '/api/_debug/slow-queries',
+    '/metrics',
+]
+
+
+class AsyncNeo4jConnection:
+    """Neo4jConnection의 AsyncDriver 버전 - 연결 실패해도 서버는 기동"""
+
+    def __init__(self):
+        self.driver = None
+
+    def open(self):
+        uri = os.getenv('NEO4J_URI')
+        username = os.getenv('NEO4J_USERNAME')
+        password = os.getenv('NEO4J_PASSWORD')
+        if not uri or not password:
+            print("Warning: NEO4J_URI or NEO4J_PASSWORD not set. API will return empty data.")
+            return
+        try:
+            print(f"Connecting to Neo4j (async): {uri}")
+            self.driver = AsyncGraphDatabase.driver(uri, auth=(username, password), **driver_options())
+        except Exception as e:
+            print(f"Warning: Neo4j async driver init failed: {e}. API will return empty data.")
+            self.driver = None
+
+    async def warm_up(self):
+        await async_warm_up(self.driver, warmup_size())
+
+    async def close(self):
+        if self.driver:
+            try:
+                await self.driver.close()
+            except Exception:
+                pass
+            self.driver = None
+
+
+async_conn = AsyncNeo4jConnection()
+async_fanout = AsyncQueryFanOut()
+register_collector(lambda: driver_pool_metrics(async_conn.driver, 'async'))
+
+
+def finish_response(request, body, status=200, media_type='application/json'):
+    """Flask 서버와 같은 ETag/압축 규칙 적용"""
+    headers = {}
+    if status == 200:
+        status, headers, body = shared.http_compression.prepare(
+            body, request.method,
+            if_none_match=request.headers.get('if-none-match'),
+            accept_encoding=request.headers.get('accept-encoding'))
+    return Response(body, status_code=status, headers=headers, media_type=media_type)
+
+
+def make_endpoint(path, endpoint, plan_factory, empty, ttl):
+    cache = shared.response_cache
+
+    async def handle(request):
+        # Flask 훅과 같은 지표 (라우트 지연/응답 크기, 쿼리 이름 앞부분)
+        started = time.perf_counter()
+        token = query_scope.set(endpoint)
+        try:
+            response = await respond(request)
+        finally:
+            query_scope.reset(token)
+        observe_request(path, request.method, response.status_code,
+                        time.perf_counter() - started, len(response.body))
+        return response
+
+    async def respond(request):
+        args = MultiDict(list(request.query_params.multi_items()))
+        body = None
+        if request.method != 'GET':
+            try:
+                body = await request.json()
+            except Exception:
+                body = None
+
+        key = None
+        if cache.enabled and ttl:
+            key = cache.build_key(endpoint, request.path_params, args.items(multi=True), body)
+            entry = cache.lookup(endpoint, key)
+            if entry is not None:
+                cached_body, status, mimetype = entry
+                response = finish_response(request, cached_body, status, mimetype)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+        if not async_conn.driver:
+            return finish_response(request, dumps_bytes(empty()))
+        try:
+            plan = plan_factory(args, body or {}, **request.path_params)
+            result = await run_plan_async(async_fanout, async_conn.driver, plan)
+            serialize_started = time.perf_counter()
+            payload = dumps_bytes(format_graph_payload(result, parse_graph_format(args)))
+            observe_serialization(time.perf_counter() - serialize_started)
+        except shared.InvalidArguments as e:
+            return finish_response(request, dumps_bytes({'error': str(e)}), status=400)
+        except shared.NotFound as e:
+            return finish_response(request, dumps_bytes({'error': str(e)}), status=404)
+        except Exception:
+            import traceback
+            traceback.print_exc()
+            return finish_response(request, dumps_bytes(empty()))
+
+        if key is not None:
+            cache.store(key, payload, 200, 'application/json', ttl)
+        response = finish_response(request, payload)
+        response.headers['X-Cache'] = 'MISS'
+        return response
+
+    handle.__name__ = endpoint
+    return handle
+
+
+class StreamDelegate:
+    """?stream=1 요청은 WSGI로 마운트한 Flask 앱(스트리밍 응답)으로, 나머지는 공유 계획 엔드포인트로"""
+
+    def __init__(self, endpoint, fallback):
+        self.endpoint = endpoint
+        self.fallback = fallback
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        if shared.wants_stream(MultiDict(list(request.query_params.multi_items()))):
+            await self.fallback(scope, receive, send)
+            return
+        response = await self.endpoint(request)
+        await response(scope, receive, send)
+
+
+def _starlette_path(flask_path):
+    return re.sub(r'<(?:\w+:)?(\w+)>', r'{\1}', flask_path)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # 예열이 끝난 뒤에 uvicorn이 startup 완료를 알리고 요청을 받는다
+    async_conn.open()
+    await async_conn.warm_up()
+    try:
+        yield
+    finally:
+        await async_conn.close()
+
+
+# 공유 계획이 없는 라우트는 Flask 앱으로 위임
+wsgi_app = WSGIMiddleware(shared.app, workers=int(os.getenv('ASGI_WSGI_THREADS', '16')))
+
+routes = []
+for path, method, endpoint, plan_factory, empty, ttl in SHARED_ROUTES:
+    handler = make_endpoint(path, endpoint, plan_factory, empty, ttl)
+    if endpoint in STREAMING_ENDPOINTS:
+        handler = StreamDelegate(handler, wsgi_app)
+    routes.append(Route(_starlette_path(path), handler, methods=[method]))
+routes.append(Mount('/', app=wsgi_app))
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
@@ -8,32 +8,41 @@ Flask 기반 REST API로 Neo4j 그래프 데이터를 동적으로 제공
 """
 
 import os
+import re
 import ssl
 import json
+import base64
+import heapq
+import time
+from bisect import bisect_right
 from datetime import datetime
-from flask import Flask, jsonify, request, send_file
+from functools import wraps
+from flask import Flask, jsonify, request, send_file, Response, stream_with_context, g
 from flask_cors import CORS
 from neo4j import GraphDatabase
-from neo4j.time import DateTime, Date
 from dotenv import load_dotenv
+from driver_config import driver_options, warmup_size, warm_up, read_session_config, register_bookmarks
+from json_encoder import Neo4jJSONProvider, dumps_bytes
+from query_executor import QueryFanOut, ReadSession, fetch_single, fetch_data, run_plan
+from response_cache import ResponseCache, LRUCacheBackend
+from http_compression import ConditionalCompression
+from graph_snapshot import SnapshotEngine, read_snapshot
+from path_finder import path_index, step_cost, PATH_WEIGHT_PROPERTIES
+from graph_wire_format import parse_graph_format, format_graph_payload
+from cache_warmup import CacheWarmer
+from data_version import DataVersionWatcher, DATA_VERSION_QUERY, DATA_VERSION_BUMP_QUERY
+from filter_catalog import FilterCatalog, SEARCH_KINDS as FILTER_SEARCH_KINDS
+from top_variance_index import TopVarianceIndex, KINDS as TOP_VARIANCE_KINDS
+from query_profiler import slow_query_log
+from metrics import RequestMetrics, register_collector, driver_pool_metrics, render as render_metrics
 
 load_dotenv()
 
 app = Flask(__name__)
+app.json = Neo4jJSONProvider(app)  # Neo4j 타입을 한 번에 bytes로 직렬화
 CORS(app)  # CORS 활성화
 
 
-def serialize_neo4j_types(obj):
-    """Neo4j 타입을 JSON 직렬화 가능한 형태로 변환"""
-    if isinstance(obj, (DateTime, Date)):
-        return obj.isoformat()
-    elif isinstance(obj, dict):
-        return {k: serialize_neo4j_types(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [serialize_neo4j_types(item) for item in obj]
-    return obj
-
-
 def variance_color(amount):
     """차이 금액 크기에 따른 색상"""
     try:
@@ -76,10 +85,18 @@ class Neo4jConnection:
         try:
             print(f"Connecting to Neo4j: {uri}")
             print(f"Username: {username}")
-            self.driver = GraphDatabase.driver(uri, auth=(username, password))
+            options = driver_options()
+            self.driver = GraphDatabase.driver(uri, auth=(username, password), **options)
         except Exception as e:
             print(f"Warning: Neo4j driver init failed: {e}. API will return empty data.")
             self.driver = None
+            return
+        # 워커가 요청을 받기 전(모듈 로드 시점)에 연결 풀 예열
+        warm_up(self.driver, warmup_size(options))
+
+    def read_session(self, **kwargs):
+        """읽기 전용 라우트용 세션 - run()이 관리형 읽기 트랜잭션으로 실행된다"""
+        return ReadSession(self.driver.session(**read_session_config(), **kwargs))
 
     def close(self):
         if self.driver:
@@ -93,245 +110,769 @@ class Neo4jConnection:
 # 전역 연결 객체 (연결 실패해도 서버는 기동)
 neo4j_conn = Neo4jConnection()
 
+# 요청 내 독립 쿼리 병렬 실행기
+query_fanout = QueryFanOut()
+
+# 읽기 전용 라우트 응답 캐시 (로더 실행 후 /api/admin/cache/flush 로 비움)
+response_cache = ResponseCache()
+
+# 라우트별 지연/응답 크기 지표 - 압축 훅보다 먼저 등록해야 압축 후 크기와 304 상태를 본다
+request_metrics = RequestMetrics(app)
+
+# 응답 압축(gzip/br) + 내용 해시 ETag / 304 처리
+http_compression = ConditionalCompression(app)
+
+# /api/filters 목록 (메모리 보관 + 증분 갱신)
+filter_catalog = FilterCatalog()
+
+# 상위 차이 Variance / 오더 (메모리 정렬 배열 + 증분 갱신)
+top_variance_index = TopVarianceIndex()
+
+# VarianceRollup 존재 여부 (로더의 build_variance_rollups 실행 여부) 캐시
+_ROLLUP_CHECK_TTL = 60
+_rollup_state = {'ready': False, 'checked_at': 0.0}
+ROLLUP_CHECK_QUERY = "MATCH (r:VarianceRollup) RETURN count(r) > 0 as ready"
+
+# ROOT_CAUSE closure 존재 여부 (로더의 build_root_cause_closure 실행 여부) 캐시
+_root_cause_state = {'ready': False, 'checked_at': 0.0}
+ROOT_CAUSE_CHECK_QUERY = "MATCH ()-[r:ROOT_CAUSE]->() RETURN count(r) > 0 as ready"
+
+
+def _derived_ready_step(state, query, name):
+    """로더가 만드는 파생 데이터 존재 여부 확인 단계 (TTL 동안 결과 재사용)"""
+    now = time.monotonic()
+    if now - state['checked_at'] < _ROLLUP_CHECK_TTL:
+        return state['ready']
+    ready = False
+    try:
+        row = (yield {'ready': (query, None, fetch_single)})['ready']
+        ready = bool(row and row['ready'])
+    except Exception as e:
+        print(f"Warning: {name} check failed: {e}")
+    state.update(ready=ready, checked_at=now)
+    return ready
+
+
+def rollups_ready_step():
+    """쿼리 계획 단계 - 롤업 노드가 있으면 집계 API가 원본 Variance 대신 롤업을 읽는다
+
+    TTL 동안 결과를 재사용하며 계획 안에서 yield from 으로 사용한다.
+    """
+    return (yield from _derived_ready_step(_rollup_state, ROLLUP_CHECK_QUERY, 'VarianceRollup'))
+
+
+def root_cause_closure_ready_step():
+    """쿼리 계획 단계 - ROOT_CAUSE 관계가 있으면 원인 추적이 4홉 경로 대신 closure를 읽는다"""
+    return (yield from _derived_ready_step(_root_cause_state, ROOT_CAUSE_CHECK_QUERY, 'ROOT_CAUSE closure'))
+
+
+def reset_rollup_state():
+    """로더 재실행 후 - 롤업 / ROOT_CAUSE closure 존재 여부를 다음 요청에서 다시 확인"""
+    _rollup_state['checked_at'] = 0.0
+    _root_cause_state['checked_at'] = 0.0
+
+
+# ==========================================
+# 공유 쿼리 계획 (Flask / ASGI 공용)
+# ==========================================
+# 계획 함수는 (args, body, **경로 파라미터)를 받아 {name: (query, params[, fetch])}를
+# yield하고 결과를 받아 최종 응답 본문을 return하는 제너레이터다.
+# Flask 라우트는 serve_plan()으로 스레드 fan-out 실행기에서,
+# graph_api_asgi는 같은 계획을 AsyncDriver 위에서 구동한다.
+
+class InvalidArguments(ValueError):
+    """요청 파라미터 오류 (400 응답)"""
+
+
+class NotFound(LookupError):
+    """요청한 중심 노드가 없음 (404 응답)"""
+
+
+def serve_plan(plan_factory, empty, **view_args):
+    """Flask 라우트에서 쿼리 계획 실행 - DB 오류 시 empty() 응답 (캐시하지 않음)"""
+    if not neo4j_conn.driver:
+        response_cache.skip()
+        return jsonify(empty())
+    try:
+        plan = plan_factory(request.args, request.get_json(silent=True) or {}, **view_args)
+        return jsonify(run_plan(query_fanout, neo4j_conn.driver, plan))
+    except InvalidArguments as e:
+        return jsonify({'error': str(e)}), 400
+    except NotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception:
+        response_cache.skip()
+        import traceback
+        traceback.print_exc()
+        return jsonify(empty())
+
+
+def graph_format(view):
+    """?format=compact / ?fields= 를 뷰가 jsonify하는 그래프 응답에 적용
+
+    response_cache.cached 아래에 두어 변환된 본문이 그대로 캐시되게 한다.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        options = parse_graph_format(request.args)
+        if options is not None:
+            g.response_transform = lambda payload: format_graph_payload(payload, options)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# ==========================================
+# 스트리밍 그래프 응답 (NDJSON)
+# ==========================================
+# ?stream=1 요청 시 노드/엣지를 드라이버에서 레코드가 도착하는 대로 한 줄씩 전송
+#   {"kind": "node", "id": ..., "label": ..., "type": ..., ...}
+#   {"kind": "edge", "from": ..., "to": ..., "label": ..., ...}
+#   {"kind": "end", "center": ..., "node_count": N, "edge_count": M}
+# 스트리밍 모드는 상위 N개로 줄이지 않고 중심 노드의 전체 이웃을 반환한다.
+
+GRAPH_STREAM_FETCH_SIZE = int(os.getenv('GRAPH_STREAM_FETCH_SIZE', '200'))
+
+# 그래프 API 공통 노드 스타일 (색상, 크기)
+GRAPH_NODE_STYLE = {
+    'ProductionOrder': ('#45B7D1', 35),
+    'Variance': ('#98D8C8', 25),
+    'Material': ('#4ECDC4', 25),
+    'WorkCenter': ('#FFA07A', 28),
+    'Product': ('#FF6B6B', 30),
+    'Cause': ('#F7DC6F', 25),
+    'CostPool': ('#9B59B6', 30)
+}
+
+GRAPH_EDGE_COLORS = {
+    'PRODUCES': '#FF6B6B',
+    'CONSUMES': '#45B7D1',
+    'WORKS_AT': '#FFA07A',
+    'CAUSED_BY': '#F7DC6F',
+    'INCURRED_COST': '#9B59B6',
+    'ALLOCATES': '#9B59B6',
+    'ROOT_CAUSE': '#E74C3C'
+}
+
+
+def graph_node_payload(node, size=None):
+    """Neo4j Node → 그래프 API 노드 dict"""
+    node_type = next(iter(node.labels), 'Node')
+    default_color, default_size = GRAPH_NODE_STYLE.get(node_type, (get_node_color(node_type), 25))
+    if node_type == 'Variance':
+        label = node.get('variance_name', node.get('id'))
+        color = variance_color(node.get('variance_amount'))
+    elif node_type == 'Cause':
+        label = node.get('description', node.get('code', 'Cause'))
+        color = default_color
+    else:
+        label = node.get('name') or node.get('id') or node_type
+        color = default_color
+    return {
+        'id': node.element_id,
+        'label': label,
+        'type': node_type,
+        'color': color,
+        'size': size or default_size,
+        'properties': dict(node)
+    }
+
+
+def graph_edge_payload(rel, variance=None):
+    """Neo4j Relationship → 그래프 API 엣지 dict"""
+    edge = {
+        'from': rel.start_node.element_id,
+        'to': rel.end_node.element_id,
+        'label': rel.type,
+        'color': GRAPH_EDGE_COLORS.get(rel.type, '#7f8c8d')
+    }
+    if rel.type == 'HAS_VARIANCE' and variance is not None:
+        edge['color'] = variance_color(variance.get('variance_amount'))
+    props = dict(rel)
+    if props:
+        edge['properties'] = props
+    return edge
+
+
+# 중심 유형별 스트리밍 쿼리 - 모든 분기가 (node, rel) 을 반환 (rel은 node를 연결하는 관계)
+GRAPH_STREAM_QUERIES = {
+    'product': """
+        MATCH (p:Product {id: $center}) RETURN p as node, null as rel
+        UNION ALL
+        MATCH (:Product {id: $center})<-[r:PRODUCES]-(po:ProductionOrder) RETURN po as node, r as rel
+        UNION ALL
+        MATCH (:Product {id: $center})<-[:PRODUCES]-(:ProductionOrder)-[r:HAS_VARIANCE]->(v:Variance)
+        RETURN v as node, r as rel
+        UNION ALL
+        MATCH (:Product {id: $center})<-[:PRODUCES]-(:ProductionOrder)-[r:CONSUMES]->(m:Material)
+        RETURN m as node, r as rel
+        UNION ALL
+        MATCH (:Product {id: $center})<-[:PRODUCES]-(:ProductionOrder)-[r:WORKS_AT]->(wc:WorkCenter)
+        RETURN wc as node, r as rel
+        UNION ALL
+        MATCH (:Product {id: $center})<-[:PRODUCES]-(:ProductionOrder)-[:HAS_VARIANCE]->(:Variance)-[r:CAUSED_BY]->(c:Cause)
+        RETURN c as node, r as rel
+    """,
+    'material': """
+        MATCH (m:Material {id: $center}) RETURN m as node, null as rel
+        UNION ALL
+        MATCH (:Material {id: $center})<-[r:CONSUMES]-(po:ProductionOrder) RETURN po as node, r as rel
+        UNION ALL
+        MATCH (:Material {id: $center})<-[:CONSUMES]-(:ProductionOrder)-[r:HAS_VARIANCE]->(v:Variance)
+        RETURN v as node, r as rel
+        UNION ALL
+        MATCH (:Material {id: $center})<-[:CONSUMES]-(:ProductionOrder)-[r:PRODUCES]->(p:Product)
+        RETURN p as node, r as rel
+        UNION ALL
+        MATCH (:Material {id: $center})<-[:CONSUMES]-(:ProductionOrder)-[:HAS_VARIANCE]->(:Variance)-[r:CAUSED_BY]->(c:Cause)
+        RETURN c as node, r as rel
+    """,
+    'workcenter': """
+        MATCH (wc:WorkCenter {id: $center}) RETURN wc as node, null as rel
+        UNION ALL
+        MATCH (:WorkCenter {id: $center})<-[r:WORKS_AT]-(po:ProductionOrder) RETURN po as node, r as rel
+        UNION ALL
+        MATCH (:WorkCenter {id: $center})<-[:WORKS_AT]-(:ProductionOrder)-[r:HAS_VARIANCE]->(v:Variance)
+        RETURN v as node, r as rel
+        UNION ALL
+        MATCH (:WorkCenter {id: $center})<-[:WORKS_AT]-(:ProductionOrder)-[r:PRODUCES]->(p:Product)
+        RETURN p as node, r as rel
+        UNION ALL
+        MATCH (:WorkCenter {id: $center})<-[:WORKS_AT]-(:ProductionOrder)-[:HAS_VARIANCE]->(:Variance)-[r:CAUSED_BY]->(c:Cause)
+        RETURN c as node, r as rel
+    """,
+    'production_order': """
+        MATCH (po:ProductionOrder {id: $center}) RETURN po as node, null as rel
+        UNION ALL
+        MATCH (:ProductionOrder {id: $center})-[r:HAS_VARIANCE]->(v:Variance) RETURN v as node, r as rel
+        UNION ALL
+        MATCH (:ProductionOrder {id: $center})-[r:CONSUMES]->(m:Material) RETURN m as node, r as rel
+        UNION ALL
+        MATCH (:ProductionOrder {id: $center})-[r:WORKS_AT]->(wc:WorkCenter) RETURN wc as node, r as rel
+        UNION ALL
+        MATCH (:ProductionOrder {id: $center})-[r:PRODUCES]->(p:Product) RETURN p as node, r as rel
+        UNION ALL
+        MATCH (:ProductionOrder {id: $center})-[:HAS_VARIANCE]->(:Variance)-[r:CAUSED_BY]->(c:Cause)
+        RETURN c as node, r as rel
+    """,
+    'cost_allocation': """
+        MATCH (wc:WorkCenter {id: $center}) RETURN wc as node, null as rel
+        UNION ALL
+        MATCH (:WorkCenter {id: $center})-[r:INCURRED_COST]->(cp:CostPool) RETURN cp as node, r as rel
+        UNION ALL
+        MATCH (:WorkCenter {id: $center})-[:INCURRED_COST]->(:CostPool)-[r:ALLOCATES]->(po:ProductionOrder)
+        RETURN po as node, r as rel
+    """
+}
+
+
+def wants_stream(args=None):
+    args = request.args if args is None else args
+    return args.get('stream', '').lower() in ('1', 'true', 'ndjson')
+
+
+def stream_graph_response(kind, center):
+    """GRAPH_STREAM_QUERIES[kind] 결과를 NDJSON으로 스트리밍"""
+    query = GRAPH_STREAM_QUERIES[kind]
+    driver = neo4j_conn.driver
+
+    def generate():
+        seen_nodes = set()
+        seen_edges = set()
+        if driver is None:
+            yield dumps_bytes({'kind': 'end', 'center': center, 'node_count': 0, 'edge_count': 0,
+                               'error': 'No DB connection'}) + b'\n'
+            return
+        # 스트리밍은 트랜잭션 함수 밖으로 레코드를 흘려보내야 하므로 읽기 모드 자동 커밋 트랜잭션 사용
+        with driver.session(fetch_size=GRAPH_STREAM_FETCH_SIZE, **read_session_config()) as session:
+            for record in session.run(query, center=center):
+                node = record['node']
+                rel = record['rel']
+                if node is not None and node.element_id not in seen_nodes:
+                    seen_nodes.add(node.element_id)
+                    payload = graph_node_payload(node, size=45 if rel is None else None)
+                    yield dumps_bytes({'kind': 'node', **payload}) + b'\n'
+                if rel is not None and rel.element_id not in seen_edges:
+                    seen_edges.add(rel.element_id)
+                    variance = node if rel.type == 'HAS_VARIANCE' else None
+                    yield dumps_bytes({'kind': 'edge', **graph_edge_payload(rel, variance)}) + b'\n'
+        end = {'kind': 'end', 'center': center,
+               'node_count': len(seen_nodes), 'edge_count': len(seen_edges)}
+        if not seen_nodes:
+            end['error'] = 'Not found'
+        yield dumps_bytes(end) + b'\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+# ==========================================
+# 인메모리 그래프 스냅샷 경로
+# ==========================================
+# GRAPH_SNAPSHOT_ENABLED=1 이면 그래프 라우트가 Neo4j 대신 graph_snapshot의 CSR 인덱스로
+# 이웃을 탐색한다. 스냅샷은 Neo4j 전체를 읽어 만들므로 노드/엣지 id(elementId)와 로더 파생 데이터가
+# Neo4j 경로와 같다. 중심 노드가 스냅샷에 없으면(구축 이후 생긴 노드) 기존 Neo4j 경로로 처리한다.
+# 스냅샷 경로는 실제 관계만 엣지로 반환한다 (모든 오더 × 모든 원자재 식의 조합 엣지 없음).
+
+
+def load_graph_snapshot():
+    """읽기 트랜잭션 하나로 DataVersion 마커 버전 + 전체 노드/관계를 읽어 스냅샷 생성
+
+    QUERY_TIMEOUT_SEC 제한 없이 스트리밍으로 읽는다 (요청 경로가 아닌 백그라운드 구축).
+    """
+    with neo4j_conn.driver.session(**read_session_config()) as session:
+        return session.execute_read(read_snapshot)
+
+
+# DataVersion 마커 버전이 바뀌어 스냅샷이 교체되면 이전 데이터로 만든 캐시 응답도 버리고 다시 예열
+graph_snapshot = SnapshotEngine(load_graph_snapshot, on_swap=lambda: refresh_response_cache())
+if neo4j_conn.driver:
+    graph_snapshot.start()
+
+# 중심 유형별 탐색 규칙: (중심 라벨, 중심 노드 크기, [(출발 별칭, 관계, 방향, 도착 별칭, 상위 N)])
+# 상위 N이 있으면 도착 노드(생산오더)를 차이 금액 합계 절대값 기준으로 N개만 남긴다.
+# 스냅샷 탐색과 Neo4j 서브그래프 쿼리(build_subgraph_query)가 같은 규칙을 사용한다.
+GRAPH_SPECS = {
+    'variance': ('Variance', 30, [
+        ('center', 'HAS_VARIANCE', 'in', 'orders', None),
+        ('orders', 'CONSUMES', 'out', 'materials', None),
+        ('orders', 'WORKS_AT', 'out', 'workcenters', None),
+        ('center', 'CAUSED_BY', 'out', 'causes', None),
+        ('orders', 'PRODUCES', 'out', 'products', None)
+    ]),
+    'cause': ('Cause', 35, [
+        ('center', 'CAUSED_BY', 'in', 'variances', None),
+        ('variances', 'HAS_VARIANCE', 'in', 'orders', None)
+    ]),
+    'product': ('Product', 45, [
+        ('center', 'PRODUCES', 'in', 'orders', None),
+        ('orders', 'HAS_VARIANCE', 'out', 'variances', None),
+        ('orders', 'CONSUMES', 'out', 'materials', None),
+        ('orders', 'WORKS_AT', 'out', 'workcenters', None),
+        ('variances', 'CAUSED_BY', 'out', 'causes', None)
+    ]),
+    'material': ('Material', 45, [
+        ('center', 'CONSUMES', 'in', 'orders', 5),
+        ('orders', 'HAS_VARIANCE', 'out', 'variances', None),
+        ('orders', 'PRODUCES', 'out', 'products', None),
+        ('variances', 'CAUSED_BY', 'out', 'causes', None)
+    ]),
+    'workcenter': ('WorkCenter', 45, [
+        ('center', 'WORKS_AT', 'in', 'orders', 5),
+        ('orders', 'HAS_VARIANCE', 'out', 'variances', None),
+        ('orders', 'PRODUCES', 'out', 'products', None),
+        ('variances', 'CAUSED_BY', 'out', 'causes', None)
+    ]),
+    'production_order': ('ProductionOrder', 45, [
+        ('center', 'HAS_VARIANCE', 'out', 'variances', None),
+        ('center', 'CONSUMES', 'out', 'materials', None),
+        ('center', 'WORKS_AT', 'out', 'workcenters', None),
+        ('center', 'PRODUCES', 'out', 'products', None),
+        ('variances', 'CAUSED_BY', 'out', 'causes', None)
+    ]),
+    'cost_allocation': ('WorkCenter', 35, [
+        ('center', 'INCURRED_COST', 'out', 'pools', None),
+        ('pools', 'ALLOCATES', 'out', 'orders', None)
+    ])
+}
+
+
+def snapshot_order_variance(snapshot, order):
+    """생산오더의 차이 금액 합계"""
+    total = 0
+    for _, variance in snapshot.edges(order, 'HAS_VARIANCE', 'out'):
+        total += snapshot.node(variance).get('variance_amount') or 0
+    return total
+
+
+def snapshot_graph(snapshot, kind, center_key):
+    """GRAPH_SPECS[kind] 규칙으로 중심 노드 주변 그래프 구성 (중심이 없으면 None)"""
+    label, center_size, hops = GRAPH_SPECS[kind]
+    center = snapshot.find_labeled(label, center_key)
+    if center is None:
+        return None
+
+    nodes = [graph_node_payload(snapshot.node(center), size=center_size)]
+    edges = []
+    seen_nodes = {center}
+    reached = {'center': [center]}
+    for source, rel_type, direction, target, top_n in hops:
+        pairs = [pair for n in reached.get(source, ()) for pair in snapshot.edges(n, rel_type, direction)]
+        if top_n:
+            totals = {other: abs(snapshot_order_variance(snapshot, other)) for _, other in pairs}
+            keep = set(heapq.nsmallest(top_n, totals, key=lambda n: (-totals[n], snapshot.node_key[n] or '')))
+            pairs = [(edge, other) for edge, other in pairs if other in keep]
+        targets = reached.setdefault(target, [])
+        seen_targets = set(targets)
+        for edge, other in pairs:
+            if other not in seen_nodes:
+                nodes.append(graph_node_payload(snapshot.node(other)))
+                seen_nodes.add(other)
+            if other not in seen_targets:
+                targets.append(other)
+                seen_targets.add(other)
+            rel = snapshot.relationship(rel_type, edge)
+            edges.append(graph_edge_payload(rel, rel.end_node if rel_type == 'HAS_VARIANCE' else None))
+
+    return {
+        'nodes': nodes,
+        'edges': edges,
+        'center': center_key
+    }
+
+
+# ==========================================
+# Neo4j 서브그래프 쿼리 (GRAPH_SPECS 공용)
+# ==========================================
+# OPTIONAL MATCH를 이어 붙이면 오더 × 차이 × 원자재 × 공정 × 원인 조합 행이 만들어진 뒤에야
+# collect(DISTINCT)로 줄어든다. 대신 홉마다 독립된 CALL {} 서브쿼리가 이전 홉의 노드 리스트에서
+# 출발해 관계/노드 리스트를 한 행으로 모아 반환하므로, 중간 행 수는 각 홉의 관계 수를 넘지 않는다.
+# 관계 자체를 반환하므로 엣지는 실제 관계만 만들어진다.
+
+GRAPH_CENTER_KEYS = {'Cause': 'code'}
+
+_SUBGRAPH_PATTERNS = {
+    'out': '({source})-[r:{rel}]->(other)',
+    'in': '({source})<-[r:{rel}]-(other)'
+}
+
+
+def build_subgraph_query(kind, anchor=None, anchored=()):
+    """GRAPH_SPECS[kind] → 단일 행 Cypher (center, 홉별 관계 리스트 h0.., 도착 별칭별 노드 리스트)
+
+    anchor: 중심 노드 MATCH 대신 사용할 절 (anchored 별칭을 직접 묶고, 그 별칭이 도착지인 홉은 생략)
+    """
+    label, _, hops = GRAPH_SPECS[kind]
+    if anchor is None:
+        key = GRAPH_CENTER_KEYS.get(label, 'id')
+        lines = [f"MATCH (center:{label} {{{key}: $center}})"]
+        bound = ['center']
+        returns = ['center']
+    else:
+        lines = [anchor]
+        bound = list(anchored)
+        returns = ['null as center'] + list(anchored)
+    for i, (source, rel_type, direction, target, top_n) in enumerate(hops):
+        if target in anchored:
+            continue
+        if target in bound:
+            raise ValueError(f"{kind}: alias '{target}' is reached twice")
+        body = [f"WITH {source}"]
+        if source == 'center':
+            body.append(f"MATCH {_SUBGRAPH_PATTERNS[direction].format(source='center', rel=rel_type)}")
+        else:
+            body.append(f"UNWIND {source} AS source")
+            body.append(f"MATCH {_SUBGRAPH_PATTERNS[direction].format(source='source', rel=rel_type)}")
+        if top_n:
+            # 도착 노드(생산오더)별 차이 금액 합계 절대값 상위 N - 관계 행을 도착 노드별로 먼저 묶어
+            # LIMIT이 관계 수가 아니라 서로 다른 도착 노드 수에 걸리게 한다 (평행 관계가 자리를 차지하지 않음)
+            # 합계는 패턴 컴프리헨션으로 행을 늘리지 않고 도착 노드당 한 번 계산
+            body += [
+                "WITH other, collect(r) as rels",
+                "WITH other, rels, abs(reduce(total = 0.0, amount IN "
+                "[(other)-[:HAS_VARIANCE]->(v) | coalesce(v.variance_amount, 0)] | total + amount)) as weight",
+                "ORDER BY weight DESC, other.id",
+                f"LIMIT {int(top_n)}",
+                "UNWIND rels as r"
+            ]
+        body.append(f"RETURN collect(r) as h{i}, collect(DISTINCT other) as {target}")
+        lines.append("CALL {\n" + "\n".join("    " + line for line in body) + "\n}")
+        bound.append(target)
+        returns += [f'h{i}', target]
+    lines.append("RETURN " + ", ".join(returns))
+    return "\n".join(lines)
+
+
+GRAPH_SUBGRAPH_QUERIES = {kind: build_subgraph_query(kind) for kind in GRAPH_SPECS}
+
+# Product 노드가 없는 제품 코드 - 오더의 product_cd로 출발 (중심은 가상 노드)
+PRODUCT_BY_CODE_SUBGRAPH_QUERY = build_subgraph_query(
+    'product',
+    anchor="MATCH (po:ProductionOrder {product_cd: $center}) WITH collect(po) as orders",
+    anchored=('orders',))
+
+
+def subgraph_payload(kind, row, center_key):
+    """build_subgraph_query 결과 행 → 그래프 응답 (홉 순서대로 한 번에 노드/엣지 구성)"""
+    _, center_size, hops = GRAPH_SPECS[kind]
+    nodes = []
+    edges = []
+    by_id = {}
+    edge_ids = set()
+
+    def add_node(node, size=None):
+        if node is not None and node.element_id not in by_id:
+            by_id[node.element_id] = node
+            nodes.append(graph_node_payload(node, size=size))
+
+    add_node(row['center'], center_size)
+    for i, (_, _, _, target, _) in enumerate(hops):
+        for node in row.get(target) or []:
+            add_node(node)
+        for rel in row.get(f'h{i}') or []:
+            if rel.element_id in edge_ids:
+                continue
+            edge_ids.add(rel.element_id)
+            variance = by_id.get(rel.end_node.element_id) if rel.type == 'HAS_VARIANCE' else None
+            edges.append(graph_edge_payload(rel, variance))
+    return {
+        'nodes': nodes,
+        'edges': edges,
+        'center': center_key
+    }
+
+
+def subgraph_step(kind, center_key, query=None):
+    """쿼리 계획 단계 - Neo4j에서 GRAPH_SPECS[kind] 서브그래프 조회 (결과 행이 없으면 None)"""
+    row = (yield {
+        'subgraph': (query or GRAPH_SUBGRAPH_QUERIES[kind], {'center': center_key}, fetch_single)
+    })['subgraph']
+    return subgraph_payload(kind, row, center_key) if row else None
+
+
+def entity_graph_plan(kind, center_key, missing):
+    """중심 노드 그래프 쿼리 계획 - 스냅샷에 중심이 있으면 쿼리 없이 응답, 중심이 없으면 NotFound(missing)"""
+    snapshot = graph_snapshot.current
+    if snapshot is not None:
+        payload = snapshot_graph(snapshot, kind, center_key)
+        if payload is not None:
+            return payload
+    payload = yield from subgraph_step(kind, center_key)
+    if payload is None:
+        raise NotFound(missing)
+    return payload
+
+
+# ==========================================
+# Variance 중심 다단계 확장 (?depth=N)
+# ==========================================
+# 경로 열거([*1..N]) 대신 홉 단위 프론티어 BFS로 확장한다. 홉마다 프론티어 전체를 쿼리 하나로 보내고
+#   - 출발 노드별 이웃은 variance_amount 절대값 큰 순 fanout개까지
+#   - variance_amount가 min_amount 미만인 이웃은 제외 (속성이 없는 노드는 통과)
+#   - 요청 전체 노드 수는 max_nodes까지 (초과분은 버리고 truncated 표시)
+# 스냅샷이 켜져 있으면 같은 규칙으로 메모리 인접 배열을 탐색한다.
+# 같은 확장(FrontierExpansion / FRONTIER_QUERIES)을 다중 중심 일괄 조회(/api/graph/batch)도 사용한다.
+
+VARIANCE_GRAPH_MAX_DEPTH = int(os.getenv('VARIANCE_GRAPH_MAX_DEPTH', '4'))
+VARIANCE_GRAPH_FANOUT = int(os.getenv('VARIANCE_GRAPH_FANOUT', '25'))
+VARIANCE_GRAPH_MAX_NODES = int(os.getenv('VARIANCE_GRAPH_MAX_NODES', '300'))
+VARIANCE_GRAPH_NODE_LIMIT = 2000
+
+VARIANCE_CENTER_QUERY = "MATCH (v:Variance {id: $variance_id}) RETURN v"
+
+# 방향별 한 홉 확장 쿼리 - 이미 방문한 노드는 제외하고 출발 노드별 상위 fanout개
+_FRONTIER_PATTERNS = {
+    'out': '(source)-[r]->(other)',
+    'in': '(source)<-[r]-(other)',
+    'both': '(source)-[r]-(other)'
+}
+FRONTIER_QUERIES = {
+    direction: f"""
+    UNWIND $frontier AS source_id
+    MATCH (source) WHERE elementId(source) = source_id
+    CALL {{
+        WITH source
+        MATCH {pattern}
+        WHERE NOT elementId(other) IN $visited
+          AND ($rel_types IS NULL OR type(r) IN $rel_types)
+          AND (other.variance_amount IS NULL OR abs(other.variance_amount) >= $min_amount)
+        WITH r, other, abs(coalesce(other.variance_amount, 0)) as weight
+        ORDER BY weight DESC, elementId(other)
+        LIMIT $fanout
+        RETURN r, other, weight
+    }}
+    RETURN source_id, r, other, weight
+    """
+    for direction, pattern in _FRONTIER_PATTERNS.items()
+}
+
+
+def parse_variance_expansion(args):
+    """?depth=&fanout=&min_amount=&max_nodes=&type=&direction= → 확장 옵션 dict"""
+    rel_types, direction = parse_expand_filters(args)
+    depth = args.get('depth', 2, type=int)
+    if not 1 <= depth <= VARIANCE_GRAPH_MAX_DEPTH:
+        raise InvalidArguments(f"depth must be between 1 and {VARIANCE_GRAPH_MAX_DEPTH}")
+    min_amount = args.get('min_amount', 0.0, type=float)
+    if min_amount < 0:
+        raise InvalidArguments("min_amount must not be negative")
+    return {
+        'depth': depth,
+        'fanout': max(1, min(args.get('fanout', VARIANCE_GRAPH_FANOUT, type=int), EXPAND_MAX_LIMIT)),
+        'min_amount': min_amount,
+        'max_nodes': max(1, min(args.get('max_nodes', VARIANCE_GRAPH_MAX_NODES, type=int),
+                                VARIANCE_GRAPH_NODE_LIMIT)),
+        'rel_types': rel_types,
+        'direction': direction
+    }
+
+
+class FrontierExpansion:
+    """프론티어 BFS 누적 상태 - 홉마다 (출발 id, 관계, 이웃 노드, 가중치) 행을 받아 노드 예산 안에서 추가"""
+
+    def __init__(self, center, options):
+        self.options = options
+        self.center = center
+        self.nodes = [graph_node_payload(center, size=30)]
+        self.node_ids = {center.element_id}
+        self.members = [center]      # 원본 노드 / 관계 (일괄 조회가 중심끼리 병합할 때 사용)
+        self.relationships = []
+        self.edges = []
+        self.edge_ids = set()
+        self.frontier = [center.element_id]
+        self.hops = []
+        self.truncated = False
+
+    def add_hop(self, rows):
+        """한 홉 결과 반영 - 가중치 큰 이웃부터 예산을 쓰고 다음 프론티어를 만든다"""
+        next_frontier = []
+        for _, rel, other, _weight in sorted(rows, key=lambda row: -(row[3] or 0)):
+            other_id = other.element_id
+            if other_id not in self.node_ids:
+                if len(self.node_ids) >= self.options['max_nodes']:
+                    self.truncated = True
+                    continue
+                self.node_ids.add(other_id)
+                self.nodes.append(graph_node_payload(other))
+                self.members.append(other)
+                next_frontier.append(other_id)
+            if rel.element_id in self.edge_ids:
+                continue
+            self.edge_ids.add(rel.element_id)
+            self.relationships.append(rel)
+            self.edges.append(graph_edge_payload(rel, rel.end_node if rel.type == 'HAS_VARIANCE' else None))
+        self.hops.append({'hop': len(self.hops) + 1, 'frontier': len(self.frontier), 'added': len(next_frontier)})
+        self.frontier = next_frontier
+
+    @property
+    def done(self):
+        # 노드 예산이 찼으면 다음 홉은 새 노드를 더할 수 없으므로 종료
+        return (not self.frontier or len(self.hops) >= self.options['depth']
+                or len(self.node_ids) >= self.options['max_nodes'])
+
+    def hop_query(self):
+        """다음 홉의 (쿼리, 파라미터) - FRONTIER_QUERIES 결과 행은 add_rows()로 반영"""
+        options = self.options
+        return FRONTIER_QUERIES[options['direction']], {
+            'frontier': self.frontier,
+            'visited': list(self.node_ids),
+            'rel_types': options['rel_types'],
+            'min_amount': options['min_amount'],
+            'fanout': options['fanout']
+        }
+
+    def add_rows(self, rows):
+        self.add_hop([(row['source_id'], row['r'], row['other'], row['weight']) for row in rows])
+
+    def payload(self, center_key):
+        options = self.options
+        return {
+            'nodes': self.nodes,
+            'edges': self.edges,
+            'center': center_key,
+            'expansion': {
+                'depth': options['depth'],
+                'fanout': options['fanout'],
+                'min_amount': options['min_amount'],
+                'max_nodes': options['max_nodes'],
+                'type': options['rel_types'],
+                'direction': options['direction'],
+                'hops': self.hops,
+                'truncated': self.truncated
+            }
+        }
+
+
+def variance_expansion_plan(variance_id, options):
+    """쿼리 계획 - 중심 조회 후 홉마다 프론티어 쿼리 하나 (중심이 없으면 None 반환)"""
+    center = (yield {'center': (VARIANCE_CENTER_QUERY, {'variance_id': variance_id}, fetch_single)})['center']
+    if center is None:
+        return None
+    expansion = FrontierExpansion(center['v'], options)
+    while not expansion.done:
+        name = f'hop{len(expansion.hops) + 1}'
+        expansion.add_rows((yield {name: expansion.hop_query()})[name])
+    return expansion.payload(variance_id)
+
+
+def snapshot_variance_expansion(snapshot, variance_id, options):
+    """스냅샷 인접 배열로 같은 규칙의 프론티어 BFS (중심이 없으면 None)"""
+    center = snapshot.find_labeled('Variance', variance_id)
+    if center is None:
+        return None
+    return snapshot_frontier_expansion(snapshot, center, options).payload(variance_id)
+
+
+def snapshot_frontier_expansion(snapshot, center, options):
+    """스냅샷 노드 center에서 FRONTIER_QUERIES와 같은 규칙으로 확장한 FrontierExpansion"""
+    rel_types = options['rel_types'] or list(snapshot.relationships)
+    directions = ('out', 'in') if options['direction'] == 'both' else (options['direction'],)
+    expansion = FrontierExpansion(snapshot.node(center), options)
+    visited = {center}
+    while not expansion.done:
+        rows = []
+        for source in [snapshot.find(node_id) for node_id in expansion.frontier]:
+            candidates = []
+            for rel_type in rel_types:
+                if rel_type not in snapshot.relationships:
+                    continue
+                for direction in directions:
+                    for edge, other in snapshot.edges(source, rel_type, direction):
+                        if other in visited:
+                            continue
+                        amount = snapshot.node(other).get('variance_amount')
+                        if amount is not None and abs(amount) < options['min_amount']:
+                            continue
+                        candidates.append((abs(amount or 0), snapshot.element_id(other), rel_type, edge, other))
+            for weight, other_id, rel_type, edge, other in heapq.nsmallest(
+                    options['fanout'], candidates, key=lambda c: (-c[0], c[1])):
+                rows.append((source, snapshot.relationship(rel_type, edge), snapshot.node(other), weight))
+        expansion.add_hop(rows)
+        visited.update(snapshot.find(node_id) for node_id in expansion.frontier)
+    return expansion
+
+
+def variance_graph_plan(args, body, variance_id):
+    """Variance 중심 그래프 쿼리 계획 - ?depth 가 있으면 N홉 프론티어 BFS 확장"""
+    if 'depth' not in args:
+        return (yield from entity_graph_plan('variance', variance_id, 'Variance not found'))
+    options = parse_variance_expansion(args)
+    snapshot = graph_snapshot.current
+    if snapshot is not None:
+        payload = snapshot_variance_expansion(snapshot, variance_id, options)
+        if payload is not None:
+            return payload
+    payload = yield from variance_expansion_plan(variance_id, options)
+    if payload is None:
+        raise NotFound('Variance not found')
+    return payload
+
 
 @app.route('/api/variance/<variance_id>/graph', methods=['GET'])
+@response_cache.cached(ttl=300)
+@graph_format
 def get_variance_graph(variance_id):
-    """특정 Variance 중심 그래프 데이터"""
-    depth = request.args.get('depth', 2, type=int)
-    
-    with neo4j_conn.driver.session() as session:
-        query = """
-        MATCH (v:Variance {id: $variance_id})
-        OPTIONAL MATCH path1 = (v)<-[:HAS_VARIANCE]-(po:ProductionOrder)
-        OPTIONAL MATCH path2 = (po)-[:CONSUMES]->(m:Material)
-        OPTIONAL MATCH path3 = (po)-[:WORKS_AT]->(wc:WorkCenter)
-        OPTIONAL MATCH path4 = (v)-[:CAUSED_BY]->(c:Cause)
-        OPTIONAL MATCH path5 = (po)-[:PRODUCES]->(p:Product)
-        
-        WITH v, 
-             collect(DISTINCT po) as orders,
-             collect(DISTINCT m) as materials,
-             collect(DISTINCT wc) as workcenters,
-             collect(DISTINCT c) as causes,
-             collect(DISTINCT p) as products
-        
-        RETURN v, orders, materials, workcenters, causes, products
-        """
-        
-        result = session.run(query, variance_id=variance_id).single()
-        
-        if not result:
-            return jsonify({'error': 'Variance not found'}), 404
-        
-        nodes = []
-        edges = []
-        
-        # Variance 노드
-        v = result['v']
-        nodes.append({
-            'id': v.element_id,
-            'label': v.get('variance_name', v['id']),
-            'type': 'Variance',
-            'color': variance_color(v.get('variance_amount')),
-            'size': 30,
-            'properties': serialize_neo4j_types(dict(v))
-        })
-        
-        # ProductionOrder 노드들
-        for po in result['orders']:
-            if po:
-                nodes.append({
-                    'id': po.element_id,
-                    'label': po['id'],
-                    'type': 'ProductionOrder',
-                    'color': '#45B7D1',
-                    'size': 35,
-                    'properties': serialize_neo4j_types(dict(po))
-                })
-                edges.append({
-                    'from': po.element_id,
-                    'to': v.element_id,
-                    'label': 'HAS_VARIANCE',
-                    'color': variance_color(v.get('variance_amount'))
-                })
-        
-        # Material 노드들
-        for m in result['materials']:
-            if m:
-                nodes.append({
-                    'id': m.element_id,
-                    'label': m['id'],
-                    'type': 'Material',
-                    'color': '#4ECDC4',
-                    'size': 25,
-                    'properties': serialize_neo4j_types(dict(m))
-                })
-                # 연결은 PO를 통해
-                for po in result['orders']:
-                    if po:
-                        edges.append({
-                            'from': po.element_id,
-                            'to': m.element_id,
-                            'label': 'CONSUMES',
-                            'color': '#45B7D1'
-                        })
-        
-        # WorkCenter 노드들
-        for wc in result['workcenters']:
-            if wc:
-                nodes.append({
-                    'id': wc.element_id,
-                    'label': wc['id'],
-                    'type': 'WorkCenter',
-                    'color': '#FFA07A',
-                    'size': 28,
-                    'properties': serialize_neo4j_types(dict(wc))
-                })
-                for po in result['orders']:
-                    if po:
-                        edges.append({
-                            'from': po.element_id,
-                            'to': wc.element_id,
-                            'label': 'WORKS_AT',
-                            'color': '#FFA07A'
-                        })
-        
-        # Cause 노드들
-        for c in result['causes']:
-            if c:
-                nodes.append({
-                    'id': c.element_id,
-                    'label': c['description'],
-                    'type': 'Cause',
-                    'color': '#F7DC6F',
-                    'size': 25,
-                    'properties': serialize_neo4j_types(dict(c))
-                })
-                edges.append({
-                    'from': v.element_id,
-                    'to': c.element_id,
-                    'label': 'CAUSED_BY',
-                    'color': '#F7DC6F'
-                })
-        
-        # Product 노드들
-        for p in result['products']:
-            if p:
-                nodes.append({
-                    'id': p.element_id,
-                    'label': p['name'],
-                    'type': 'Product',
-                    'color': '#FF6B6B',
-                    'size': 30,
-                    'properties': serialize_neo4j_types(dict(p))
-                })
-                for po in result['orders']:
-                    if po:
-                        edges.append({
-                            'from': po.element_id,
-                            'to': p.element_id,
-                            'label': 'PRODUCES',
-                            'color': '#FF6B6B'
-                        })
-        
-        return jsonify({
-            'nodes': nodes,
-            'edges': edges,
-            'center': v['id']
-        })
+    """특정 Variance 중심 그래프 데이터
+
+    ?depth=N 이 있으면 N홉 프론티어 BFS 확장 (fanout, min_amount, max_nodes, type, direction)
+    """
+    return serve_plan(variance_graph_plan, empty_graph, variance_id=variance_id)
 
 
 @app.route('/api/cause/<cause_code>/graph', methods=['GET'])
+@response_cache.cached(ttl=300)
+@graph_format
 def get_cause_graph(cause_code):
-    """특정 Cause 중심 그래프 데이터"""
-    
-    with neo4j_conn.driver.session() as session:
-        query = """
-        MATCH (c:Cause {code: $cause_code})
-        MATCH (v:Variance)-[:CAUSED_BY]->(c)
-        OPTIONAL MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v)
-        
-        RETURN c, 
-               collect(DISTINCT v) as variances,
-               collect(DISTINCT po) as orders
-        LIMIT 50
-        """
-        
-        result = session.run(query, cause_code=cause_code).single()
-        
-        if not result:
-            return jsonify({'error': 'Cause not found'}), 404
-        
-        nodes = []
-        edges = []
-        
-        # Cause 노드
-        c = result['c']
-        nodes.append({
-            'id': c.element_id,
-            'label': c['description'],
-            'type': 'Cause',
-            'color': '#F7DC6F',
-            'size': 35,
-            'properties': serialize_neo4j_types(dict(c))
-        })
-        
-        # Variance 노드들
-        for v in result['variances']:
-            if v:
-                nodes.append({
-                    'id': v.element_id,
-                    'label': v.get('variance_name', v['id']),
-                    'type': 'Variance',
-                    'color': variance_color(v.get('variance_amount')),
-                    'size': 20,
-                    'properties': serialize_neo4j_types(dict(v))
-                })
-                edges.append({
-                    'from': v.element_id,
-                    'to': c.element_id,
-                    'label': 'CAUSED_BY',
-                    'color': '#F7DC6F'
-                })
-        
-        # ProductionOrder 노드들
-        for po in result['orders']:
-            if po:
-                # 중복 체크
-                if not any(n['id'] == po.element_id for n in nodes):
-                    nodes.append({
-                        'id': po.element_id,
-                        'label': po['id'],
-                        'type': 'ProductionOrder',
-                        'color': '#45B7D1',
-                        'size': 30,
-                        'properties': serialize_neo4j_types(dict(po))
-                    })
-                
-                # PO -> Variance 연결
-                for v in result['variances']:
-                    if v:
-                        edges.append({
-                            'from': po.element_id,
-                            'to': v.element_id,
-                            'label': 'HAS_VARIANCE',
-                            'color': variance_color(v.get('variance_amount'))
-                        })
-        
-        return jsonify({
-            'nodes': nodes,
-            'edges': edges,
-            'center': cause_code
-        })
+    """특정 Cause 중심 그래프 데이터 (원인 → 차이 → 생산오더)"""
+    return serve_plan(cause_graph_plan, empty_graph, cause_code=cause_code)
 
 
 @app.route('/api/variances/by-type', methods=['GET'])
+@response_cache.cached(ttl=300)
 def get_variances_by_type():
     """차이 유형별 생산오더 목록"""
     variance_type = request.args.get('type', '')
     cost_element = request.args.get('element', '')
     
-    with neo4j_conn.driver.session() as session:
+    with neo4j_conn.read_session() as session:
         query = """
         MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
         OPTIONAL MATCH (po)-[:WORKS_AT]->(wc:WorkCenter)
@@ -358,13 +899,15 @@ def get_variances_by_type():
 
 
 @app.route('/api/variances/by-element', methods=['GET'])
+@response_cache.cached(ttl=300)
 def get_variances_by_element():
     """원가요소별 생산오더 목록 (MATERIAL, LABOR, OVERHEAD)"""
     cost_element = request.args.get('element', '')
     if not neo4j_conn.driver:
+        response_cache.skip()
         return jsonify([])
     try:
-        with neo4j_conn.driver.session() as session:
+        with neo4j_conn.read_session() as session:
             query = """
             MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
             OPTIONAL MATCH (po)-[:WORKS_AT]->(wc:WorkCenter)
@@ -384,1014 +927,872 @@ def get_variances_by_element():
             results = session.run(query, cost_element=cost_element).data()
             return jsonify(results or [])
     except Exception as e:
+        response_cache.skip()
         import traceback
         traceback.print_exc()
         return jsonify([])
 
 
+def cause_graph_plan(args, body, cause_code):
+    return entity_graph_plan('cause', cause_code, 'Cause not found')
+
+
+def product_graph_plan(args, body, product_cd):
+    """제품 중심 그래프 쿼리 계획 - Product 노드가 없으면 오더의 product_cd로 조회하고 가상 중심 노드에 연결"""
+    try:
+        return (yield from entity_graph_plan('product', product_cd, 'Product not found'))
+    except NotFound:
+        pass
+    payload = yield from subgraph_step('product', product_cd, PRODUCT_BY_CODE_SUBGRAPH_QUERY)
+    orders = [node for node in payload['nodes'] if node['type'] == 'ProductionOrder'] if payload else []
+    if not orders:
+        raise NotFound('Product not found')
+    product_id = f"product_{product_cd}"
+    payload['nodes'].insert(0, {
+        'id': product_id,
+        'label': product_cd,
+        'type': 'Product',
+        'color': '#FF6B6B',
+        'size': 45,
+        'properties': {
+            'id': product_cd,
+            'name': product_cd,
+            'note': 'Virtual node - Product not in Neo4j'
+        }
+    })
+    payload['edges'][:0] = [{
+        'from': order['id'],
+        'to': product_id,
+        'label': 'PRODUCES',
+        'color': '#FF6B6B'
+    } for order in orders]
+    return payload
+
+
+def material_graph_plan(args, body, material_id):
+    return entity_graph_plan('material', material_id, 'Material not found')
+
+
+def workcenter_graph_plan(args, body, workcenter_id):
+    return entity_graph_plan('workcenter', workcenter_id, 'WorkCenter not found')
+
+
+def production_order_graph_plan(args, body, order_no):
+    return entity_graph_plan('production_order', order_no, 'Production order not found')
+
+
 @app.route('/api/product/<product_cd>/graph', methods=['GET'])
+@response_cache.cached(ttl=300)
+@graph_format
 def get_product_graph(product_cd):
     """제품 중심 그래프"""
-    
-    with neo4j_conn.driver.session() as session:
-        query = """
-        MATCH (p:Product {id: $product_cd})
-        OPTIONAL MATCH (po:ProductionOrder)-[:PRODUCES]->(p)
-        OPTIONAL MATCH (po)-[:HAS_VARIANCE]->(v:Variance)
-        OPTIONAL MATCH (po)-[:CONSUMES]->(m:Material)
-        OPTIONAL MATCH (po)-[:WORKS_AT]->(wc:WorkCenter)
-        OPTIONAL MATCH (v)-[:CAUSED_BY]->(c:Cause)
-        
-        WITH p, 
-             collect(DISTINCT po) as orders,
-             collect(DISTINCT v) as variances,
-             collect(DISTINCT m) as materials,
-             collect(DISTINCT wc) as workcenters,
-             collect(DISTINCT c) as causes
-        
-        RETURN p, orders, variances, materials, workcenters, causes
-        LIMIT 1
-        """
-        
-        result = session.run(query, product_cd=product_cd).single()
-        
-        if not result:
-            # Product 노드가 없으면 product_cd로 검색
-            query_by_cd = """
-            MATCH (po:ProductionOrder {product_cd: $product_cd})
-            OPTIONAL MATCH (po)-[:HAS_VARIANCE]->(v:Variance)
-            OPTIONAL MATCH (po)-[:CONSUMES]->(m:Material)
-            OPTIONAL MATCH (po)-[:WORKS_AT]->(wc:WorkCenter)
-            OPTIONAL MATCH (v)-[:CAUSED_BY]->(c:Cause)
-            
-            WITH collect(DISTINCT po) as orders,
-                 collect(DISTINCT v) as variances,
-                 collect(DISTINCT m) as materials,
-                 collect(DISTINCT wc) as workcenters,
-                 collect(DISTINCT c) as causes
-            
-            RETURN null as p, orders, variances, materials, workcenters, causes
-            LIMIT 1
-            """
-            result = session.run(query_by_cd, product_cd=product_cd).single()
-            
-            if not result or not result['orders']:
-                return jsonify({'error': 'Product not found'}), 404
-        
-        nodes = []
-        edges = []
-        order_ids = [po['id'] for po in (result['orders'] or []) if po and po.get('id')]
-        cause_pairs = session.run("""
-            MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v)-[:CAUSED_BY]->(c)
-            WHERE po.id IN $order_ids
-            RETURN DISTINCT elementId(v) as v_id, elementId(c) as c_id
-        """, order_ids=order_ids).data() if order_ids else []
-        
-        # Product 노드 (중심)
-        if result['p']:
-            p = result['p']
-            nodes.append({
-                'id': p.element_id,
-                'label': p.get('name', p.get('id', product_cd)),
-                'type': 'Product',
-                'color': '#FF6B6B',
-                'size': 45,
-                'properties': serialize_neo4j_types(dict(p))
-            })
-            product_id = p.element_id
-        else:
-            # Product 노드가 없으면 가상 노드 생성
-            product_id = f"product_{product_cd}"
-            nodes.append({
-                'id': product_id,
-                'label': product_cd,
-                'type': 'Product',
-                'color': '#FF6B6B',
-                'size': 45,
-                'properties': {
-                    'id': product_cd,
-                    'name': product_cd,
-                    'note': 'Virtual node - Product not in Neo4j'
-                }
-            })
-        
-        # ProductionOrder 노드들
-        for po in result['orders']:
-            if po:
-                nodes.append({
-                    'id': po.element_id,
-                    'label': po['id'],
-                    'type': 'ProductionOrder',
-                    'color': '#45B7D1',
-                    'size': 35,
-                    'properties': serialize_neo4j_types(dict(po))
-                })
-                edges.append({
-                    'from': po.element_id,
-                    'to': product_id,
-                    'label': 'PRODUCES',
-                    'color': '#FF6B6B'
-                })
-        
-        # Variance 노드들 (각 Variance는 자신의 PO에만 연결)
-        for v in result['variances']:
-            if v:
-                nodes.append({
-                    'id': v.element_id,
-                    'label': v.get('variance_name', v['id']),
-                    'type': 'Variance',
-                    'color': variance_color(v.get('variance_amount')),
-                    'size': 25,
-                    'properties': serialize_neo4j_types(dict(v))
-                })
-                v_order_no = v.get('order_no')
-                for po in result['orders']:
-                    if po and v_order_no == po.get('id'):
-                        edges.append({
-                            'from': po.element_id,
-                            'to': v.element_id,
-                            'label': 'HAS_VARIANCE',
-                            'color': variance_color(v.get('variance_amount'))
-                        })
-        
-        # Material 노드들
-        for m in result['materials']:
-            if m:
-                nodes.append({
-                    'id': m.element_id,
-                    'label': m.get('name', m.get('id', 'Material')),
-                    'type': 'Material',
-                    'color': '#4ECDC4',
-                    'size': 25,
-                    'properties': serialize_neo4j_types(dict(m))
-                })
-                for po in result['orders']:
-                    if po:
-                        edges.append({
-                            'from': po.element_id,
-                            'to': m.element_id,
-                            'label': 'CONSUMES',
-                            'color': '#45B7D1'
-                        })
-        
-        # WorkCenter 노드들
-        for wc in result['workcenters']:
-            if wc:
-                nodes.append({
-                    'id': wc.element_id,
-                    'label': wc.get('name', wc.get('id', 'WorkCenter')),
-                    'type': 'WorkCenter',
-                    'color': '#FFA07A',
-                    'size': 28,
-                    'properties': serialize_neo4j_types(dict(wc))
-                })
-                for po in result['orders']:
-                    if po:
-                        edges.append({
-                            'from': po.element_id,
-                            'to': wc.element_id,
-                            'label': 'WORKS_AT',
-                            'color': '#FFA07A'
-                        })
-        
-        # Cause 노드들
-        for c in result['causes']:
-            if c and not any(n['id'] == c.element_id for n in nodes):
-                nodes.append({
-                    'id': c.element_id,
-                    'label': c.get('description', c.get('code', 'Cause')),
-                    'type': 'Cause',
-                    'color': '#F7DC6F',
-                    'size': 25,
-                    'properties': serialize_neo4j_types(dict(c))
-                })
-        # Variance -> Cause 실제 관계만 연결
-        for pair in cause_pairs:
-            v_id = pair.get('v_id')
-            c_id = pair.get('c_id')
-            if v_id and c_id:
-                edges.append({
-                    'from': v_id,
-                    'to': c_id,
-                    'label': 'CAUSED_BY',
-                    'color': '#F7DC6F'
-                })
-        
-        return jsonify({
-            'nodes': nodes,
-            'edges': edges,
-            'center': product_cd
-        })
+    if wants_stream():
+        return stream_graph_response('product', product_cd)
+    return serve_plan(product_graph_plan, empty_graph, product_cd=product_cd)
 
 
 @app.route('/api/material/<material_id>/graph', methods=['GET'])
+@response_cache.cached(ttl=300)
+@graph_format
 def get_material_graph(material_id):
-    """원자재 중심 그래프 - 차이가 큰 상위 5개만 간단하게 표시"""
-    
-    with neo4j_conn.driver.session() as session:
-        # 차이가 큰 상위 5개 생산오더만 선택하고, WorkCenter/Cause는 제외
-        query = """
-        MATCH (m:Material {id: $material_id})
-        MATCH (po:ProductionOrder)-[:CONSUMES]->(m)
-        OPTIONAL MATCH (po)-[:HAS_VARIANCE]->(v:Variance)
-        WITH m, po, SUM(COALESCE(v.variance_amount, 0)) as total_variance
-        ORDER BY ABS(total_variance) DESC
-        LIMIT 5
-        
-        WITH m, collect(po) as top_orders
-        
-        UNWIND top_orders as po
-        OPTIONAL MATCH (po)-[:HAS_VARIANCE]->(v:Variance)
-        OPTIONAL MATCH (po)-[:PRODUCES]->(p:Product)
-        
-        WITH m,
-             collect(DISTINCT po) as orders,
-             collect(DISTINCT v) as variances,
-             collect(DISTINCT p) as products
-        
-        RETURN m, orders, variances, [] as workcenters, products, [] as causes
-        """
-        
-        result = session.run(query, material_id=material_id).single()
-        
-        if not result or not result['m']:
-            return jsonify({'error': 'Material not found'}), 404
-        
-        nodes = []
-        edges = []
-        order_ids = [po['id'] for po in (result['orders'] or []) if po and po.get('id')]
-        cause_pairs = session.run("""
-            MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v)-[:CAUSED_BY]->(c)
-            WHERE po.id IN $order_ids
-            RETURN DISTINCT elementId(v) as v_id, elementId(c) as c_id
-        """, order_ids=order_ids).data() if order_ids else []
-        
-        # Material 노드 (중심)
-        m = result['m']
-        nodes.append({
-            'id': m.element_id,
-            'label': m.get('name', m.get('id', material_id)),
-            'type': 'Material',
-            'color': '#4ECDC4',
-            'size': 45,
-            'properties': serialize_neo4j_types(dict(m))
-        })
-        
-        # ProductionOrder 노드들
-        for po in result['orders']:
-            if po:
-                nodes.append({
-                    'id': po.element_id,
-                    'label': po['id'],
-                    'type': 'ProductionOrder',
-                    'color': '#45B7D1',
-                    'size': 35,
-                    'properties': serialize_neo4j_types(dict(po))
-                })
-                edges.append({
-                    'from': po.element_id,
-                    'to': m.element_id,
-                    'label': 'CONSUMES',
-                    'color': '#4ECDC4'
-                })
-        
-        # Variance 노드들 (각 Variance는 자신의 PO에만 연결)
-        for v in result['variances']:
-            if v:
-                nodes.append({
-                    'id': v.element_id,
-                    'label': v.get('variance_name', v['id']),
-                    'type': 'Variance',
-                    'color': variance_color(v.get('variance_amount')),
-                    'size': 25,
-                    'properties': serialize_neo4j_types(dict(v))
-                })
-                v_order_no = v.get('order_no')
-                for po in result['orders']:
-                    if po and v_order_no == po.get('id'):
-                        edges.append({
-                            'from': po.element_id,
-                            'to': v.element_id,
-                            'label': 'HAS_VARIANCE',
-                            'color': variance_color(v.get('variance_amount'))
-                        })
-        
-        # WorkCenter 노드들
-        for wc in result['workcenters']:
-            if wc:
-                nodes.append({
-                    'id': wc.element_id,
-                    'label': wc.get('name', wc.get('id', 'WorkCenter')),
-                    'type': 'WorkCenter',
-                    'color': '#FFA07A',
-                    'size': 28,
-                    'properties': serialize_neo4j_types(dict(wc))
-                })
-                for po in result['orders']:
-                    if po:
-                        edges.append({
-                            'from': po.element_id,
-                            'to': wc.element_id,
-                            'label': 'WORKS_AT',
-                            'color': '#FFA07A'
-                        })
-        
-        # Product 노드들
-        for p in result['products']:
-            if p:
-                nodes.append({
-                    'id': p.element_id,
-                    'label': p.get('name', p.get('id', 'Product')),
-                    'type': 'Product',
-                    'color': '#FF6B6B',
-                    'size': 30,
-                    'properties': serialize_neo4j_types(dict(p))
-                })
-                for po in result['orders']:
-                    if po:
-                        edges.append({
-                            'from': po.element_id,
-                            'to': p.element_id,
-                            'label': 'PRODUCES',
-                            'color': '#FF6B6B'
-                        })
-        
-        # Cause 노드들
-        for c in result['causes']:
-            if c and not any(n['id'] == c.element_id for n in nodes):
-                nodes.append({
-                    'id': c.element_id,
-                    'label': c.get('description', c.get('code', 'Cause')),
-                    'type': 'Cause',
-                    'color': '#F7DC6F',
-                    'size': 25,
-                    'properties': serialize_neo4j_types(dict(c))
-                })
-        # Variance -> Cause 실제 관계만 연결
-        for pair in cause_pairs:
-            v_id = pair.get('v_id')
-            c_id = pair.get('c_id')
-            if v_id and c_id:
-                edges.append({
-                    'from': v_id,
-                    'to': c_id,
-                    'label': 'CAUSED_BY',
-                    'color': '#F7DC6F'
-                })
-        
-        return jsonify({
-            'nodes': nodes,
-            'edges': edges,
-            'center': material_id
-        })
+    """원자재 중심 그래프 - 차이가 큰 상위 5개 생산오더만 간단하게 표시"""
+    if wants_stream():
+        return stream_graph_response('material', material_id)
+    return serve_plan(material_graph_plan, empty_graph, material_id=material_id)
 
 
 @app.route('/api/workcenter/<workcenter_id>/graph', methods=['GET'])
+@response_cache.cached(ttl=300)
+@graph_format
 def get_workcenter_graph(workcenter_id):
-    """공정(WorkCenter) 중심 그래프 - 차이가 큰 상위 5개만 간단하게 표시"""
-    
-    with neo4j_conn.driver.session() as session:
-        # 차이가 큰 상위 5개 생산오더만 선택하고, Material은 제외
-        query = """
-        MATCH (wc:WorkCenter {id: $workcenter_id})
-        MATCH (po:ProductionOrder)-[:WORKS_AT]->(wc)
-        OPTIONAL MATCH (po)-[:HAS_VARIANCE]->(v:Variance)
-        WITH wc, po, SUM(COALESCE(v.variance_amount, 0)) as total_variance
-        ORDER BY ABS(total_variance) DESC
-        LIMIT 5
-        
-        WITH wc, collect(po) as top_orders
-        
-        UNWIND top_orders as po
-        OPTIONAL MATCH (po)-[:HAS_VARIANCE]->(v:Variance)
-        OPTIONAL MATCH (po)-[:PRODUCES]->(p:Product)
-        
-        WITH wc,
-             collect(DISTINCT po) as orders,
-             collect(DISTINCT v) as variances,
-             collect(DISTINCT p) as products
-        
-        RETURN wc, orders, variances, [] as materials, products, [] as causes
-        """
-        
-        result = session.run(query, workcenter_id=workcenter_id).single()
-        
-        if not result or not result['wc']:
-            return jsonify({'error': 'WorkCenter not found'}), 404
-        
-        nodes = []
-        edges = []
-        order_ids = [po['id'] for po in (result['orders'] or []) if po and po.get('id')]
-        cause_pairs = session.run("""
-            MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v)-[:CAUSED_BY]->(c)
-            WHERE po.id IN $order_ids
-            RETURN DISTINCT elementId(v) as v_id, elementId(c) as c_id
-        """, order_ids=order_ids).data() if order_ids else []
-        
-        # WorkCenter 노드 (중심)
-        wc = result['wc']
-        nodes.append({
-            'id': wc.element_id,
-            'label': wc.get('name', wc.get('id', workcenter_id)),
-            'type': 'WorkCenter',
-            'color': '#FFA07A',
-            'size': 45,
-            'properties': serialize_neo4j_types(dict(wc))
-        })
-        
-        # ProductionOrder 노드들
-        for po in result['orders']:
-            if po:
-                nodes.append({
-                    'id': po.element_id,
-                    'label': po['id'],
-                    'type': 'ProductionOrder',
-                    'color': '#45B7D1',
-                    'size': 35,
-                    'properties': serialize_neo4j_types(dict(po))
-                })
-                edges.append({
-                    'from': po.element_id,
-                    'to': wc.element_id,
-                    'label': 'WORKS_AT',
-                    'color': '#FFA07A'
-                })
-        
-        # Variance 노드들 (각 Variance는 자신의 PO에만 연결)
-        for v in result['variances']:
-            if v:
-                nodes.append({
-                    'id': v.element_id,
-                    'label': v.get('variance_name', v['id']),
-                    'type': 'Variance',
-                    'color': variance_color(v.get('variance_amount')),
-                    'size': 25,
-                    'properties': serialize_neo4j_types(dict(v))
-                })
-                v_order_no = v.get('order_no')
-                for po in result['orders']:
-                    if po and v_order_no == po.get('id'):
-                        edges.append({
-                            'from': po.element_id,
-                            'to': v.element_id,
-                            'label': 'HAS_VARIANCE',
-                            'color': '#98D8C8'
-                        })
-        
-        # Material 노드들
-        for m in result['materials']:
-            if m:
-                nodes.append({
-                    'id': m.element_id,
-                    'label': m.get('name', m.get('id', 'Material')),
-                    'type': 'Material',
-                    'color': '#4ECDC4',
-                    'size': 25,
-                    'properties': serialize_neo4j_types(dict(m))
-                })
-                for po in result['orders']:
-                    if po:
-                        edges.append({
-                            'from': po.element_id,
-                            'to': m.element_id,
-                            'label': 'CONSUMES',
-                            'color': '#4ECDC4'
-                        })
-        
-        # Product 노드들
-        for p in result['products']:
-            if p:
-                nodes.append({
-                    'id': p.element_id,
-                    'label': p.get('name', p.get('id', 'Product')),
-                    'type': 'Product',
-                    'color': '#FF6B6B',
-                    'size': 30,
-                    'properties': serialize_neo4j_types(dict(p))
-                })
-                for po in result['orders']:
-                    if po:
-                        edges.append({
-                            'from': po.element_id,
-                            'to': p.element_id,
-                            'label': 'PRODUCES',
-                            'color': '#FF6B6B'
-                        })
-        
-        # Cause 노드들
-        for c in result['causes']:
-            if c:
-                if not any(n['id'] == c.element_id for n in nodes):
-                    nodes.append({
-                        'id': c.element_id,
-                        'label': c.get('description', c.get('code', 'Cause')),
-                        'type': 'Cause',
-                        'color': '#F7DC6F',
-                        'size': 25,
-                        'properties': serialize_neo4j_types(dict(c))
-                    })
-                
-                for v in result['variances']:
-                    if v:
-                        edges.append({
-                            'from': v.element_id,
-                            'to': c.element_id,
-                            'label': 'CAUSED_BY',
-                            'color': '#F7DC6F'
-                        })
-        
-        return jsonify({
-            'nodes': nodes,
-            'edges': edges,
-            'center': workcenter_id
-        })
+    """공정(WorkCenter) 중심 그래프 - 차이가 큰 상위 5개 생산오더만 간단하게 표시"""
+    if wants_stream():
+        return stream_graph_response('workcenter', workcenter_id)
+    return serve_plan(workcenter_graph_plan, empty_graph, workcenter_id=workcenter_id)
 
 
 @app.route('/api/production-order/<order_no>/graph', methods=['GET'])
+@response_cache.cached(ttl=300)
+@graph_format
 def get_production_order_graph(order_no):
-    """생산오더 중심 그래프"""
-    
-    with neo4j_conn.driver.session() as session:
-        # Relationships: CONSUMES(batch_no), WORKS_AT(step_yield, step_loss_qty)
-        query = """
-        MATCH (po:ProductionOrder {id: $order_no})
-        OPTIONAL MATCH (po)-[:HAS_VARIANCE]->(v:Variance)
-        OPTIONAL MATCH (po)-[r_cons:CONSUMES]->(m:Material)
-        OPTIONAL MATCH (po)-[r_work:WORKS_AT]->(wc:WorkCenter)
-        OPTIONAL MATCH (po)-[:PRODUCES]->(p:Product)
-        OPTIONAL MATCH (v)-[:CAUSED_BY]->(c:Cause)
-        
-        RETURN po,
-               collect(DISTINCT v) as variances,
-               collect(DISTINCT {node: m, rel: r_cons}) as materials,
-               collect(DISTINCT {node: wc, rel: r_work}) as workcenters,
-               collect(DISTINCT p) as products,
-               collect(DISTINCT c) as causes
-        """
-        
-        result = session.run(query, order_no=order_no).single()
-        
-        if not result:
-            return jsonify({'error': 'Production order not found'}), 404
-        
-        nodes = []
-        edges = []
-        cause_pairs = session.run("""
-            MATCH (po:ProductionOrder {id: $order_no})-[:HAS_VARIANCE]->(v)-[:CAUSED_BY]->(c)
-            RETURN elementId(v) as v_id, elementId(c) as c_id
-        """, order_no=order_no).data()
-        
-        # ProductionOrder 노드 (중심)
-        po = result['po']
-        nodes.append({
-            'id': po.element_id,
-            'label': po['id'],
-            'type': 'ProductionOrder',
-            'color': '#45B7D1',
-            'size': 40,
-            'properties': serialize_neo4j_types(dict(po))
+    """생산오더 중심 그래프 - CONSUMES(batch_no), WORKS_AT(step_yield, step_loss_qty) 속성은 엣지 properties로"""
+    if wants_stream():
+        return stream_graph_response('production_order', order_no)
+    return serve_plan(production_order_graph_plan, empty_graph, order_no=order_no)
+
+
+EXPAND_DEFAULT_LIMIT = 50
+EXPAND_MAX_LIMIT = 500
+_REL_TYPE_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class InvalidExpandCursor(InvalidArguments):
+    """잘못되었거나 다른 필터로 발급된 expand 커서"""
+
+
+def parse_expand_filters(args):
+    """?type=A,B&type=C&direction=out|in|both → (정렬된 관계 타입 리스트 또는 None, 방향)"""
+    rel_types = set()
+    for value in args.getlist('type'):
+        for rel_type in value.split(','):
+            rel_type = rel_type.strip()
+            if not rel_type:
+                continue
+            if not _REL_TYPE_PATTERN.match(rel_type):
+                raise InvalidArguments(f"Invalid relationship type: {rel_type}")
+            rel_types.add(rel_type)
+    direction = (args.get('direction') or 'both').lower()
+    if direction not in ('out', 'in', 'both'):
+        raise InvalidArguments(f"Invalid direction: {direction}")
+    return (sorted(rel_types) or None), direction
+
+
+def _expand_filter_signature(node_id, rel_types, direction):
+    return f"{node_id}|{','.join(rel_types or [])}|{direction}"
+
+
+def expand_cursor_source(snapshot):
+    """커서 키를 발급한 쪽 - 스냅샷("snapshot:버전") 또는 Neo4j
+
+    스냅샷 키("타입:방향순번:위치")와 Neo4j 키(관계 elementId)는 서로 비교할 수 없고,
+    스냅샷 위치는 버전이 바뀌면 다른 관계를 가리킨다.
+    """
+    return f"snapshot:{snapshot.version}" if snapshot is not None else 'neo4j'
+
+
+def encode_expand_cursor(last_key, signature, source):
+    """마지막 관계 키 → 불투명 커서 문자열 (필터 서명 + 키 발급처 포함)"""
+    payload = json.dumps({'k': last_key, 's': signature, 'b': source}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_expand_cursor(cursor, signature, source):
+    """커서 → last_key. 필터나 키 발급처(스냅샷 버전 / Neo4j)가 바뀌었으면 InvalidExpandCursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        last_key = payload['k']
+    except Exception:
+        raise InvalidExpandCursor('Malformed cursor')
+    if payload.get('s') != signature:
+        raise InvalidExpandCursor('Cursor does not match node/type/direction filters')
+    if payload.get('b') != source:
+        # 위치를 추정하면 관계를 건너뛰거나 중복하므로 처음부터 다시 받게 한다
+        raise InvalidExpandCursor('Cursor expired (graph data changed), restart from the first page')
+    return last_key
+
+
+# 라벨 없이 id로 노드 찾기 - elementId 탐색 + 고유 제약조건이 있는 라벨별 키 탐색의 UNION
+# (elementId(n) = $x OR n.id = $x 는 인덱스를 쓰지 못하고 전체 노드를 스캔한다)
+NODE_LOOKUP_KEYS = [
+    ('Product', 'id'),
+    ('Material', 'id'),
+    ('WorkCenter', 'id'),
+    ('ProductionOrder', 'id'),
+    ('Variance', 'id'),
+    ('Cause', 'code'),
+    ('QualityDefect', 'id'),
+    ('EquipmentFailure', 'id'),
+    ('MaterialMarket', 'id'),
+    ('CostPool', 'id'),
+    ('MonthlyProductState', 'id'),
+    ('Symptom', 'id'),
+    ('Factor', 'id'),
+    # SK Hynix v2 스키마 (upload_skhynix_v2.py)
+    ('Company', 'id'),
+    ('Factory', 'id'),
+    ('Area', 'id'),
+    ('VFArea', 'id'),
+    ('ProductFamily', 'id'),
+    ('CostAccount', 'id'),
+    ('CostSubAccount', 'id'),
+    ('MaterialItem', 'id'),
+    ('MonthlyVFState', 'id'),
+    ('ExternalEvent', 'id')
+]
+
+
+def build_node_lookup(value, imported=None):
+    """value(파라미터 또는 변수)로 노드 n 하나를 찾는 CALL 절 - 분기마다 인덱스 조건 하나"""
+    prefix = f"WITH {imported} " if imported else ""
+    branches = [f"{prefix}MATCH (n) WHERE elementId(n) = {value} RETURN n"]
+    branches += [f"{prefix}MATCH (n:{label} {{{key}: {value}}}) RETURN n" for label, key in NODE_LOOKUP_KEYS]
+    union = "\n        UNION\n".join("        " + branch for branch in branches)
+    return f"""CALL {{
+        {prefix}CALL {{
+{union}
+        }}
+        RETURN n LIMIT 1
+    }}"""
+
+
+EXPAND_CENTER_QUERY = f"""
+    {build_node_lookup('$node_id')}
+    RETURN n
+"""
+
+# 중심은 elementId 탐색 한 번으로 찾는다 (EXPAND_CENTER_QUERY로 얻은 element id)
+EXPAND_DEGREE_QUERY = """
+MATCH (n) WHERE elementId(n) = $center_id
+MATCH (n)-[r]-()
+RETURN type(r) as rel_type,
+       CASE WHEN startNode(r) = n THEN 'out' ELSE 'in' END as direction,
+       count(r) as cnt
+"""
+
+
+def build_expand_keys_query(rel_types, direction):
+    """필터에 맞는 관계의 elementId 목록 - 관계 타입/방향을 패턴에 직접 넣어 타입별 체인만 읽는다"""
+    rel = 'r' + (':' + '|'.join(f'`{t}`' for t in rel_types) if rel_types else '')
+    if direction == 'out':
+        pattern = f"(n)-[{rel}]->()"
+    elif direction == 'in':
+        pattern = f"(n)<-[{rel}]-()"
+    else:
+        pattern = f"(n)-[{rel}]-()"
+    return f"""
+    MATCH (n) WHERE elementId(n) = $center_id
+    MATCH {pattern}
+    RETURN collect(DISTINCT elementId(r)) as rel_keys
+    """
+
+
+# 페이지 관계만 elementId 탐색으로 읽는다 (이웃 전체를 다시 모으거나 정렬하지 않음)
+EXPAND_PAGE_QUERY = """
+UNWIND $rel_keys AS rel_key
+MATCH ()-[r]->() WHERE elementId(r) = rel_key
+WITH rel_key, r, elementId(startNode(r)) = $center_id as outgoing
+RETURN CASE WHEN outgoing THEN endNode(r) ELSE startNode(r) END as connected,
+       r,
+       type(r) as rel_type,
+       CASE WHEN outgoing THEN 'out' ELSE 'in' END as direction,
+       rel_key
+"""
+
+# (중심, 필터) → (중심 노드, 차수 행, 정렬된 관계 키) - 첫 페이지에서 한 번 만들고 다음 페이지는 위치로 자른다
+EXPAND_KEY_CACHE_TTL = int(os.getenv('EXPAND_KEY_CACHE_TTL', '300'))
+expand_key_cache = LRUCacheBackend(max_entries=int(os.getenv('EXPAND_KEY_CACHE_MAX_ENTRIES', '128')))
+
+
+def summarize_expand_degrees(rows):
+    """관계 타입/방향별 차수 → ({type: {out, in, total}}, 전체 차수)"""
+    by_type = {}
+    total = 0
+    for row in rows:
+        rel_type = row['rel_type']
+        if rel_type is None:
+            continue
+        cnt = row['cnt']
+        entry = by_type.setdefault(rel_type, {'out': 0, 'in': 0, 'total': 0})
+        entry[row['direction']] += cnt
+        entry['total'] += cnt
+        total += cnt
+    return by_type, total
+
+
+def expand_node_payload(node, size):
+    """expand 응답용 노드 dict"""
+    node_type = list(node.labels)[0]
+    if node_type == 'Variance':
+        label = node.get('variance_name', node.get('id'))
+        color = variance_color(node.get('variance_amount'))
+    else:
+        label = node.get('id') or node.get('name') or node.get('description')
+        color = get_node_color(node_type)
+    return {
+        'id': node.element_id,
+        'label': label,
+        'type': node_type,
+        'color': color,
+        'size': size,
+        'properties': dict(node)
+    }
+
+
+def empty_graph():
+    return {'nodes': [], 'edges': []}
+
+
+def parse_expand_page(args, node_id):
+    """expand 요청 파라미터 → (관계 타입, 방향, limit, 커서 서명, 커서 문자열 또는 None)
+
+    커서는 키 발급처(스냅샷 / Neo4j)가 정해진 뒤 decode_expand_cursor로 푼다.
+    """
+    rel_types, direction = parse_expand_filters(args)
+    limit = max(1, min(args.get('limit', EXPAND_DEFAULT_LIMIT, type=int), EXPAND_MAX_LIMIT))
+    signature = _expand_filter_signature(node_id, rel_types, direction)
+    return rel_types, direction, limit, signature, args.get('cursor') or None
+
+
+def build_expand_response(center, degree_rows, page_rows, matching, position, limit, signature, cursor_source):
+    """차수 행 + 페이지 행(connected, r, rel_type, direction, rel_key) → expand 응답
+
+    matching: 필터에 맞는 관계 수, position: 이 페이지까지 지나온 관계 수 (remaining = matching - position)
+    엣지 id는 관계 element_id - 같은 두 노드 사이 평행 관계도 각각 하나의 엣지
+    """
+    by_type, total_degree = summarize_expand_degrees(degree_rows)
+
+    nodes = [expand_node_payload(center, 30)]
+    edges = []
+    seen_nodes = {center.element_id}
+    seen_edges = set()
+    for record in page_rows:
+        connected = record['connected']
+        connected_id = connected.element_id
+        if connected_id not in seen_nodes:
+            nodes.append(expand_node_payload(connected, 25))
+            seen_nodes.add(connected_id)
+        edge_id = record['r'].element_id
+        if edge_id in seen_edges:
+            continue
+        seen_edges.add(edge_id)
+        if record['direction'] == 'out':
+            source, target = center.element_id, connected_id
+        else:
+            source, target = connected_id, center.element_id
+        edges.append({
+            'id': edge_id,
+            'from': source,
+            'to': target,
+            'label': record['rel_type'],
+            'arrows': 'to',
+            'properties': dict(record['r'])
         })
-        
-        # Product 노드가 없으면 product_cd로 가상 노드 생성
-        if po.get('product_cd') and not result['products']:
-            product_id = f"product_{po['product_cd']}"
+
+    has_more = position < matching
+    next_cursor = None
+    if has_more and page_rows:
+        next_cursor = encode_expand_cursor(page_rows[-1]['rel_key'], signature, cursor_source)
+
+    return {
+        'nodes': nodes,
+        'edges': edges,
+        'center': center.element_id,
+        'degree': {
+            'total': total_degree,
+            'matching': matching,
+            'by_type': by_type
+        },
+        'page': {
+            'limit': limit,
+            'returned': len(page_rows),
+            'has_more': has_more,
+            'remaining': max(matching - position, 0),
+            'next_cursor': next_cursor
+        }
+    }
+
+
+def snapshot_expand_rows(snapshot, center, rel_types, direction, after, limit):
+    """스냅샷 CSR에서 expand 차수/페이지 행 생성 → (차수 행, 페이지 행, 필터 차수, 지나온 관계 수)
+
+    관계 키는 "타입:방향순번:위치"(out=0, in=1, 위치는 CSR 구간 안 순번)이며
+    (타입, 방향) 그룹 순서 + 그룹 안 위치가 곧 페이지 순서다.
+    커서 이전 그룹은 차수만 더하고 건너뛰므로 페이지 비용은 limit과 관계 타입 수에 비례한다.
+    """
+    directions = ('out', 'in') if direction == 'both' else (direction,)
+    after_group, after_position = None, -1
+    if after is not None:
+        try:
+            after_type, after_order, after_at = after.rsplit(':', 2)
+            after_group, after_position = (after_type, int(after_order)), int(after_at)
+        except ValueError:
+            raise InvalidExpandCursor('Malformed cursor')
+    degree_rows = []
+    page_rows = []
+    matching = 0
+    position = 0
+    for rel_type in sorted(snapshot.relationships):
+        for rel_direction in ('out', 'in'):
+            cnt = snapshot.degree(center, rel_type, rel_direction)
+            if cnt:
+                degree_rows.append({'rel_type': rel_type, 'direction': rel_direction, 'cnt': cnt})
+        if rel_types is not None and rel_type not in rel_types:
+            continue
+        for order, rel_direction in enumerate(('out', 'in')):
+            if rel_direction not in directions:
+                continue
+            cnt = snapshot.degree(center, rel_type, rel_direction)
+            matching += cnt
+            group = (rel_type, order)
+            if after_group is not None and group < after_group:
+                position += cnt
+                continue
+            start = min(after_position + 1, cnt) if group == after_group else 0
+            position += start
+            stop = min(cnt, start + limit - len(page_rows))
+            for at, (edge, other) in enumerate(snapshot.edges(center, rel_type, rel_direction, start, stop), start):
+                page_rows.append({
+                    'connected': snapshot.node(other),
+                    'r': snapshot.relationship(rel_type, edge),
+                    'rel_type': rel_type,
+                    'direction': rel_direction,
+                    'rel_key': f"{rel_type}:{order}:{at:09d}"
+                })
+            position += stop - start
+    return degree_rows, page_rows, matching, position
+
+
+def expand_node_plan(args, body, node_id):
+    """노드 확장 쿼리 계획
+
+    스냅샷이 있으면 쿼리 없이 응답한다. Neo4j 경로는 (중심, 필터)마다 첫 페이지에서
+    중심 조회 → 차수 + 관계 키 목록(병렬)을 한 번 만들어 보관하고, 각 페이지는 커서 위치에서
+    limit개 키만 잘라 elementId로 읽는다.
+    """
+    rel_types, direction, limit, signature, cursor = parse_expand_page(args, node_id)
+
+    snapshot = graph_snapshot.current
+    center = snapshot.find(node_id) if snapshot is not None else None
+    if center is not None:
+        source = expand_cursor_source(snapshot)
+        after = decode_expand_cursor(cursor, signature, source) if cursor else None
+        degree_rows, page_rows, matching, position = snapshot_expand_rows(
+            snapshot, center, rel_types, direction, after, limit)
+        return build_expand_response(snapshot.node(center), degree_rows, page_rows,
+                                     matching, position, limit, signature, source)
+
+    source = expand_cursor_source(None)
+    after = decode_expand_cursor(cursor, signature, source) if cursor else None
+
+    entry = expand_key_cache.get(('expand', signature))
+    if entry is None:
+        found = (yield {'center': (EXPAND_CENTER_QUERY, {'node_id': node_id}, fetch_single)})['center']
+        if found is None:
+            return empty_graph()
+        center = found['n']
+        params = {'center_id': center.element_id}
+        results = yield {
+            'degree': (EXPAND_DEGREE_QUERY, params),
+            'keys': (build_expand_keys_query(rel_types, direction), params, fetch_single)
+        }
+        entry = (center, results['degree'], sorted(results['keys']['rel_keys']))
+        expand_key_cache.set(('expand', signature), entry, EXPAND_KEY_CACHE_TTL)
+    center, degree_rows, keys = entry
+
+    start = bisect_right(keys, after) if after is not None else 0
+    page_keys = keys[start:start + limit]
+    page_rows = []
+    if page_keys:
+        rows = (yield {'page': (EXPAND_PAGE_QUERY, {'rel_keys': page_keys,
+                                                    'center_id': center.element_id})})['page']
+        order = {key: i for i, key in enumerate(page_keys)}
+        page_rows = sorted(rows, key=lambda row: order[row['rel_key']])
+    return build_expand_response(center, degree_rows, page_rows, len(keys), start + len(page_keys),
+                                 limit, signature, source)
+
+
+@app.route('/api/node/<node_id>/expand', methods=['GET'])
+@response_cache.cached(ttl=300)
+@graph_format
+def expand_node(node_id):
+    """노드 확장 - 연결된 노드들을 관계 키 순서로 페이지 단위 조회
+
+    Query Parameters:
+        limit: 페이지 크기 (기본 50, 최대 500)
+        cursor: 이전 응답의 page.next_cursor
+        type: 관계 타입 필터 (쉼표 구분 또는 반복)
+        direction: out / in / both (기본 both)
+    """
+    return serve_plan(expand_node_plan, empty_graph, node_id=node_id)
+
+
+# ==========================================
+# 다중 중심 서브그래프 일괄 조회
+# ==========================================
+# 대시보드가 클릭/프리페치마다 expand를 한 번씩 부르는 대신
+# {"requests": [{"kind": "variance", "id": "VAR-00001", "depth": 1}, ...]} 하나로 받는다.
+# 중심은 kind별 UNWIND 쿼리 하나로 찾고, 중심마다 Variance 확장과 같은 홉 단위 프론티어 확장
+# (FrontierExpansion)으로 서로 다른 노드 BATCH_MAX_NODES_PER_CENTER개까지 넓힌다 (홉마다 중심별 쿼리 병렬).
+# 노드/엣지는 element_id 기준으로 중복 제거한 뒤 중심별 소속 목록을 함께 반환한다.
+
+BATCH_MAX_CENTERS = int(os.getenv('GRAPH_BATCH_MAX_CENTERS', '50'))
+BATCH_MAX_DEPTH = 3
+BATCH_MAX_NODES_PER_CENTER = int(os.getenv('GRAPH_BATCH_MAX_NODES', '200'))
+
+# kind → (중심 라벨, 키 속성) - node는 expand와 같이 element_id 또는 id로 찾음
+BATCH_CENTER_KINDS = {
+    'node': (None, 'id'),
+    'variance': ('Variance', 'id'),
+    'cause': ('Cause', 'code'),
+    'product': ('Product', 'id'),
+    'material': ('Material', 'id'),
+    'workcenter': ('WorkCenter', 'id'),
+    'production_order': ('ProductionOrder', 'id'),
+    'cost_pool': ('CostPool', 'id')
+}
+
+
+def empty_graph_batch():
+    return {'nodes': [], 'edges': [], 'centers': []}
+
+
+def parse_batch_requests(body):
+    """요청 본문 → [(kind, id, depth)] (kind/개수 검증, depth는 1..BATCH_MAX_DEPTH)"""
+    items = body.get('requests') if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items:
+        raise InvalidArguments("Body must contain a non-empty 'requests' list")
+    if len(items) > BATCH_MAX_CENTERS:
+        raise InvalidArguments(f"At most {BATCH_MAX_CENTERS} centers per batch")
+    parsed = []
+    for item in items:
+        if not isinstance(item, dict) or not item.get('id'):
+            raise InvalidArguments("Each request needs 'kind' and 'id'")
+        kind = item.get('kind') or 'node'
+        if kind not in BATCH_CENTER_KINDS:
+            raise InvalidArguments(f"Invalid kind: {kind}")
+        try:
+            depth = int(item.get('depth', 1))
+        except (TypeError, ValueError):
+            raise InvalidArguments(f"Invalid depth: {item.get('depth')}")
+        parsed.append((kind, str(item['id']), max(1, min(depth, BATCH_MAX_DEPTH))))
+    return parsed
+
+
+def build_batch_center_query(kind):
+    """kind별 UNWIND 중심 조회 - 라벨 키 조회 또는 (node) elementId / 고유 키 탐색"""
+    label, key = BATCH_CENTER_KINDS[kind]
+    if label is None:
+        match = build_node_lookup('center_id', imported='center_id')
+    else:
+        match = f"MATCH (n:{label} {{{key}: center_id}})"
+    return f"""
+    UNWIND $center_ids AS center_id
+    {match}
+    RETURN center_id, n
+    """
+
+
+def batch_expansion_options(depth):
+    """일괄 조회 확장 옵션 - 중심마다 서로 다른 노드 BATCH_MAX_NODES_PER_CENTER개까지
+
+    출발 노드별 상한(fanout)도 노드 예산과 같게 두어 허브 노드에서도 홉 결과 행이
+    프론티어 × 예산을 넘지 않는다 (가중치 상위 예산 개는 출발 노드별 상위 예산 개 안에 있음).
+    """
+    return {
+        'depth': depth,
+        'fanout': BATCH_MAX_NODES_PER_CENTER,
+        'min_amount': 0.0,
+        'max_nodes': BATCH_MAX_NODES_PER_CENTER,
+        'rel_types': None,
+        'direction': 'both'
+    }
+
+
+def merge_batch_results(requests, found):
+    """중심별 (center, members, rels) → 중복 제거된 nodes/edges + 중심별 소속"""
+    nodes = []
+    edges = []
+    node_ids = set()
+    edge_ids = set()
+    centers = []
+    for kind, center_key, depth in requests:
+        entry = {'kind': kind, 'id': center_key, 'depth': depth, 'center': None, 'nodes': [], 'edges': []}
+        centers.append(entry)
+        result = found.get((kind, center_key, depth))
+        if result is None:
+            continue
+        center, members, rels = result
+        entry['center'] = center.element_id
+        member_ids = {}
+        for node in [center] + list(members):
+            node_id = node.element_id
+            if node_id in member_ids:
+                continue
+            member_ids[node_id] = True
+            if node_id not in node_ids:
+                node_ids.add(node_id)
+                nodes.append(graph_node_payload(node, size=45 if node is center else None))
+        member_edges = {}
+        for rel in rels:
+            edge_id = rel.element_id
+            member_edges[edge_id] = True
+            if edge_id not in edge_ids:
+                edge_ids.add(edge_id)
+                edge = graph_edge_payload(rel, rel.end_node if rel.type == 'HAS_VARIANCE' else None)
+                edges.append({'id': edge_id, **edge})
+        entry['nodes'] = list(member_ids)
+        entry['edges'] = list(member_edges)
+    return {'nodes': nodes, 'edges': edges, 'centers': centers}
+
+
+def graph_batch_plan(args, body):
+    """일괄 서브그래프 쿼리 계획
+
+    스냅샷이 있으면 메모리 프론티어 확장, 없으면 kind별 중심 조회(병렬) 후
+    홉마다 진행 중인 모든 중심의 프론티어 쿼리를 병렬로 보낸다.
+    """
+    requests = parse_batch_requests(body)
+    expansions = {}
+
+    snapshot = graph_snapshot.current
+    pending = []
+    for kind, center_key, depth in requests:
+        center = None
+        if snapshot is not None:
+            label, _ = BATCH_CENTER_KINDS[kind]
+            center = snapshot.find(center_key) if label is None else snapshot.find_labeled(label, center_key)
+        if center is None:
+            pending.append((kind, center_key, depth))
+            continue
+        expansions[(kind, center_key, depth)] = snapshot_frontier_expansion(
+            snapshot, center, batch_expansion_options(depth))
+
+    groups = {}
+    for kind, center_key, _ in pending:
+        groups.setdefault(kind, set()).add(center_key)
+    if groups:
+        results = yield {
+            kind: (build_batch_center_query(kind), {'center_ids': sorted(center_ids)})
+            for kind, center_ids in groups.items()
+        }
+        centers = {(kind, row['center_id']): row['n'] for kind, rows in results.items() for row in rows}
+        for kind, center_key, depth in pending:
+            center = centers.get((kind, center_key))
+            if center is not None:
+                expansions[(kind, center_key, depth)] = FrontierExpansion(center, batch_expansion_options(depth))
+        active = [request for request in pending if request in expansions]
+        while active:
+            hop = {f"{i}": expansions[request].hop_query() for i, request in enumerate(active)}
+            results = yield hop
+            for i, request in enumerate(active):
+                expansions[request].add_rows(results[f"{i}"])
+            active = [request for request in active if not expansions[request].done]
+
+    found = {request: (expansion.center, expansion.members[1:], expansion.relationships)
+             for request, expansion in expansions.items()}
+    return merge_batch_results(requests, found)
+
+
+@app.route('/api/graph/batch', methods=['POST'])
+@response_cache.cached(ttl=300)
+@graph_format
+def get_graph_batch():
+    """여러 중심의 서브그래프를 한 번에 조회
+
+    body:
+        requests: [{"kind": "variance|cause|product|material|workcenter|production_order|cost_pool|node",
+                    "id": 중심 키, "depth": 1..3}, ...] (최대 GRAPH_BATCH_MAX_CENTERS개)
+    """
+    return serve_plan(graph_batch_plan, empty_graph_batch)
+
+
+OVERVIEW_QUERY = """
+MATCH (v:Variance)
+WITH v.cost_element as element,
+     v.variance_type as type,
+     collect(v)[..5] as sample_variances
+UNWIND sample_variances as v
+OPTIONAL MATCH (v)-[:CAUSED_BY]->(c:Cause)
+RETURN element, type,
+       collect(DISTINCT {
+           id: elementId(v),
+           label: v.id,
+           props: properties(v)
+       }) as variances,
+       collect(DISTINCT {
+           id: elementId(c),
+           label: c.description,
+           props: properties(c)
+       }) as causes
+"""
+
+
+def overview_plan(args, body):
+    """전체 개요 그래프 쿼리 계획"""
+    results = (yield {'rows': (OVERVIEW_QUERY, None, fetch_data)})['rows']
+    nodes = []
+    edges = []
+    element_nodes = {}
+    added_node_ids = set()
+    for row in results:
+        element = row['element']
+        if element not in element_nodes:
+            elem_id = f"element_{element}"
+            element_nodes[element] = elem_id
             nodes.append({
-                'id': product_id,
-                'label': po['product_cd'],
-                'type': 'Product',
-                'color': '#FF6B6B',
-                'size': 30,
-                'properties': {
-                    'id': po['product_cd'],
-                    'name': po['product_cd'],
-                    'note': 'Virtual node - Product not loaded in Neo4j'
-                }
-            })
-            edges.append({
-                'from': po.element_id,
-                'to': product_id,
-                'label': 'PRODUCES',
-                'color': '#FF6B6B'
+                'id': elem_id, 'label': element, 'type': 'CostElement',
+                'color': '#3498db', 'size': 40, 'properties': {'name': element}
             })
-        
-        # Variance 노드들
-        for v in result['variances']:
-            if v:
+        for v in (row.get('variances') or []):
+            if v and v.get('id') and v['id'] not in added_node_ids:
+                added_node_ids.add(v['id'])
                 nodes.append({
-                    'id': v.element_id,
-                    'label': v.get('variance_name', v['id']),
-                    'type': 'Variance',
-                    'color': variance_color(v.get('variance_amount')),
-                    'size': 25,
-                    'properties': serialize_neo4j_types(dict(v))
+                    'id': v['id'], 'label': v.get('label', ''), 'type': 'Variance',
+                    'color': '#98D8C8', 'size': 20, 'properties': v.get('props') or {}
                 })
                 edges.append({
-                    'from': po.element_id,
-                    'to': v.element_id,
-                    'label': 'HAS_VARIANCE',
-                    'color': variance_color(v.get('variance_amount'))
+                    'from': element_nodes[element], 'to': v['id'],
+                    'label': row.get('type', ''), 'color': '#98D8C8'
                 })
-        
-        # Material 노드들 (with CONSUMES properties)
-        for item in result['materials']:
-            if item['node']:
-                m = item['node']
-                r = item['rel']
+        for c in (row.get('causes') or []):
+            if c and c.get('id') and c['id'] not in added_node_ids:
+                added_node_ids.add(c['id'])
                 nodes.append({
-                    'id': m.element_id,
-                    'label': m.get('name', m.get('id', 'Material')),
-                    'type': 'Material',
-                    'color': '#4ECDC4',
-                    'size': 25,
-                    'properties': serialize_neo4j_types(dict(m))
+                    'id': c['id'], 'label': c.get('label', ''),
+                    'type': 'Cause', 'color': '#F7DC6F', 'size': 25,
+                    'properties': c.get('props') or {}
                 })
-                edge_props = serialize_neo4j_types(dict(r)) if r else {}
-                edges.append({
-                    'from': po.element_id,
-                    'to': m.element_id,
-                    'label': 'CONSUMES',
-                    'color': '#45B7D1',
-                    'properties': edge_props # batch_no included
-                })
-        
-        # WorkCenter 노드들 (with WORKS_AT properties)
-        for item in result['workcenters']:
-            if item['node']:
-                wc = item['node']
-                r = item['rel']
-                nodes.append({
-                    'id': wc.element_id,
-                    'label': wc.get('name', wc.get('id', 'WorkCenter')),
-                    'type': 'WorkCenter',
-                    'color': '#FFA07A',
-                    'size': 28,
-                    'properties': serialize_neo4j_types(dict(wc))
-                })
-                edge_props = serialize_neo4j_types(dict(r)) if r else {}
-                edges.append({
-                    'from': po.element_id,
-                    'to': wc.element_id,
-                    'label': 'WORKS_AT',
-                    'color': '#FFA07A',
-                    'properties': edge_props # step_yield, step_loss_qty included
-                })
-        
-        # Product 노드들
-        for p in result['products']:
-            if p:
-                nodes.append({
-                    'id': p.element_id,
-                    'label': p.get('name', p.get('id', 'Product')),
-                    'type': 'Product',
-                    'color': '#FF6B6B',
-                    'size': 30,
-                    'properties': serialize_neo4j_types(dict(p))
-                })
-                edges.append({
-                    'from': po.element_id,
-                    'to': p.element_id,
-                    'label': 'PRODUCES',
-                    'color': '#FF6B6B'
-                })
-        
-        # Cause 노드들
-        for c in result['causes']:
-            if c and not any(n['id'] == c.element_id for n in nodes):
-                nodes.append({
-                    'id': c.element_id,
-                    'label': c.get('description', c.get('code', 'Cause')),
-                    'type': 'Cause',
-                    'color': '#F7DC6F',
-                    'size': 25,
-                    'properties': serialize_neo4j_types(dict(c))
-                })
-        # Variance -> Cause 실제 관계만 연결
-        for pair in cause_pairs:
-            v_id = pair.get('v_id')
-            c_id = pair.get('c_id')
-            if v_id and c_id:
-                edges.append({
-                    'from': v_id,
-                    'to': c_id,
-                    'label': 'CAUSED_BY',
-                    'color': '#F7DC6F'
-                })
-        
-        return jsonify({
-            'nodes': nodes,
-            'edges': edges,
-            'center': order_no
-        })
-
-
-@app.route('/api/node/<node_id>/expand', methods=['GET'])
-def expand_node(node_id):
-    """노드 확장 - 연결된 노드들 가져오기"""
-    if not neo4j_conn.driver:
-        return jsonify({'nodes': [], 'edges': []})
-    try:
-        with neo4j_conn.driver.session() as session:
-            query = """
-            MATCH (n)
-            WHERE elementId(n) = $node_id OR n.id = $node_id
-            MATCH (n)-[r]-(connected)
-            RETURN n, 
-                   connected,
-                   r,
-                   type(r) as rel_type,
-                   CASE 
-                       WHEN startNode(r) = n THEN 'out'
-                       ELSE 'in'
-                   END as direction
-            LIMIT 50
-            """
-            results = session.run(query, node_id=node_id)
-            nodes = []
-            edges = []
-            seen_nodes = set()
-            seen_edges = set()
-            first_result = None
-            for record in results:
-                if first_result is None:
-                    first_result = record
-                    center = record['n']
-                    center_type = list(center.labels)[0]
-                    center_id = center.element_id
-                    if center_id not in seen_nodes:
-                        if center_type == 'Variance':
-                            center_label = center.get('variance_name', center.get('id'))
-                            center_color = variance_color(center.get('variance_amount'))
-                        else:
-                            center_label = center.get('id') or center.get('name') or center.get('description')
-                            center_color = get_node_color(center_type)
-                        nodes.append({
-                            'id': center_id,
-                            'label': center_label,
-                            'type': center_type,
-                            'color': center_color,
-                            'size': 30,
-                            'properties': serialize_neo4j_types(dict(center))
-                        })
-                        seen_nodes.add(center_id)
-                connected = record['connected']
-                node_type = list(connected.labels)[0]
-                node_id = connected.element_id
-
-                if node_id not in seen_nodes:
-                    if node_type == 'Variance':
-                        node_label = connected.get('variance_name', connected.get('id'))
-                        node_color = variance_color(connected.get('variance_amount'))
-                    else:
-                        node_label = connected.get('id') or connected.get('name') or connected.get('description')
-                        node_color = get_node_color(node_type)
-                    nodes.append({
-                        'id': node_id,
-                        'label': node_label,
-                        'type': node_type,
-                        'color': node_color,
-                        'size': 25,
-                        'properties': serialize_neo4j_types(dict(connected))
-                    })
-                    seen_nodes.add(node_id)
-                rel_type = record['rel_type']
-                direction = record['direction']
-                edge_id = f"{center.element_id}-{node_id}-{rel_type}"
-                if edge_id not in seen_edges:
-                    edge_props = serialize_neo4j_types(dict(record['r']))
-                    if direction == 'out':
-                        edges.append({
-                            'id': edge_id,
-                            'from': center.element_id,
-                            'to': node_id,
-                            'label': rel_type,
-                            'arrows': 'to',
-                            'properties': edge_props
-                        })
-                    else:
-                        edges.append({
-                            'id': edge_id,
-                            'from': node_id,
-                            'to': center.element_id,
-                            'label': rel_type,
-                            'arrows': 'to',
-                            'properties': edge_props
-                        })
-                    seen_edges.add(edge_id)
-            if not first_result:
-                return jsonify({'nodes': [], 'edges': []})
-            return jsonify({'nodes': nodes, 'edges': edges})
-    except Exception:
-        import traceback
-        traceback.print_exc()
-        return jsonify({'nodes': [], 'edges': []})
+    return {'nodes': nodes, 'edges': edges}
 
 
 @app.route('/api/overview', methods=['GET'])
+@response_cache.cached(ttl=600)
+@graph_format
 def get_overview():
     """전체 개요 그래프 (연결 확인용으로도 사용됨)"""
-    if not neo4j_conn.driver:
-        return jsonify({'nodes': [], 'edges': []})
-    try:
-        with neo4j_conn.driver.session() as session:
-            query = """
-            MATCH (v:Variance)
-            WITH v.cost_element as element,
-                 v.variance_type as type,
-                 collect(v)[..5] as sample_variances
-            UNWIND sample_variances as v
-            OPTIONAL MATCH (v)-[:CAUSED_BY]->(c:Cause)
-            RETURN element, type,
-                   collect(DISTINCT {
-                       id: elementId(v),
-                       label: v.id,
-                       props: properties(v)
-                   }) as variances,
-                   collect(DISTINCT {
-                       id: elementId(c),
-                       label: c.description,
-                       props: properties(c)
-                   }) as causes
-            """
-            results = session.run(query).data()
-            nodes = []
-            edges = []
-            element_nodes = {}
-            added_node_ids = set()
-            for row in results:
-                element = row['element']
-                if element not in element_nodes:
-                    elem_id = f"element_{element}"
-                    element_nodes[element] = elem_id
-                    nodes.append({
-                        'id': elem_id, 'label': element, 'type': 'CostElement',
-                        'color': '#3498db', 'size': 40, 'properties': {'name': element}
-                    })
-                for v in (row.get('variances') or []):
-                    if v and v.get('id') and v['id'] not in added_node_ids:
-                        added_node_ids.add(v['id'])
-                        nodes.append({
-                            'id': v['id'], 'label': v.get('label', ''), 'type': 'Variance',
-                            'color': '#98D8C8', 'size': 20, 'properties': v.get('props') or {}
-                        })
-                        edges.append({
-                            'from': element_nodes[element], 'to': v['id'],
-                            'label': row.get('type', ''), 'color': '#98D8C8'
-                        })
-                for c in (row.get('causes') or []):
-                    if c and c.get('id') and c['id'] not in added_node_ids:
-                        added_node_ids.add(c['id'])
-                        nodes.append({
-                            'id': c['id'], 'label': c.get('label', ''),
-                            'type': 'Cause', 'color': '#F7DC6F', 'size': 25,
-                            'properties': c.get('props') or {}
-                        })
-            return jsonify({'nodes': nodes, 'edges': edges})
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return jsonify({'nodes': [], 'edges': []})
+    return serve_plan(overview_plan, empty_graph)
+
+
+SUMMARY_QUERY = """
+MATCH (v:Variance)
+RETURN 
+    v.cost_element as element,
+    v.variance_type as type,
+    SUM(v.variance_amount) as total,
+    COUNT(v) as count
+ORDER BY element, type
+"""
+
+
+def summary_plan(args, body):
+    """요약 통계 쿼리 계획"""
+    return (yield {'rows': (SUMMARY_QUERY, None, fetch_data)})['rows']
 
 
 @app.route('/api/summary', methods=['GET'])
+@response_cache.cached(ttl=600)
 def get_summary():
     """요약 통계"""
-    
-    with neo4j_conn.driver.session() as session:
-        query = """
-        MATCH (v:Variance)
-        RETURN 
-            v.cost_element as element,
-            v.variance_type as type,
-            SUM(v.variance_amount) as total,
-            COUNT(v) as count
-        ORDER BY element, type
-        """
-        
-        results = session.run(query).data()
-        return jsonify(results)
+    return serve_plan(summary_plan, list)
 
 
-def _safe_month(fd):
-    """날짜 값에서 YYYY-MM 추출 (Neo4j Date/문자열 모두 처리)"""
-    if fd is None:
-        return None
-    s = str(fd) if not isinstance(fd, str) else fd
-    return s[:7] if len(s) >= 7 else s
+def empty_filters():
+    return {'products': [], 'work_centers': [], 'materials': [], 'months': []}
 
 
-def _empty_filters():
-    return jsonify({'products': [], 'work_centers': [], 'materials': [], 'months': []})
+def filters_plan(args, body):
+    """필터 옵션 - 메모리 카탈로그 (필요할 때만 상태/증분/전체 쿼리)"""
+    catalog = yield from filter_catalog.refresh_step()
+    return catalog.payload()
 
 
 @app.route('/api/filters', methods=['GET'])
+@response_cache.cached(ttl=60)
 def get_filters():
-    """필터 옵션 - 제품, 공정, 기간, 원자재"""
-    if not neo4j_conn.driver:
-        return _empty_filters()
-    try:
-        with neo4j_conn.driver.session() as session:
-            # 제품 목록
-            products_query = """
-            MATCH (po:ProductionOrder)
-            WHERE po.product_cd IS NOT NULL
-            RETURN DISTINCT po.product_cd as product
-            ORDER BY product
-            """
-            products = [row['product'] for row in session.run(products_query).data() if row.get('product')]
-            
-            # 공정 목록 (관계를 통해)
-            wc_query = """
-            MATCH (po:ProductionOrder)-[:WORKS_AT]->(wc:WorkCenter)
-            RETURN DISTINCT wc.id as work_center
-            ORDER BY work_center
-            """
-            work_centers = [row['work_center'] for row in session.run(wc_query).data() if row.get('work_center')]
-            
-            # 원자재 목록
-            material_query = """
-            MATCH (m:Material)
-            RETURN DISTINCT m.id as material_id, m.name as material_name
-            ORDER BY material_id
-            LIMIT 100
-            """
-            materials = [{'id': row['material_id'], 'name': row.get('material_name') or row['material_id']} 
-                        for row in session.run(material_query).data() if row.get('material_id')]
-            
-            # 기간 목록 (월별 - finish_date 사용, 문자열/날짜 모두 처리)
-            month_query = """
-            MATCH (po:ProductionOrder)
-            WHERE po.finish_date IS NOT NULL
-            RETURN DISTINCT po.finish_date as fd
-            ORDER BY fd DESC
-            """
-            months_raw = session.run(month_query).data()
-            months = sorted({_safe_month(row.get('fd')) for row in months_raw if row.get('fd')} - {None}, reverse=True)
-            
-            return jsonify({
-                'products': products or [],
-                'work_centers': work_centers or [],
-                'materials': materials or [],
-                'months': months or []
-            })
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return _empty_filters()
+    """필터 옵션 - 제품, 공정, 기간, 원자재 (원자재 개수 제한 없음)"""
+    return serve_plan(filters_plan, empty_filters)
 
 
-def _empty_filtered_summary():
-    return jsonify({'total_variance': 0, 'total_count': 0, 'by_type': []})
+FILTER_SEARCH_DEFAULT_LIMIT = 20
+FILTER_SEARCH_MAX_LIMIT = 200
 
 
-@app.route('/api/filtered_summary', methods=['POST'])
-def get_filtered_summary():
-    """필터 적용된 요약 통계"""
-    filters = request.json or {}
-    product = filters.get('product', '')
-    work_center = filters.get('work_center', '')
-    month = filters.get('month', '')
-    if not neo4j_conn.driver:
-        return _empty_filtered_summary()
-    try:
-        with neo4j_conn.driver.session() as session:
-            type_query = """
-            MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
-            WHERE ($product = '' OR po.product_cd = $product)
-            AND ($month = '' OR substring(toString(po.finish_date), 0, 7) = $month)
-            """
-            if work_center:
-                type_query += """
-                AND EXISTS {
-                    MATCH (po)-[:WORKS_AT]->(wc:WorkCenter {id: $work_center})
-                }
-                """
-            type_query += """
-            RETURN
-                v.cost_element as cost_element,
-                v.variance_type as variance_type,
-                SUM(v.variance_amount) as total_variance,
-                COUNT(v) as count
-            ORDER BY cost_element
-            """
-            by_type = session.run(type_query, product=product, work_center=work_center, month=month).data()
-            total_variance = sum([row.get('total_variance') or 0 for row in by_type])
-            total_count = sum([row.get('count') or 0 for row in by_type])
-            return jsonify({
-                'total_variance': total_variance,
-                'total_count': total_count,
-                'by_type': by_type or []
-            })
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return _empty_filtered_summary()
+def filters_search_plan(args, body):
+    """필터 항목 접두어 검색 (대규모 원자재 목록 자동완성용)"""
+    kind = args.get('kind', 'materials')
+    if kind not in FILTER_SEARCH_KINDS:
+        raise InvalidArguments(f"Invalid kind: {kind}")
+    limit = max(1, min(args.get('limit', FILTER_SEARCH_DEFAULT_LIMIT, type=int), FILTER_SEARCH_MAX_LIMIT))
+    catalog = yield from filter_catalog.refresh_step()
+    return {'kind': kind, 'items': catalog.search(kind, args.get('q', ''), limit)}
+
+
+def empty_filter_search():
+    return {'items': []}
+
+
+@app.route('/api/filters/search', methods=['GET'])
+def search_filters():
+    """필터 항목 접두어 검색
+
+    Query Parameters:
+        kind: products / work_centers / materials / months (기본 materials)
+        q: 접두어 (대소문자 무시, 원자재는 코드 또는 이름)
+        limit: 최대 개수 (기본 20, 최대 200)
+    """
+    return serve_plan(filters_search_plan, empty_filter_search)
+
+
+def empty_filtered_summary():
+    return {'total_variance': 0, 'total_count': 0, 'by_type': []}
+
+
+# 롤업 기반 필터 요약 (work_center = '' 은 전체 공정 롤업)
+FILTERED_SUMMARY_ROLLUP_QUERY = """
+MATCH (r:VarianceRollup)
+WHERE r.work_center = $work_center
+AND ($product = '' OR r.product_cd = $product)
+AND ($month = '' OR r.month = $month)
+RETURN
+    r.cost_element as cost_element,
+    r.variance_type as variance_type,
+    SUM(r.amount) as total_variance,
+    SUM(r.count) as count
+ORDER BY cost_element
+"""
+
+
+def build_filtered_summary_raw_query(work_center, month):
+    """롤업이 없을 때의 원본 Variance 집계 쿼리"""
+    type_query = """
+    MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
+    WHERE ($product = '' OR po.product_cd = $product)
+    """
+    if month:
+        # 조건을 분리해야 po.month 인덱스 seek 가능
+        type_query += """
+        AND po.month = $month
+        """
+    if work_center:
+        type_query += """
+        AND EXISTS {
+            MATCH (po)-[:WORKS_AT]->(wc:WorkCenter {id: $work_center})
+        }
+        """
+    type_query += """
+    RETURN
+        v.cost_element as cost_element,
+        v.variance_type as variance_type,
+        SUM(v.variance_amount) as total_variance,
+        COUNT(v) as count
+    ORDER BY cost_element
+    """
+    return type_query
+
+
+def filtered_summary_plan(args, body):
+    """필터 적용 요약 쿼리 계획"""
+    product = body.get('product', '')
+    work_center = body.get('work_center', '')
+    month = body.get('month', '')
+    if (yield from rollups_ready_step()):
+        type_query = FILTERED_SUMMARY_ROLLUP_QUERY
+    else:
+        type_query = build_filtered_summary_raw_query(work_center, month)
+    params = {'product': product, 'work_center': work_center, 'month': month}
+    by_type = (yield {'by_type': (type_query, params, fetch_data)})['by_type']
+    total_variance = sum([row.get('total_variance') or 0 for row in by_type])
+    total_count = sum([row.get('count') or 0 for row in by_type])
+    return {
+        'total_variance': total_variance,
+        'total_count': total_count,
+        'by_type': by_type or []
+    }
+
+
+@app.route('/api/filtered_summary', methods=['POST'])
+@response_cache.cached(ttl=300)
+def get_filtered_summary():
+    """필터 적용된 요약 통계"""
+    return serve_plan(filtered_summary_plan, empty_filtered_summary)
 
 
 @app.route('/api/test/produces/<order_no>', methods=['GET'])
 def test_produces(order_no):
     """PRODUCES 관계 테스트"""
     
-    with neo4j_conn.driver.session() as session:
+    with neo4j_conn.read_session() as session:
         result = session.run("""
             MATCH (po:ProductionOrder {id: $order_no})-[:PRODUCES]->(p:Product)
             RETURN p.id as product_id, p.name as product_name
@@ -1428,7 +1829,6 @@ def new_dashboard():
         return f"File not found: {html_path}", 404
     with open(html_path, 'r', encoding='utf-8') as f:
         content = f.read()
-    from flask import Response
     return Response(content, mimetype='text/html')
 
 @app.route('/dashboard.html')
@@ -1440,17 +1840,18 @@ def index():
         return f"File not found: {html_path}", 404
     with open(html_path, 'r', encoding='utf-8') as f:
         content = f.read()
-    from flask import Response
     return Response(content, mimetype='text/html')
 
 @app.route('/api/process-status', methods=['GET'])
+@response_cache.cached(ttl=300)
 def get_process_status():
     """공정별 Variance 상태 조회 (Heatmap용)"""
     if not neo4j_conn.driver:
+        response_cache.skip()
         return jsonify([])
 
     try:
-        with neo4j_conn.driver.session() as session:
+        with neo4j_conn.read_session() as session:
             query = """
             MATCH (wc:WorkCenter)
             OPTIONAL MATCH (wc)<-[:WORKS_AT]-(po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
@@ -1466,18 +1867,21 @@ def get_process_status():
             results = session.run(query).data()
             return jsonify(results)
     except Exception as e:
+        response_cache.skip()
         print(f"Error in get_process_status: {e}")
         # Return empty list to prevent frontend crash
         return jsonify([])
 
 @app.route('/api/order-costs/<order_id>', methods=['GET'])
+@response_cache.cached(ttl=300)
 def get_order_costs(order_id):
     """생산오더 비용 분석 (Waterfall Chart용)"""
     if not neo4j_conn.driver:
+        response_cache.skip()
         return jsonify({'error': 'No DB connection'}), 500
 
     try:
-        with neo4j_conn.driver.session() as session:
+        with neo4j_conn.read_session() as session:
             # 1. Planned Cost 계산 (Product Standard Cost * Order Actual Qty)
             # 2. Variance 조회
             query = """
@@ -1507,10 +1911,13 @@ def get_order_costs(order_id):
                 'variances': variances
             })
     except Exception as e:
+        response_cache.skip()
         print(f"Error in get_order_costs: {e}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/graph-data', methods=['GET'])
+@response_cache.cached(ttl=300)
+@graph_format
 def get_graph_data():
     """Graph Explorer용 데이터 (Generic)"""
     node_id = request.args.get('id')
@@ -1552,520 +1959,929 @@ def _default_summary():
     }
 
 
-def _empty_dashboard_response():
-    return jsonify({
+def empty_dashboard_response():
+    return {
         'summary': _default_summary(),
         'monthly_trend': [], 'by_type': [], 'by_product': [], 'by_process': [], 'top_orders': []
-    })
+    }
+
+
+# 대시보드 단일 패스 집계
+# 섹션별 필터 적용 범위: summary/by_type/top_orders = 제품+공정+기간,
+# monthly_trend = 제품+공정, by_product = 공정+기간, by_process = 제품+기간
+# → 세 필터 중 두 개 이상을 만족하는 오더만 한 번에 가져와 Python에서 분배
+DASHBOARD_ROWS_QUERY = """
+MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
+WITH po, v.cost_element as element,
+     sum(v.variance_amount) as amount,
+     count(v) as cnt
+WITH po, collect({element: element, amount: amount, count: cnt}) as elements
+OPTIONAL MATCH (po)-[:WORKS_AT]->(wc:WorkCenter)
+WITH po, elements,
+     po.month as month,
+     collect(DISTINCT wc.id) as work_centers
+WITH po, elements, month, work_centers,
+     ($product = '' OR po.product_cd = $product) as p_ok,
+     ($work_center = '' OR $work_center IN work_centers) as w_ok,
+     ($month = '' OR month = $month) as m_ok
+WHERE (p_ok AND w_ok) OR (w_ok AND m_ok) OR (p_ok AND m_ok)
+RETURN po.id as order_no,
+       po.product_cd as product,
+       month,
+       work_centers,
+       elements,
+       p_ok, w_ok, m_ok
+"""
+
+# 원가요소 → 요약 필드 접두어
+_SUMMARY_ELEMENT_KEYS = {
+    'MATERIAL': 'quantity',
+    'LABOR': 'price',
+    'OVERHEAD': 'production'
+}
+
+
+def _sorted_by_abs(totals, key_name):
+    rows = [{key_name: k, 'amount': v} for k, v in totals.items()]
+    rows.sort(key=lambda r: abs(r['amount'] or 0), reverse=True)
+    return rows
+
+
+def dashboard_top_orders(top_orders, work_center='', top_n=20):
+    """상위 오더 → 대시보드 행 (공정 필터가 있으면 해당 공정만, 없으면 오더의 모든 공정별로 한 행씩)"""
+    orders = []
+    for order in top_orders:
+        wcs = [work_center] if work_center else (order.get('work_centers') or [None])
+        for wc_id in wcs:
+            orders.append({
+                'order_no': order.get('order_no'),
+                'product': order.get('product'),
+                'work_center': wc_id,
+                'total_variance': order.get('total_variance')
+            })
+    return orders[:top_n]
+
+
+def aggregate_dashboard_rows(rows, top_orders, work_center='', top_n=20):
+    """오더 단위 행 집합을 한 번 순회하며 대시보드 5개 섹션을 동시에 계산 (상위 오더는 top_variance_index)
+
+    rows: DASHBOARD_ROWS_QUERY 결과 (p_ok/w_ok/m_ok 필터 플래그 포함)
+    """
+    summary = _default_summary()
+    trend = {}
+    by_type = {}
+    by_product = {}
+    by_process = {}
+
+    for row in rows:
+        p_ok, w_ok, m_ok = row.get('p_ok'), row.get('w_ok'), row.get('m_ok')
+        elements = row.get('elements') or []
+        order_total = 0
+        order_count = 0
+        for item in elements:
+            amount = item.get('amount') or 0
+            count = item.get('count') or 0
+            order_total += amount
+            order_count += count
+            if p_ok and w_ok and m_ok:
+                prefix = _SUMMARY_ELEMENT_KEYS.get(item.get('element'))
+                if prefix:
+                    summary[f'{prefix}_variance'] += amount
+                    summary[f'{prefix}_count'] += count
+                element = item.get('element')
+                by_type[element] = by_type.get(element, 0) + amount
+
+        if p_ok and w_ok:
+            month = row.get('month')
+            trend[month] = trend.get(month, 0) + order_total
+        if w_ok and m_ok:
+            product = row.get('product')
+            by_product[product] = by_product.get(product, 0) + order_total
+        if p_ok and m_ok:
+            for wc_id in row.get('work_centers') or []:
+                by_process[wc_id] = by_process.get(wc_id, 0) + order_total
+        if p_ok and w_ok and m_ok:
+            summary['total_variance'] += order_total
+            summary['variance_count'] += order_count
+
+    # Neo4j ORDER BY와 동일하게 null 월은 마지막
+    monthly_trend = [{'month': m, 'total': t}
+                     for m, t in sorted(trend.items(), key=lambda kv: (kv[0] is None, kv[0] or ''))]
+
+    return {
+        'summary': summary,
+        'monthly_trend': monthly_trend,
+        'by_type': [{'element': k, 'amount': v} for k, v in by_type.items()],
+        'by_product': _sorted_by_abs(by_product, 'product'),
+        'by_process': _sorted_by_abs(by_process, 'work_center'),
+        'top_orders': dashboard_top_orders(top_orders, work_center, top_n)
+    }
+
+
+# 롤업 기반 대시보드 쿼리 (Neo4jDataLoader.build_variance_rollups 결과 사용)
+# - 선택 공정 범위(work_center = $work_center, 미선택 시 '') 롤업: 제품 또는 기간 조건 충족분
+# - 공정별 롤업: 제품+기간 조건 충족분 (by_process)
+# - 상위 오더는 top_variance_index에서
+DASHBOARD_ROLLUP_QUERY = """
+MATCH (r:VarianceRollup)
+WITH r,
+     ($product = '' OR r.product_cd = $product) as p_ok,
+     ($month = '' OR r.month = $month) as m_ok
+WHERE (r.work_center = $work_center AND (p_ok OR m_ok))
+   OR (r.work_center <> '' AND p_ok AND m_ok)
+RETURN collect(r {.product_cd, .work_center, .month, .cost_element, .amount, .count,
+                  p_ok: p_ok, m_ok: m_ok}) as rollups
+"""
+
+
+def aggregate_dashboard_rollups(rollups, top_orders, work_center='', top_n=20):
+    """롤업 행을 한 번 순회하며 대시보드 섹션 계산 (결과 형식은 aggregate_dashboard_rows와 동일)"""
+    summary = _default_summary()
+    trend = {}
+    by_type = {}
+    by_product = {}
+    by_process = {}
+
+    for r in rollups:
+        p_ok, m_ok = r.get('p_ok'), r.get('m_ok')
+        amount = r.get('amount') or 0
+        count = r.get('count') or 0
+        wc_id = r.get('work_center') or ''
+        if wc_id == work_center:
+            if p_ok:
+                month = r.get('month')
+                trend[month] = trend.get(month, 0) + amount
+            if m_ok:
+                product = r.get('product_cd')
+                by_product[product] = by_product.get(product, 0) + amount
+            if p_ok and m_ok:
+                element = r.get('cost_element')
+                prefix = _SUMMARY_ELEMENT_KEYS.get(element)
+                if prefix:
+                    summary[f'{prefix}_variance'] += amount
+                    summary[f'{prefix}_count'] += count
+                summary['total_variance'] += amount
+                summary['variance_count'] += count
+                by_type[element] = by_type.get(element, 0) + amount
+        if wc_id and p_ok and m_ok:
+            by_process[wc_id] = by_process.get(wc_id, 0) + amount
+
+    monthly_trend = [{'month': m, 'total': t}
+                     for m, t in sorted(trend.items(), key=lambda kv: (kv[0] is None, kv[0] or ''))]
+
+    return {
+        'summary': summary,
+        'monthly_trend': monthly_trend,
+        'by_type': [{'element': k, 'amount': v} for k, v in by_type.items()],
+        'by_product': _sorted_by_abs(by_product, 'product'),
+        'by_process': _sorted_by_abs(by_process, 'work_center'),
+        'top_orders': dashboard_top_orders(top_orders, work_center, top_n)
+    }
+
+
+def dashboard_data_plan(args, body):
+    """대시보드 쿼리 계획 - 롤업이 있으면 롤업, 없으면 원본 단일 패스"""
+    product = body.get('product', '')
+    work_center = body.get('work_center', '')
+    month = body.get('month', '')
+    params = {'product': product, 'work_center': work_center, 'month': month}
+    index = yield from top_variance_index.refresh_step()
+    top_orders = index.top('order', 20, product, work_center, month)
+    if (yield from rollups_ready_step()):
+        row = (yield {'row': (DASHBOARD_ROLLUP_QUERY, params, fetch_single)})['row']
+        return aggregate_dashboard_rollups(row['rollups'], top_orders, work_center=work_center)
+    rows = (yield {'rows': (DASHBOARD_ROWS_QUERY, params, fetch_data)})['rows']
+    return aggregate_dashboard_rows(rows, top_orders, work_center=work_center)
 
 
 @app.route('/api/dashboard-data', methods=['POST'])
+@response_cache.cached(ttl=300)
 def get_dashboard_data():
-    """대시보드 데이터 제공"""
-    data = request.json or {}
-    product = data.get('product', '')
-    work_center = data.get('work_center', '')
-    month = data.get('month', '')
-    if not neo4j_conn.driver:
-        return _empty_dashboard_response()
-    try:
-        with neo4j_conn.driver.session() as session:
-            # 요약 데이터
-            if work_center:
-                summary_query = """
-            MATCH (po:ProductionOrder)-[:WORKS_AT]->(wc:WorkCenter)
-            MATCH (po)-[:HAS_VARIANCE]->(v:Variance)
-            WHERE ($product = '' OR po.product_cd = $product)
-            AND wc.id = $work_center
-            AND ($month = '' OR substring(toString(po.finish_date), 0, 7) = $month)
-            RETURN 
-                sum(v.variance_amount) as total_variance,
-                count(v) as variance_count,
-                sum(CASE WHEN v.cost_element = 'MATERIAL' THEN v.variance_amount ELSE 0 END) as quantity_variance,
-                sum(CASE WHEN v.cost_element = 'MATERIAL' THEN 1 ELSE 0 END) as quantity_count,
-                sum(CASE WHEN v.cost_element = 'LABOR' THEN v.variance_amount ELSE 0 END) as price_variance,
-                sum(CASE WHEN v.cost_element = 'LABOR' THEN 1 ELSE 0 END) as price_count,
-                sum(CASE WHEN v.cost_element = 'OVERHEAD' THEN v.variance_amount ELSE 0 END) as production_variance,
-                sum(CASE WHEN v.cost_element = 'OVERHEAD' THEN 1 ELSE 0 END) as production_count
-            """
-            else:
-                summary_query = """
-            MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
-            WHERE ($product = '' OR po.product_cd = $product)
-            AND ($month = '' OR substring(toString(po.finish_date), 0, 7) = $month)
-            RETURN 
-                sum(v.variance_amount) as total_variance,
-                count(v) as variance_count,
-                sum(CASE WHEN v.cost_element = 'MATERIAL' THEN v.variance_amount ELSE 0 END) as quantity_variance,
-                sum(CASE WHEN v.cost_element = 'MATERIAL' THEN 1 ELSE 0 END) as quantity_count,
-                sum(CASE WHEN v.cost_element = 'LABOR' THEN v.variance_amount ELSE 0 END) as price_variance,
-                sum(CASE WHEN v.cost_element = 'LABOR' THEN 1 ELSE 0 END) as price_count,
-                sum(CASE WHEN v.cost_element = 'OVERHEAD' THEN v.variance_amount ELSE 0 END) as production_variance,
-                sum(CASE WHEN v.cost_element = 'OVERHEAD' THEN 1 ELSE 0 END) as production_count
-            """
-            summary_row = session.run(summary_query, product=product, work_center=work_center, month=month).single()
-            summary = summary_row if summary_row else _default_summary()
-            
-            # 월별 트렌드
-            if work_center:
-                trend_query = """
-            MATCH (po:ProductionOrder)-[:WORKS_AT]->(wc:WorkCenter)
-            MATCH (po)-[:HAS_VARIANCE]->(v:Variance)
-            WHERE ($product = '' OR po.product_cd = $product)
-            AND wc.id = $work_center
-            WITH substring(toString(po.finish_date), 0, 7) as month, sum(v.variance_amount) as total
-            RETURN month, total
-            ORDER BY month
-            """
-            else:
-                trend_query = """
-            MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
-            WHERE ($product = '' OR po.product_cd = $product)
-            WITH substring(toString(po.finish_date), 0, 7) as month, sum(v.variance_amount) as total
-            RETURN month, total
-            ORDER BY month
-            """
-            trend = session.run(trend_query, product=product, work_center=work_center).data()
-            
-            # 차이 유형별
-            if work_center:
-                type_query = """
-            MATCH (po:ProductionOrder)-[:WORKS_AT]->(wc:WorkCenter)
-            MATCH (po)-[:HAS_VARIANCE]->(v:Variance)
-            WHERE ($product = '' OR po.product_cd = $product)
-            AND wc.id = $work_center
-            AND ($month = '' OR substring(toString(po.finish_date), 0, 7) = $month)
-            WITH v.cost_element as element, sum(v.variance_amount) as amount
-            RETURN element, amount
-            """
-            else:
-                type_query = """
-            MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
-            WHERE ($product = '' OR po.product_cd = $product)
-            AND ($month = '' OR substring(toString(po.finish_date), 0, 7) = $month)
-            WITH v.cost_element as element, sum(v.variance_amount) as amount
-            RETURN element, amount
-            """
-            by_type = session.run(type_query, product=product, work_center=work_center, month=month).data()
-            
-            # 제품별
-            if work_center:
-                product_query = """
-            MATCH (po:ProductionOrder)-[:WORKS_AT]->(wc:WorkCenter)
-            MATCH (po)-[:HAS_VARIANCE]->(v:Variance)
-            WHERE wc.id = $work_center
-            AND ($month = '' OR substring(toString(po.finish_date), 0, 7) = $month)
-            WITH po.product_cd as product, sum(v.variance_amount) as amount
-            RETURN product, amount
-            ORDER BY abs(amount) DESC
-            """
-            else:
-                product_query = """
-            MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
-            WHERE ($month = '' OR substring(toString(po.finish_date), 0, 7) = $month)
-            WITH po.product_cd as product, sum(v.variance_amount) as amount
-            RETURN product, amount
-            ORDER BY abs(amount) DESC
-            """
-            by_product = session.run(product_query, work_center=work_center, month=month).data()
-            
-            # 공정별
-            process_query = """
+    """대시보드 데이터 제공 (단일 쿼리 + 단일 집계 패스, 롤업이 있으면 롤업 사용)"""
+    return serve_plan(dashboard_data_plan, empty_dashboard_response)
+
+
+TOP_VARIANCE_DEFAULT_K = 20
+TOP_VARIANCE_MAX_K = 1000
+
+
+def empty_top_variances():
+    return {'items': []}
+
+
+def top_variances_plan(args, body):
+    """상위 차이 - 메모리 정렬 배열 인덱스 (필요할 때만 상태/증분/전체 쿼리)"""
+    kind = args.get('kind', 'variance')
+    if kind not in TOP_VARIANCE_KINDS:
+        raise InvalidArguments(f"Invalid kind: {kind}")
+    k = args.get('k', TOP_VARIANCE_DEFAULT_K, type=int)
+    if not 1 <= k <= TOP_VARIANCE_MAX_K:
+        raise InvalidArguments(f"k must be between 1 and {TOP_VARIANCE_MAX_K}")
+    filters = {name: args.get(name, '') for name in ('product', 'work_center', 'month')}
+    index = yield from top_variance_index.refresh_step()
+    return {'kind': kind, 'k': k, 'filters': filters, 'items': index.top(kind, k, **filters)}
+
+
+@app.route('/api/variances/top', methods=['GET'])
+@response_cache.cached(ttl=60)
+def get_top_variances():
+    """|차이금액| 상위 Variance / 생산오더
+
+    Query Parameters:
+        k: 개수 (기본 20, 최대 1000)
+        product, work_center, month: 필터 (조합 가능, 빈 값이면 전체)
+        kind: variance (기본) / order (오더별 차이 합계)
+    """
+    return serve_plan(top_variances_plan, empty_top_variances)
+
+
+# 비교 대상 유형별 매칭 절 - 원본 Variance 스캔 (value: UNWIND된 대상 값)
+_COMPARISON_RAW_MATCH = {
+    'product': """
+        MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
+        WHERE po.product_cd = value
+    """,
+    'work_center': """
         MATCH (po:ProductionOrder)-[:WORKS_AT]->(wc:WorkCenter)
         MATCH (po)-[:HAS_VARIANCE]->(v:Variance)
-        WHERE ($product = '' OR po.product_cd = $product)
-        AND ($month = '' OR substring(toString(po.finish_date), 0, 7) = $month)
-        WITH wc.id as work_center, sum(v.variance_amount) as amount
-        RETURN work_center, amount
-        ORDER BY abs(amount) DESC
-        """
-            by_process = session.run(process_query, product=product, month=month).data()
-            
-            # 상위 오더
-            if work_center:
-                top_orders_query = """
-            MATCH (po:ProductionOrder)-[:WORKS_AT]->(wc:WorkCenter)
-            MATCH (po)-[:HAS_VARIANCE]->(v:Variance)
-            WHERE ($product = '' OR po.product_cd = $product)
-            AND wc.id = $work_center
-            AND ($month = '' OR substring(toString(po.finish_date), 0, 7) = $month)
-            WITH po, wc, sum(v.variance_amount) as total_variance
-            ORDER BY abs(total_variance) DESC
-            LIMIT 20
-            RETURN po.id as order_no, po.product_cd as product, wc.id as work_center, total_variance
-            """
-            else:
-                top_orders_query = """
-            MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
-            OPTIONAL MATCH (po)-[:WORKS_AT]->(wc:WorkCenter)
-            WHERE ($product = '' OR po.product_cd = $product)
-            AND ($month = '' OR substring(toString(po.finish_date), 0, 7) = $month)
-            WITH po, wc, sum(v.variance_amount) as total_variance
-            ORDER BY abs(total_variance) DESC
-            LIMIT 20
-            RETURN po.id as order_no, po.product_cd as product, wc.id as work_center, total_variance
-            """
-            top_orders = session.run(top_orders_query, product=product, work_center=work_center, month=month).data()
-            
-            return jsonify({
-                'summary': {
-                    'total_variance': (summary.get('total_variance') or 0),
-                    'variance_count': (summary.get('variance_count') or 0),
-                    'quantity_variance': (summary.get('quantity_variance') or 0),
-                    'quantity_count': (summary.get('quantity_count') or 0),
-                    'price_variance': (summary.get('price_variance') or 0),
-                    'price_count': (summary.get('price_count') or 0),
-                    'production_variance': (summary.get('production_variance') or 0),
-                    'production_count': (summary.get('production_count') or 0)
-                },
-                'monthly_trend': trend or [],
-                'by_type': by_type or [],
-                'by_product': by_product or [],
-                'by_process': by_process or [],
-                'top_orders': top_orders or []
-            })
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return _empty_dashboard_response()
+        WHERE wc.id = value
+    """,
+    'month': """
+        MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
+        WHERE po.month = value
+    """
+}
+
+_COMPARISON_RAW_GROUP = """
+        RETURN po.month as month, v.variance_type as variance_type,
+               sum(v.variance_amount) as amount, count(v) as cnt
+"""
 
+# 비교 대상 유형별 매칭 절 - VarianceRollup
+_COMPARISON_ROLLUP_MATCH = {
+    'product': "MATCH (r:VarianceRollup) WHERE r.work_center = '' AND r.product_cd = value",
+    'work_center': "MATCH (r:VarianceRollup) WHERE r.work_center = value",
+    'month': "MATCH (r:VarianceRollup) WHERE r.work_center = '' AND r.month = value"
+}
 
-@app.route('/api/comparison-data', methods=['POST'])
-def get_comparison_data():
-    """비교 분석 데이터 제공"""
-    data = request.json or {}
-    targets = data.get('targets', [])
+_COMPARISON_ROLLUP_GROUP = """
+        RETURN r.month as month, r.variance_type as variance_type,
+               sum(r.amount) as amount, sum(r.count) as cnt
+"""
+
+_COMPARISON_TYPE_KEYS = {
+    'QUANTITY': 'quantity_variance',
+    'PRICE': 'price_variance',
+    'PRODUCTION': 'production_variance'
+}
+
+
+def build_comparison_batch_query(match, group):
+    """유형별 대상 값 전체를 UNWIND 하여 한 번에 (대상, 월, 차이유형) 단위로 집계"""
+    return f"""
+    UNWIND $values as value
+    CALL {{
+        WITH value
+        {match}
+        {group}
+    }}
+    RETURN value, month, variance_type, amount, cnt
+    """
+
+
+def _new_comparison_entry():
+    return {
+        'summary': {
+            'total_variance': 0, 'variance_count': 0,
+            'quantity_variance': 0, 'price_variance': 0, 'production_variance': 0
+        },
+        'trend': {}
+    }
+
+
+def split_comparison_rows(rows):
+    """배치 결과를 대상 값별 요약/월별 트렌드로 분리"""
+    per_value = {}
+    for row in rows:
+        entry = per_value.get(row['value'])
+        if entry is None:
+            entry = per_value[row['value']] = _new_comparison_entry()
+        amount = row.get('amount') or 0
+        summary = entry['summary']
+        summary['total_variance'] += amount
+        summary['variance_count'] += row.get('cnt') or 0
+        type_key = _COMPARISON_TYPE_KEYS.get(row.get('variance_type'))
+        if type_key:
+            summary[type_key] += amount
+        month = row.get('month')
+        entry['trend'][month] = entry['trend'].get(month, 0) + amount
+    return per_value
+
+
+def empty_comparison():
+    return {'summaries': [], 'trends': []}
+
+
+def comparison_data_plan(args, body):
+    """비교 분석 쿼리 계획 - 대상 유형별 배치 쿼리 병렬 실행"""
+    targets = [t for t in body.get('targets', []) if t.get('type') in _COMPARISON_ROLLUP_MATCH]
+    
+    if (yield from rollups_ready_step()):
+        match_clauses, group = _COMPARISON_ROLLUP_MATCH, _COMPARISON_ROLLUP_GROUP
+    else:
+        match_clauses, group = _COMPARISON_RAW_MATCH, _COMPARISON_RAW_GROUP
+    
+    values_by_type = {}
+    for target in targets:
+        values = values_by_type.setdefault(target['type'], [])
+        if target['value'] not in values:
+            values.append(target['value'])
+    
+    batch = yield {
+        target_type: (build_comparison_batch_query(match_clauses[target_type], group),
+                      {'values': values}, fetch_data)
+        for target_type, values in values_by_type.items()
+    }
+    per_type = {target_type: split_comparison_rows(rows) for target_type, rows in batch.items()}
     
     summaries = []
     trends = []
+    for target in targets:
+        entry = per_type.get(target['type'], {}).get(target['value']) or _new_comparison_entry()
+        summaries.append(entry['summary'])
+        
+        # 월별 트렌드 (기간 비교가 아닌 경우에만)
+        if target['type'] in ('product', 'work_center'):
+            trends.append([
+                {'month': m, 'total': t}
+                for m, t in sorted(entry['trend'].items(), key=lambda kv: (kv[0] is None, kv[0] or ''))
+            ])
     
-    with neo4j_conn.driver.session() as session:
-        for target in targets:
-            # 요약 데이터
-            if target['type'] == 'product':
-                summary_query = """
-                MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
-                WHERE po.product_cd = $value
-                RETURN 
-                    sum(v.variance_amount) as total_variance,
-                    count(v) as variance_count,
-                    sum(CASE WHEN v.variance_type = 'QUANTITY' THEN v.variance_amount ELSE 0 END) as quantity_variance,
-                    sum(CASE WHEN v.variance_type = 'PRICE' THEN v.variance_amount ELSE 0 END) as price_variance,
-                    sum(CASE WHEN v.variance_type = 'PRODUCTION' THEN v.variance_amount ELSE 0 END) as production_variance
-                """
-            elif target['type'] == 'work_center':
-                summary_query = """
-                MATCH (po:ProductionOrder)-[:WORKS_AT]->(wc:WorkCenter)
-                MATCH (po)-[:HAS_VARIANCE]->(v:Variance)
-                WHERE wc.id = $value
-                RETURN 
-                    sum(v.variance_amount) as total_variance,
-                    count(v) as variance_count,
-                    sum(CASE WHEN v.variance_type = 'QUANTITY' THEN v.variance_amount ELSE 0 END) as quantity_variance,
-                    sum(CASE WHEN v.variance_type = 'PRICE' THEN v.variance_amount ELSE 0 END) as price_variance,
-                    sum(CASE WHEN v.variance_type = 'PRODUCTION' THEN v.variance_amount ELSE 0 END) as production_variance
-                """
-            elif target['type'] == 'month':
-                summary_query = """
-                MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
-                WHERE substring(toString(po.finish_date), 0, 7) = $value
-                RETURN 
-                    sum(v.variance_amount) as total_variance,
-                    count(v) as variance_count,
-                    sum(CASE WHEN v.variance_type = 'QUANTITY' THEN v.variance_amount ELSE 0 END) as quantity_variance,
-                    sum(CASE WHEN v.variance_type = 'PRICE' THEN v.variance_amount ELSE 0 END) as price_variance,
-                    sum(CASE WHEN v.variance_type = 'PRODUCTION' THEN v.variance_amount ELSE 0 END) as production_variance
-                """
-            else:
-                continue
-            
-            summary = session.run(summary_query, value=target['value']).single()
-            
-            summaries.append({
-                'total_variance': summary['total_variance'] or 0,
-                'variance_count': summary['variance_count'] or 0,
-                'quantity_variance': summary['quantity_variance'] or 0,
-                'price_variance': summary['price_variance'] or 0,
-                'production_variance': summary['production_variance'] or 0
-            })
-            
-            # 월별 트렌드 (기간 비교가 아닌 경우에만)
-            if target['type'] == 'product':
-                trend_query = """
-                MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v:Variance)
-                WHERE po.product_cd = $value
-                WITH substring(toString(po.finish_date), 0, 7) as month, sum(v.variance_amount) as total
-                RETURN month, total
-                ORDER BY month
-                """
-                trend = session.run(trend_query, value=target['value']).data()
-                trends.append(trend)
-            elif target['type'] == 'work_center':
-                trend_query = """
-                MATCH (po:ProductionOrder)-[:WORKS_AT]->(wc:WorkCenter)
-                MATCH (po)-[:HAS_VARIANCE]->(v:Variance)
-                WHERE wc.id = $value
-                WITH substring(toString(po.finish_date), 0, 7) as month, sum(v.variance_amount) as total
-                RETURN month, total
-                ORDER BY month
-                """
-                trend = session.run(trend_query, value=target['value']).data()
-                trends.append(trend)
-    
-    return jsonify({
+    return {
         'summaries': summaries,
         'trends': trends if trends else []
-    })
+    }
+
+
+@app.route('/api/comparison-data', methods=['POST'])
+@response_cache.cached(ttl=300)
+def get_comparison_data():
+    """비교 분석 데이터 제공 (대상 유형별 배치 쿼리 - 대상 수와 무관하게 최대 3회 조회)"""
+    return serve_plan(comparison_data_plan, empty_comparison)
+
+
+def cost_allocation_graph_plan(args, body, workcenter_id):
+    """배부 그래프 쿼리 계획 (WorkCenter → CostPool → ProductionOrder) - WorkCenter가 없으면 빈 그래프"""
+    try:
+        return (yield from entity_graph_plan('cost_allocation', workcenter_id, 'WorkCenter not found'))
+    except NotFound:
+        return {'nodes': [], 'edges': [], 'center': workcenter_id}
 
 
 @app.route('/api/analysis/cost-allocation/<workcenter_id>', methods=['GET'])
+@response_cache.cached(ttl=300)
+@graph_format
 def get_cost_allocation_graph(workcenter_id):
     """Cost Allocation Visualization"""
+    if wants_stream():
+        return stream_graph_response('cost_allocation', workcenter_id)
+    return serve_plan(cost_allocation_graph_plan, empty_graph, workcenter_id=workcenter_id)
 
-    try:
-        with neo4j_conn.driver.session() as session:
-            query = """
-            MATCH (wc:WorkCenter {id: $wc_id})-[:INCURRED_COST]->(cp:CostPool)
-            OPTIONAL MATCH (cp)-[r:ALLOCATES]->(po:ProductionOrder)
 
-            RETURN wc, cp, collect({rel: r, po: po}) as allocations
-            """
+MOM_COMPARISON_QUERY = """
+MATCH (p:Product {id: $product_id})-[:HAS_MONTHLY_STATE]->(curr:MonthlyProductState)
+OPTIONAL MATCH (prev:MonthlyProductState)-[:NEXT_MONTH]->(curr)
 
-            result = session.run(query, wc_id=workcenter_id).data()
-
-            nodes = []
-            edges = []
-            seen_nodes = set()
-
-            for row in result:
-                wc = row['wc']
-                cp = row['cp']
-                allocations = row['allocations']
-
-                # WorkCenter Node
-                if wc and wc.element_id not in seen_nodes:
-                    nodes.append({
-                        'id': wc.element_id,
-                        'label': wc['name'],
-                        'type': 'WorkCenter',
-                        'color': get_node_color('WorkCenter'),
-                        'size': 35,
-                        'properties': serialize_neo4j_types(dict(wc))
-                    })
-                    seen_nodes.add(wc.element_id)
-
-                # CostPool Node
-                if cp and cp.element_id not in seen_nodes:
-                    nodes.append({
-                        'id': cp.element_id,
-                        'label': f"Pool {cp['month']}",
-                        'type': 'CostPool',
-                        'color': get_node_color('CostPool'),
-                        'size': 30,
-                        'properties': serialize_neo4j_types(dict(cp))
-                    })
-                    seen_nodes.add(cp.element_id)
-
-                    # Edge WC -> CostPool
-                    edges.append({
-                        'from': wc.element_id,
-                        'to': cp.element_id,
-                        'label': 'INCURRED_COST',
-                        'color': get_node_color('CostPool'),
-                        'arrows': 'to'
-                    })
-
-                # ProductionOrder Nodes and Edges
-                for alloc in allocations:
-                    if alloc['po']:
-                        po = alloc['po']
-                        r = alloc['rel']
-
-                        if po.element_id not in seen_nodes:
-                            nodes.append({
-                                'id': po.element_id,
-                                'label': po['id'],
-                                'type': 'ProductionOrder',
-                                'color': get_node_color('ProductionOrder'),
-                                'size': 25,
-                                'properties': serialize_neo4j_types(dict(po))
-                            })
-                            seen_nodes.add(po.element_id)
-
-                        # Edge CostPool -> PO
-                        edges.append({
-                            'from': cp.element_id,
-                            'to': po.element_id,
-                            'label': 'ALLOCATES',
-                            'color': get_node_color('CostPool'),
-                            'arrows': 'to',
-                            'properties': serialize_neo4j_types(dict(r))
-                        })
+RETURN curr, prev
+ORDER BY curr.month DESC
+"""
 
-            return jsonify({
-                'nodes': nodes,
-                'edges': edges,
-                'center': workcenter_id
-            })
-    except Exception as e:
-        print(f"Error in get_cost_allocation_graph: {e}")
-        return jsonify({'nodes': [], 'edges': [], 'center': workcenter_id})
+
+def mom_comparison_plan(args, body, product_id):
+    """전월 대비 단위원가 변화 쿼리 계획"""
+    result = (yield {'months': (MOM_COMPARISON_QUERY, {'product_id': product_id}, fetch_data)})['months']
+
+    data = []
+    for row in result:
+        curr = row['curr']
+        prev = row['prev']
+
+        item = {
+            'month': curr['month'],
+            'current_cost': curr['actual_unit_cost'],
+            'total_yield': curr['total_yield']
+        }
+
+        if prev:
+            item['prev_cost'] = prev['actual_unit_cost']
+            item['change_amount'] = curr['actual_unit_cost'] - prev['actual_unit_cost']
+            if prev['actual_unit_cost'] > 0:
+                item['change_percent'] = (item['change_amount'] / prev['actual_unit_cost']) * 100
+            else:
+                item['change_percent'] = 0.0
+        else:
+            item['prev_cost'] = None
+            item['change_amount'] = None
+            item['change_percent'] = None
+
+        data.append(item)
+
+    return data
 
 
 @app.route('/api/analysis/comparison/mom/<product_id>', methods=['GET'])
+@response_cache.cached(ttl=600)
 def get_mom_comparison(product_id):
     """Month-over-Month Comparison"""
+    return serve_plan(mom_comparison_plan, list, product_id=product_id)
 
-    try:
-        with neo4j_conn.driver.session() as session:
-            query = """
-            MATCH (p:Product {id: $product_id})-[:HAS_MONTHLY_STATE]->(curr:MonthlyProductState)
-            OPTIONAL MATCH (prev:MonthlyProductState)-[:NEXT_MONTH]->(curr)
 
-            RETURN curr, prev
-            ORDER BY curr.month DESC
-            """
+# ==========================================
+# 원인 추적 (ROOT_CAUSE closure)
+# ==========================================
+# 로더가 Variance→Symptom→Factor→Cause 경로를 Variance-[:ROOT_CAUSE]->Cause 관계로 미리 묶어 두므로
+# (path_count, weight, amount, 경로별 symptom_ids / factor_ids) 원인 추적은 한 홉 조회로 끝나고
+# 원인을 기여도(weight) 순으로 정렬해 반환한다. closure가 없는 DB는 기존 4홉 경로 쿼리로 처리한다.
+
+ROOT_CAUSE_CLOSURE_QUERY = """
+MATCH (v:Variance {id: $variance_id})
+OPTIONAL MATCH (v)-[rc:ROOT_CAUSE]->(c:Cause)
+WITH v, rc, c
+ORDER BY rc.weight DESC, c.code
+RETURN v, [item IN collect({rel: rc, cause: c}) WHERE item.rel IS NOT NULL] as causes
+"""
 
-            result = session.run(query, product_id=product_id).data()
-
-            data = []
-            for row in result:
-                curr = row['curr']
-                prev = row['prev']
-
-                item = {
-                    'month': curr['month'],
-                    'current_cost': curr['actual_unit_cost'],
-                    'total_yield': curr['total_yield']
-                }
-
-                if prev:
-                    item['prev_cost'] = prev['actual_unit_cost']
-                    item['change_amount'] = curr['actual_unit_cost'] - prev['actual_unit_cost']
-                    if prev['actual_unit_cost'] > 0:
-                        item['change_percent'] = (item['change_amount'] / prev['actual_unit_cost']) * 100
-                    else:
-                        item['change_percent'] = 0.0
-                else:
-                    item['prev_cost'] = None
-                    item['change_amount'] = None
-                    item['change_percent'] = None
-
-                data.append(item)
-
-            return jsonify(data)
-    except Exception as e:
-        print(f"Error in get_mom_comparison: {e}")
-        return jsonify([])
+ROOT_CAUSE_INTERMEDIATE_QUERY = """
+MATCH (s:Symptom) WHERE s.id IN $symptom_ids RETURN s as node
+UNION ALL
+MATCH (f:Factor) WHERE f.id IN $factor_ids RETURN f as node
+"""
+
+
+def root_cause_item(cause, path_count, weight, amount, symptom_ids, factor_ids):
+    return {
+        'cause': cause,
+        'path_count': path_count,
+        'weight': weight,
+        'amount': amount,
+        'symptom_ids': list(symptom_ids or []),
+        'factor_ids': list(factor_ids or [])
+    }
+
+
+def root_cause_payload(center, items, intermediates, include_paths):
+    """closure 항목 → 그래프 응답 + 원인 기여도 순위
+
+    intermediates: {(라벨, id): 노드} - include_paths면 경로별 Symptom/Factor 노드와 실제 경로 엣지도 포함
+    """
+    nodes = [graph_node_payload(center, size=30)]
+    edges = []
+    seen_nodes = {center.element_id}
+    seen_edges = set()
+
+    def add_node(node):
+        if node.element_id not in seen_nodes:
+            seen_nodes.add(node.element_id)
+            nodes.append(graph_node_payload(node))
+
+    def add_edge(start, end, label, properties=None):
+        key = (start, end, label)
+        if key in seen_edges:
+            return
+        seen_edges.add(key)
+        edge = {'from': start, 'to': end, 'label': label,
+                'color': GRAPH_EDGE_COLORS.get(label, '#7f8c8d'), 'arrows': 'to'}
+        if properties:
+            edge['properties'] = properties
+        edges.append(edge)
+
+    ranking = []
+    for item in items:
+        cause = item['cause']
+        add_node(cause)
+        if include_paths:
+            for symptom_id, factor_id in zip(item['symptom_ids'], item['factor_ids']):
+                symptom = intermediates.get(('Symptom', symptom_id))
+                factor = intermediates.get(('Factor', factor_id))
+                if symptom is None or factor is None:
+                    continue
+                add_node(symptom)
+                add_node(factor)
+                add_edge(center.element_id, symptom.element_id, 'LINKED_TO_SYMPTOM')
+                add_edge(symptom.element_id, factor.element_id, 'CAUSED_BY_FACTOR')
+                add_edge(factor.element_id, cause.element_id, 'TRACED_TO_ROOT')
+        contribution = {
+            'path_count': item['path_count'],
+            'weight': item['weight'],
+            'amount': item['amount']
+        }
+        add_edge(center.element_id, cause.element_id, 'ROOT_CAUSE', contribution)
+        ranking.append({
+            'code': cause.get('code'),
+            'description': cause.get('description'),
+            **contribution,
+            'symptom_ids': item['symptom_ids'],
+            'factor_ids': item['factor_ids']
+        })
+
+    return {
+        'nodes': nodes,
+        'edges': edges,
+        'center': center.get('id'),
+        'ranking': ranking
+    }
+
+
+def root_cause_plan(variance_id, include_paths):
+    """쿼리 계획 - closure 한 홉 + (경로 표시 시) 중간 노드 id 조회. 원인이 없으면 None"""
+    row = (yield {'closure': (ROOT_CAUSE_CLOSURE_QUERY, {'variance_id': variance_id}, fetch_single)})['closure']
+    if row is None or not row['causes']:
+        return None
+    items = [root_cause_item(entry['cause'], entry['rel'].get('path_count'), entry['rel'].get('weight'),
+                             entry['rel'].get('amount'), entry['rel'].get('symptom_ids'),
+                             entry['rel'].get('factor_ids'))
+             for entry in row['causes']]
+    intermediates = {}
+    if include_paths:
+        rows = (yield {'intermediates': (ROOT_CAUSE_INTERMEDIATE_QUERY, {
+            'symptom_ids': sorted({x for item in items for x in item['symptom_ids']}),
+            'factor_ids': sorted({x for item in items for x in item['factor_ids']})
+        })})['intermediates']
+        for record in rows:
+            node = record['node']
+            intermediates[(next(iter(node.labels), None), node.get('id'))] = node
+    return root_cause_payload(row['v'], items, intermediates, include_paths)
+
+
+def snapshot_root_cause(snapshot, variance_id):
+    """스냅샷의 ROOT_CAUSE closure → (중심, 항목, 중간 노드), 중심이 없으면 None
+
+    closure가 없는 DB에서 만든 스냅샷이면 로더와 같은 규칙으로 4홉 경로에서 계산한다.
+    """
+    center = snapshot.find_labeled('Variance', variance_id)
+    if center is None:
+        return None
+    if 'ROOT_CAUSE' in snapshot.relationships:
+        items = []
+        intermediates = {}
+        for edge, cause in snapshot.edges(center, 'ROOT_CAUSE', 'out'):
+            rel = snapshot.relationship('ROOT_CAUSE', edge)
+            item = root_cause_item(snapshot.node(cause), rel.get('path_count'), rel.get('weight'),
+                                   rel.get('amount'), rel.get('symptom_ids'), rel.get('factor_ids'))
+            items.append(item)
+            for label, key in (('Symptom', 'symptom_ids'), ('Factor', 'factor_ids')):
+                for node_id in item[key]:
+                    n = snapshot.find_labeled(label, node_id)
+                    if n is not None:
+                        intermediates[(label, node_id)] = snapshot.node(n)
+        items.sort(key=lambda item: (-(item['weight'] or 0), item['cause'].get('code') or ''))
+        return snapshot.node(center), items, intermediates
+    paths = {}
+    intermediates = {}
+    for _, symptom in snapshot.edges(center, 'LINKED_TO_SYMPTOM', 'out'):
+        for _, factor in snapshot.edges(symptom, 'CAUSED_BY_FACTOR', 'out'):
+            for _, cause in snapshot.edges(factor, 'TRACED_TO_ROOT', 'out'):
+                symptom_id, factor_id = snapshot.node_key[symptom], snapshot.node_key[factor]
+                symptom_ids, factor_ids = paths.setdefault(cause, ([], []))
+                symptom_ids.append(symptom_id)
+                factor_ids.append(factor_id)
+                intermediates[('Symptom', symptom_id)] = snapshot.node(symptom)
+                intermediates[('Factor', factor_id)] = snapshot.node(factor)
+    total = sum(len(symptom_ids) for symptom_ids, _ in paths.values())
+    amount = snapshot.node(center).get('variance_amount') or 0
+    items = [root_cause_item(snapshot.node(cause), len(symptom_ids), len(symptom_ids) / total,
+                             amount * len(symptom_ids) / total, symptom_ids, factor_ids)
+             for cause, (symptom_ids, factor_ids) in paths.items()]
+    items.sort(key=lambda item: (-item['weight'], item['cause'].get('code') or ''))
+    return snapshot.node(center), items, intermediates
+
+
+ROOT_CAUSE_PATH_QUERY = """
+MATCH path = (v:Variance {id: $variance_id})-[r1:LINKED_TO_SYMPTOM]->(s:Symptom)-[r2:CAUSED_BY_FACTOR]->(f:Factor)-[r3:TRACED_TO_ROOT]->(c:Cause)
+RETURN path
+"""
+
+
+def legacy_root_cause_plan(variance_id):
+    """closure가 없는 DB - Variance→Symptom→Factor→Cause 경로 직접 조회 (경로가 없으면 None)"""
+    result = (yield {'paths': (ROOT_CAUSE_PATH_QUERY, {'variance_id': variance_id})})['paths']
+    if not result:
+        return None
+
+    nodes = []
+    edges = []
+    seen_nodes = set()
+
+    for row in result:
+        path = row['path']
+        for node in path.nodes:
+            if node.element_id not in seen_nodes:
+                node_type = list(node.labels)[0]
+                nodes.append({
+                    'id': node.element_id,
+                    'label': node.get('name') or node.get('description') or node.get('id') or node.get('variance_name'),
+                    'type': node_type,
+                    'color': get_node_color(node_type),
+                    'size': 30 if node_type == 'Variance' else 25,
+                    'properties': dict(node)
+                })
+                seen_nodes.add(node.element_id)
+
+        for rel in path.relationships:
+            edges.append({
+                'from': rel.start_node.element_id,
+                'to': rel.end_node.element_id,
+                'label': rel.type,
+                'color': '#7f8c8d',
+                'arrows': 'to',
+                'properties': dict(rel)
+            })
+
+    return {
+        'nodes': nodes,
+        'edges': edges,
+        'center': variance_id
+    }
+
+
+def root_cause_graph_plan(args, body, variance_id):
+    """원인 추적 쿼리 계획 - closure(없으면 4홉 경로), 원인 경로가 없는 Variance는 일반 확장으로
+
+    closure 존재 확인부터 확장까지 한 계획이므로 요청 마감 시간 하나를 공유한다.
+    """
+    include_paths = args.get('paths') != '0'
+    snapshot = graph_snapshot.current
+    if snapshot is not None:
+        found = snapshot_root_cause(snapshot, variance_id)
+        if found is not None:
+            center, items, intermediates = found
+            if items:
+                return root_cause_payload(center, items, intermediates, include_paths)
+            return (yield from expand_node_plan(args, body, variance_id))
+
+    if (yield from root_cause_closure_ready_step()):
+        payload = yield from root_cause_plan(variance_id, include_paths)
+    else:
+        payload = yield from legacy_root_cause_plan(variance_id)
+    if payload is None:
+        return (yield from expand_node_plan(args, body, variance_id))
+    return payload
 
 
 @app.route('/api/analysis/root-cause/<variance_id>', methods=['GET'])
+@response_cache.cached(ttl=300)
+@graph_format
 def get_root_cause_graph(variance_id):
-    """Root Cause Drill-down Visualization"""
+    """Root Cause Drill-down Visualization - 원인별 기여도 순위(ranking) 포함
 
-    try:
-        with neo4j_conn.driver.session() as session:
-            # Note: The input variance_id might be just the numeric part or full ID.
-            # Assuming full ID or handling both could be robust, but strict match first.
-            # Path: Variance -> Symptom -> Factor -> Cause
-            query = """
-            MATCH path = (v:Variance {id: $variance_id})-[r1:LINKED_TO_SYMPTOM]->(s:Symptom)-[r2:CAUSED_BY_FACTOR]->(f:Factor)-[r3:TRACED_TO_ROOT]->(c:Cause)
-            RETURN path
-            """
+    ?paths=0 이면 중간 Symptom/Factor 없이 Variance→Cause(ROOT_CAUSE)만 반환
+    """
+    return serve_plan(root_cause_graph_plan, empty_graph, variance_id=variance_id)
 
-            result = session.run(query, variance_id=variance_id).data()
 
-            if not result:
-                # Try simpler path if full depth not found, or return just variance
-                return expand_node(variance_id) # Fallback to generic expand if custom path not found
-
-            nodes = []
-            edges = []
-            seen_nodes = set()
-
-            for row in result:
-                path = row['path']
-                # Path objects in neo4j driver are list of nodes and relationships
-                # But .data() returns graph objects.
-                # Using graph objects extraction
-
-                for node in path.nodes:
-                    if node.element_id not in seen_nodes:
-                        node_type = list(node.labels)[0]
-                        nodes.append({
-                            'id': node.element_id,
-                            'label': node.get('name') or node.get('description') or node.get('id') or node.get('variance_name'),
-                            'type': node_type,
-                            'color': get_node_color(node_type),
-                            'size': 30 if node_type == 'Variance' else 25,
-                            'properties': serialize_neo4j_types(dict(node))
-                        })
-                        seen_nodes.add(node.element_id)
-
-                for rel in path.relationships:
-                    edges.append({
-                        'from': rel.start_node.element_id,
-                        'to': rel.end_node.element_id,
-                        'label': type(rel).__name__,
-                        'color': '#7f8c8d',
-                        'arrows': 'to',
-                        'properties': serialize_neo4j_types(dict(rel))
-                    })
+# ==========================================
+# 경로 탐색 (/api/path)
+# ==========================================
+# "ExternalEvent X가 MonthlyProductState Y에 어떻게 닿는가" 같은 두 엔터티 사이 경로.
+# 스냅샷이 있으면 인접 배열 위에서 양방향 BFS / Yen k-최단 경로(path_finder)로 찾고,
+# 없거나 노드가 스냅샷에 없으면 Neo4j allShortestPaths 후보를 같은 비용 함수로 정렬한다.
+# allShortestPaths는 최단 홉 수의 경로만 돌려주므로 k>1 / weight=amount는 그 안에서의 재정렬일 뿐이다
+# (더 긴 경로가 더 싼 경우를 놓친다) → 응답에 approximate: true로 표시.
+
+PATH_DEFAULT_HOPS = int(os.getenv('PATH_DEFAULT_HOPS', '6'))
+PATH_MAX_HOPS = int(os.getenv('PATH_MAX_HOPS', '10'))
+PATH_MAX_K = int(os.getenv('PATH_MAX_K', '10'))
+PATH_NEO4J_CANDIDATES = 200
+
+
+def empty_path():
+    return {'nodes': [], 'edges': [], 'paths': [], 'found': False}
+
+
+def parse_path_args(args):
+    """?source=&target=&type=&direction=&max_hops=&k=&weight=hops|amount → 탐색 옵션 dict"""
+    source, target = args.get('source'), args.get('target')
+    if not source or not target:
+        raise InvalidArguments("source and target are required")
+    rel_types, direction = parse_expand_filters(args)
+    max_hops = args.get('max_hops', PATH_DEFAULT_HOPS, type=int)
+    if not 1 <= max_hops <= PATH_MAX_HOPS:
+        raise InvalidArguments(f"max_hops must be between 1 and {PATH_MAX_HOPS}")
+    k = args.get('k', 1, type=int)
+    if not 1 <= k <= PATH_MAX_K:
+        raise InvalidArguments(f"k must be between 1 and {PATH_MAX_K}")
+    weight = (args.get('weight') or 'hops').lower()
+    if weight not in ('hops', 'amount'):
+        raise InvalidArguments(f"Invalid weight: {weight}")
+    return {
+        'source': source,
+        'target': target,
+        'rel_types': rel_types,
+        'direction': direction,
+        'max_hops': max_hops,
+        'k': k,
+        'weighted': weight == 'amount'
+    }
+
+
+def build_path_query(options):
+    """허용 관계 타입 / 방향 / 최대 홉을 패턴에 넣은 allShortestPaths
+
+    weight=amount면 경로의 가중치 관계마다 시작 노드에서 나가는 같은 타입 관계 합계(totals)도 함께 반환
+    """
+    rel_types = options['rel_types']
+    rel = ':' + '|'.join(f'`{t}`' for t in rel_types) if rel_types else ''
+    hops = f"*..{int(options['max_hops'])}"
+    if options['direction'] == 'out':
+        pattern = f"(a)-[{rel}{hops}]->(b)"
+    elif options['direction'] == 'in':
+        pattern = f"(a)<-[{rel}{hops}]-(b)"
+    else:
+        pattern = f"(a)-[{rel}{hops}]-(b)"
+    query = f"""
+    {build_node_lookup('$source')}
+    WITH n as a
+    {build_node_lookup('$target', imported='a')}
+    WITH a, n as b
+    WHERE a <> b
+    MATCH p = allShortestPaths({pattern})
+    WITH p LIMIT $candidates
+    """
+    if not options['weighted']:
+        return query + "RETURN p, null as totals"
+    weighted_types = '|'.join(f'`{t}`' for t in sorted(PATH_WEIGHT_PROPERTIES))
+    return query + f"""
+    CALL {{
+        WITH p
+        UNWIND range(0, size(relationships(p)) - 1) as i
+        WITH i, relationships(p)[i] as r
+        WITH i, r, startNode(r) as s
+        OPTIONAL MATCH (s)-[o:{weighted_types}]->()
+        WHERE type(r) IN keys($weight_properties) AND type(o) = type(r)
+        WITH i, r, sum(abs(coalesce(o[$weight_properties[type(r)]], 0))) as total
+        ORDER BY i
+        RETURN collect(CASE WHEN type(r) IN keys($weight_properties) THEN total END) as totals
+    }}
+    RETURN p, totals
+    """
+
+
+def path_cost(rels, totals, weighted):
+    """Neo4j 경로 비용 - path_finder와 같은 단계 비용 (흐름 0인 관계가 있으면 None)"""
+    cost = 0.0
+    for rel, total in zip(rels, totals or [None] * len(rels)):
+        prop = PATH_WEIGHT_PROPERTIES.get(rel.type) if weighted else None
+        step = step_cost(rel.get(prop), total) if prop else 1.0
+        if step is None:
+            return None
+        cost += step
+    return cost
+
+
+def path_response(paths, algorithm, index, options, approximate=False):
+    """[(비용, 노드 리스트, 관계 리스트)] → 경로 그래프 응답 (노드/엣지는 경로 사이에서 중복 제거)"""
+    nodes, edges = [], []
+    node_ids, edge_ids = set(), set()
+    items = []
+    for cost, path_nodes, path_rels in paths:
+        for i, node in enumerate(path_nodes):
+            if node.element_id not in node_ids:
+                node_ids.add(node.element_id)
+                endpoint = i == 0 or i == len(path_nodes) - 1
+                nodes.append(graph_node_payload(node, size=30 if endpoint else None))
+        for rel in path_rels:
+            if rel.element_id not in edge_ids:
+                edge_ids.add(rel.element_id)
+                edge = graph_edge_payload(rel)
+                edge['arrows'] = 'to'
+                edges.append(edge)
+        items.append({
+            'nodes': [node.element_id for node in path_nodes],
+            'relationships': [rel.type for rel in path_rels],
+            'hops': len(path_rels),
+            'cost': round(cost, 6)
+        })
+    return {
+        'nodes': nodes,
+        'edges': edges,
+        'paths': items,
+        'found': bool(items),
+        'algorithm': algorithm,
+        'index': index,
+        'approximate': approximate,
+        'source': options['source'],
+        'target': options['target']
+    }
 
-            return jsonify({
-                'nodes': nodes,
-                'edges': edges,
-                'center': variance_id
-            })
-    except Exception as e:
-        print(f"Error in get_root_cause_graph: {e}")
-        # Fallback
-        return expand_node(variance_id)
+
+def snapshot_paths(snapshot, source, target, options):
+    algorithm, found = path_index(snapshot).find_paths(
+        source, target, options['rel_types'], options['direction'], options['max_hops'],
+        options['k'], options['weighted'])
+    paths = [(cost, [snapshot.node(n) for n in path_nodes],
+              [snapshot.relationship(rel_type, edge) for rel_type, edge in steps])
+             for cost, path_nodes, steps in found]
+    return path_response(paths, algorithm, 'snapshot', options)
+
+
+def path_plan(args, body):
+    """경로 탐색 쿼리 계획 (두 노드가 스냅샷에 있으면 쿼리 없이 응답)"""
+    options = parse_path_args(args)
+    snapshot = graph_snapshot.current
+    if snapshot is not None:
+        source, target = snapshot.find(options['source']), snapshot.find(options['target'])
+        if source is not None and target is not None:
+            return snapshot_paths(snapshot, source, target, options)
+
+    rows = (yield {'paths': (build_path_query(options), {
+        'source': options['source'],
+        'target': options['target'],
+        'weight_properties': PATH_WEIGHT_PROPERTIES,
+        'candidates': PATH_NEO4J_CANDIDATES
+    })})['paths']
+    ranked = []
+    for row in rows:
+        path = row['p']
+        rels = list(path.relationships)
+        cost = path_cost(rels, row['totals'], options['weighted'])
+        if cost is not None:
+            ranked.append((cost, list(path.nodes), rels))
+    ranked.sort(key=lambda item: (item[0], len(item[2])))
+    # 최단 홉 수 후보 안에서만 정렬했으므로 k>1 / 가중치 결과는 근사
+    approximate = options['k'] > 1 or options['weighted']
+    return path_response(ranked[:options['k']], 'all_shortest_paths', 'neo4j', options, approximate)
+
+
+@app.route('/api/path', methods=['GET'])
+@response_cache.cached(ttl=300)
+@graph_format
+def get_path():
+    """두 엔터티 사이 경로 탐색
+
+    Query Parameters:
+        source, target: element_id, id 또는 Cause code
+        type: 허용 관계 타입 (쉼표 구분 또는 반복, 기본 전체)
+        direction: out / in / both (기본 both)
+        max_hops: 최대 홉 수 (기본 6, 최대 10)
+        k: 반환할 경로 수 (기본 1, 최대 10)
+        weight: hops (홉 수) / amount (ALLOCATES / ALLOCATES_TO / CONTRIBUTES_TO amount 비중)
+
+    스냅샷이 없거나 노드가 스냅샷에 없으면 Neo4j allShortestPaths(algorithm: all_shortest_paths)로 대체한다.
+    이때 후보는 최단 홉 수의 경로뿐이라 k>1 / weight=amount 결과는 그 안에서 재정렬한 근사이며
+    응답에 approximate: true가 붙는다 (정확한 결과는 GRAPH_SNAPSHOT_ENABLED=1).
+    """
+    return serve_plan(path_plan, empty_path)
 
 
 # ==========================================
 # SK Hynix v2 Specific Endpoints
 # ==========================================
 
-@app.route('/api/skhynix/process-status', methods=['GET'])
-def get_skhynix_process_status():
-    """Get latest process status (Heatmap) based on MonthlyVFState"""
-    month = request.args.get('month') # Optional filter, defaults to latest available
+SKHYNIX_PROCESS_STATUS_QUERY = """
+MATCH (vf:VFArea)
+OPTIONAL MATCH (vf)-[:HAS_STATE]->(s:MonthlyVFState)
+WHERE ($month IS NULL OR s.month = $month)
+WITH vf, s ORDER BY s.month DESC
+WITH vf, head(collect(s)) as latest_state
+
+// Check for symptoms
+OPTIONAL MATCH (latest_state)-[:HAS_SYMPTOM]->(sym:Symptom)
+
+RETURN vf.id as id,
+       vf.name as name,
+       vf.type as type,
+       latest_state.id as state_id,
+       latest_state.month as month,
+       latest_state.total_cost as total_cost,
+       count(sym) as symptom_count
+"""
 
-    query = """
-    MATCH (vf:VFArea)
-    OPTIONAL MATCH (vf)-[:HAS_STATE]->(s:MonthlyVFState)
-    WHERE ($month IS NULL OR s.month = $month)
-    WITH vf, s ORDER BY s.month DESC
-    WITH vf, head(collect(s)) as latest_state
-
-    // Check for symptoms
-    OPTIONAL MATCH (latest_state)-[:HAS_SYMPTOM]->(sym:Symptom)
-
-    RETURN vf.id as id,
-           vf.name as name,
-           vf.type as type,
-           latest_state.id as state_id,
-           latest_state.month as month,
-           latest_state.total_cost as total_cost,
-           count(sym) as symptom_count
-    """
 
-    with neo4j_conn.driver.session() as session:
-        result = session.run(query, month=month).data()
+def skhynix_process_status_plan(args, body):
+    """공정 상태 히트맵 쿼리 계획"""
+    month = args.get('month') # Optional filter, defaults to latest available
+    result = (yield {'rows': (SKHYNIX_PROCESS_STATUS_QUERY, {'month': month}, fetch_data)})['rows']
 
-        # Calculate Risk Level
-        # logic: symptom_count * 10 + random variance check (simulated)
-        for row in result:
-            row['risk_level'] = 0
-            if row['symptom_count'] > 0:
-                row['risk_level'] = 20 # High risk
-            elif row['total_cost'] and row['total_cost'] > 1000000: # Threshold example
-                 pass
+    # Calculate Risk Level
+    # logic: symptom_count * 10 + random variance check (simulated)
+    for row in result:
+        row['risk_level'] = 0
+        if row['symptom_count'] > 0:
+            row['risk_level'] = 20 # High risk
+        elif row['total_cost'] and row['total_cost'] > 1000000: # Threshold example
+             pass
 
-        return jsonify(result)
+    return result
+
+
+@app.route('/api/skhynix/process-status', methods=['GET'])
+@response_cache.cached(ttl=300)
+def get_skhynix_process_status():
+    """Get latest process status (Heatmap) based on MonthlyVFState"""
+    return serve_plan(skhynix_process_status_plan, list)
 
 @app.route('/api/skhynix/alerts', methods=['GET'])
+@response_cache.cached(ttl=300)
 def get_skhynix_alerts():
     """Get recent alerts (States with Symptoms)"""
     query = """
@@ -2079,11 +2895,12 @@ def get_skhynix_alerts():
     ORDER BY s.month DESC, s.total_cost DESC
     LIMIT 10
     """
-    with neo4j_conn.driver.session() as session:
+    with neo4j_conn.read_session() as session:
         result = session.run(query).data()
         return jsonify(result)
 
 @app.route('/api/skhynix/waterfall/<node_id>', methods=['GET'])
+@response_cache.cached(ttl=300)
 def get_skhynix_waterfall(node_id):
     """Cost breakdown for a MonthlyVFState (Materials)"""
     # Pattern: (MaterialItem)-[CONTRIBUTES_TO]->(MonthlyVFState)
@@ -2094,7 +2911,7 @@ def get_skhynix_waterfall(node_id):
     RETURN m.name as item, r.amount as amount
     """
 
-    with neo4j_conn.driver.session() as session:
+    with neo4j_conn.read_session() as session:
         result = session.run(query, node_id=node_id).data()
 
         # Format for waterfall
@@ -2107,6 +2924,7 @@ def get_skhynix_waterfall(node_id):
         })
 
 @app.route('/api/skhynix/mom/<product_id>', methods=['GET'])
+@response_cache.cached(ttl=600)
 def get_skhynix_mom(product_id):
     """MoM Cost Trend for Product"""
     query = """
@@ -2114,11 +2932,12 @@ def get_skhynix_mom(product_id):
     RETURN s.month as month, s.unit_cost as unit_cost
     ORDER BY s.month ASC
     """
-    with neo4j_conn.driver.session() as session:
+    with neo4j_conn.read_session() as session:
         result = session.run(query, product_id=product_id).data()
         return jsonify(result)
 
 @app.route('/api/skhynix/events', methods=['GET'])
+@response_cache.cached(ttl=600)
 def get_skhynix_events():
     """Get External Events"""
     query = """
@@ -2126,11 +2945,191 @@ def get_skhynix_events():
     RETURN e.id as id, e.date as date, e.title as title, e.description as description, e.category as category
     ORDER BY e.date DESC
     """
-    with neo4j_conn.driver.session() as session:
+    with neo4j_conn.read_session() as session:
         result = session.run(query).data()
         return jsonify(result)
 
 
+# ==========================================
+# Admin Endpoints
+# ==========================================
+
+def _admin_authorized():
+    """ADMIN_TOKEN 환경 변수가 설정된 경우 X-Admin-Token 헤더 확인"""
+    token = os.getenv('ADMIN_TOKEN')
+    return not token or request.headers.get('X-Admin-Token') == token
+
+
+@app.route('/api/admin/cache', methods=['GET'])
+def get_cache_stats():
+    """응답 캐시 적중/미스 통계"""
+    if not _admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify({**response_cache.stats(), 'warmup': cache_warmer.stats(),
+                    'filter_catalog': filter_catalog.stats(),
+                    'top_variance_index': top_variance_index.stats(),
+                    'data_version': data_version_watcher.stats()})
+
+
+def invalidate_data_caches(version=None):
+    """데이터 재적재 후 이 워커의 응답 캐시와 파생 상태를 비움 → (비운 응답 수, 스냅샷 재구축 시작 여부)
+
+    flush 요청을 받은 워커는 직접, 나머지 워커는 DataVersionWatcher가 마커 버전 변경을 보고 호출한다.
+    version: 새 마커 버전 - 스냅샷이 이미 그 버전이면 다시 만들지 않는다 (None이면 항상 재구축)
+    """
+    removed = response_cache.clear()
+    # 롤업 존재 여부도 다음 요청에서 다시 확인
+    reset_rollup_state()
+    expand_key_cache.clear()
+    filter_catalog.invalidate()
+    top_variance_index.invalidate()
+    snapshot_rebuild = graph_snapshot.refresh(version)
+    warm_response_cache()
+    return removed, snapshot_rebuild
+
+
+@app.route('/api/admin/cache/flush', methods=['POST'])
+def flush_cache():
+    """응답 캐시 비우기
+
+    route 없이 호출하면 이 워커를 바로 비우고, 다른 워커는 DataVersion 마커 버전 변경으로 따라온다.
+    로더는 마커를 먼저 쓰고 북마크와 함께 호출하며, 북마크 없는 수동 호출은 여기서 마커 버전을 새로 쓴다.
+
+    body:
+        route: "get_filters" 처럼 특정 라우트만 비울 때
+        bookmarks: 로더가 쓰기 후 받은 북마크 - 이후 읽기는 해당 쓰기가 반영된 복제본에서만 실행
+    """
+    if not _admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 401
+    body = request.get_json(silent=True) or {}
+    route = body.get('route')
+    bookmark_count = None
+    if body.get('bookmarks'):
+        bookmark_count = register_bookmarks(body['bookmarks'])
+    snapshot_rebuild = False
+    if route is None:
+        # 같은 변경으로 이 워커가 다시 비우지 않도록 기준 버전을 먼저 맞춘다
+        # (스냅샷 재구축이 새 마커 버전을 읽도록 무효화보다 먼저)
+        if neo4j_conn.driver:
+            if body.get('bookmarks'):
+                data_version_watcher.sync()
+            else:
+                publish_data_version()
+        removed, snapshot_rebuild = invalidate_data_caches()
+    else:
+        removed = response_cache.clear(route)
+    return jsonify({'flushed': removed, 'route': route, 'bookmarks': bookmark_count,
+                    'snapshot_rebuild': snapshot_rebuild})
+
+
+@app.route('/api/admin/snapshot', methods=['GET'])
+def get_snapshot_stats():
+    """인메모리 그래프 스냅샷 상태 (데이터 버전, 노드/관계 수, 구축 시간)"""
+    if not _admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(graph_snapshot.stats())
+
+
+@app.route('/api/_debug/slow-queries', methods=['GET'])
+def get_slow_queries():
+    """느린 쿼리 기록 (QUERY_PROFILE_ENABLED=1 일 때) - 최신 순 + 쿼리 이름별 요약
+
+    query params:
+        limit: 최근 기록 수 (기본 50)
+        name: 쿼리 이름 부분 문자열 필터 (예: get_product_graph)
+        plan: 0 이면 연산자 트리 생략
+    """
+    if not _admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 401
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+    entries = slow_query_log.recent(limit, request.args.get('name'))
+    if request.args.get('plan') == '0':
+        entries = [{key: value for key, value in entry.items() if key != 'plan'} for entry in entries]
+    return jsonify({**slow_query_log.stats(), 'by_query': slow_query_log.by_query(), 'entries': entries})
+
+
+def collect_pool_metrics():
+    """스크레이프 시점 게이지 - Neo4j 연결 풀 사용률, fan-out 스레드 수, 응답 캐시 적중"""
+    families = driver_pool_metrics(neo4j_conn.driver, 'sync')
+    families.append(('graph_api_fanout_workers', 'gauge',
+                     'Query fan-out thread pool size', (), [((), query_fanout.max_workers)]))
+    cache = response_cache.stats()
+    families.append(('graph_api_response_cache_entries', 'gauge',
+                     'Response cache entries', (), [((), cache['entries'])]))
+    families.append(('graph_api_response_cache_requests_total', 'counter',
+                     'Response cache lookups by route and result', ('route', 'result'),
+                     [((name, result), counts[result]) for name, counts in cache['by_route'].items()
+                      for result in ('hits', 'misses')]))
+    return families
+
+
+register_collector(collect_pool_metrics)
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus 텍스트 포맷 지표 (이 워커 프로세스 기준)"""
+    if not _admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+# ==========================================
+# 응답 캐시 예열
+# ==========================================
+# 모든 라우트가 등록된 뒤 기동 시 한 번, 이후 데이터 갱신(전체 캐시 비우기, 스냅샷 교체)마다
+# 랜딩 페이지 API를 백그라운드에서 호출해 캐시를 채운다.
+
+cache_warmer = CacheWarmer(app)
+
+
+def warm_response_cache():
+    """DB 연결과 응답 캐시가 있을 때만 예열 (없으면 빈 응답이라 캐시되지 않음)"""
+    if not response_cache.enabled or not neo4j_conn.driver:
+        return False
+    return cache_warmer.trigger()
+
+
+def refresh_response_cache():
+    response_cache.clear()
+    warm_response_cache()
+
+
+warm_response_cache()
+
+
+# ==========================================
+# 워커 간 데이터 버전 동기화
+# ==========================================
+# 로더가 적재 끝에 쓰는 (:DataVersion {id: 'current'}) 마커를 워커마다 주기적으로 읽어
+# flush POST를 받지 않은 워커도 캐시/파생 상태를 비우고 적재 북마크를 등록한다.
+
+def read_data_version():
+    return query_fanout.run(neo4j_conn.driver, {
+        'data_version': (DATA_VERSION_QUERY, None, fetch_single)
+    })['data_version']
+
+
+def publish_data_version():
+    """수동 flush - 마커 버전을 새로 써서 다른 워커도 비우게 함 (쓰기 권한이 없으면 이 워커만)"""
+    config = {}
+    if os.getenv('NEO4J_DATABASE'):
+        config['database'] = os.getenv('NEO4J_DATABASE')
+    try:
+        with neo4j_conn.driver.session(**config) as session:
+            marker = session.execute_write(lambda tx: tx.run(DATA_VERSION_BUMP_QUERY).single())
+            register_bookmarks(session.last_bookmarks().raw_values)
+        data_version_watcher.accept(marker)
+    except Exception as e:
+        print(f"Warning: data version publish failed (other workers keep their caches): {e}")
+
+
+data_version_watcher = DataVersionWatcher(read_data_version, invalidate_data_caches,
+                                          register_bookmarks=register_bookmarks)
+if neo4j_conn.driver:
+    data_version_watcher.start()
+
+
 if __name__ == '__main__':
     print("=" * 80)
     print("  Variance Graph API Server")
@@ -2145,11 +3144,18 @@ if __name__ == '__main__':
     print("  GET /api/workcenter/<workcenter_id>/graph")
     print("  GET /api/production-order/<order_no>/graph")
     print("  GET /api/node/<id>/expand")
+    print("  POST /api/graph/batch")
     print("  GET /api/overview")
     print("  GET /api/summary")
     print("  GET /api/filters")
+    print("  GET /api/filters/search")
     print("  POST /api/filtered_summary")
     print("  GET /api/variances/by-type")
+    print("  GET /api/admin/cache")
+    print("  POST /api/admin/cache/flush")
+    print("  GET /api/admin/snapshot")
+    print("  GET /metrics")
+    print("  GET /api/_debug/slow-queries")
     print("\nOpen http://localhost:8000 in browser")
     print("=" * 80 + "\n")
     
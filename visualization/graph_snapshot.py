@@ -0,0 +1,441 @@
+"""
+그래프 인메모리 스냅샷 (읽기 전용)
+
+Neo4j의 노드/관계 전체(DataVersion 마커 제외)를 읽기 트랜잭션 하나로 읽어 프로세스 메모리에 올리고
+노드/관계 탐색을 Neo4j 왕복 없이 처리한다. 로더가 Neo4j 안에서 만드는 파생 데이터
+(ROOT_CAUSE closure, VarianceRollup, NEXT_ORDER / SAME_PRODUCT, 월 보정, 차이 절대값 합계)도
+그대로 들어온다.
+
+구조:
+- 노드: 0..N-1 정수 인덱스, 라벨은 코드로 인턴(label_codes), 속성은 라벨별 컬럼 리스트
+- 관계: 타입별 CSR(out/in offsets + 엣지 인덱스 배열), 관계 속성도 타입별 컬럼
+- 이웃 조회는 offsets[n]:offsets[n+1] 슬라이스 하나로 끝난다
+
+SnapshotNode / SnapshotRelationship은 neo4j Node / Relationship과 같은 인터페이스
+(labels, element_id, type, start_node, end_node, get, dict())를 제공하므로
+graph_api_server의 노드/엣지 페이로드 함수를 그대로 사용할 수 있다.
+element_id는 Neo4j elementId 그대로이므로 스냅샷 응답과 Neo4j 경로 응답의 노드/엣지 id가 같다.
+
+스냅샷 버전은 로더가 적재 끝에 쓰는 (:DataVersion {id: 'current'}) 마커의 version이다.
+data_version.DataVersionWatcher가 버전 변경을 보면(또는 캐시 flush) refresh()로
+백그라운드 재구축을 시작하고, 새 스냅샷이 완성되면 참조 하나만 교체한다.
+교체 전까지 요청은 이전 스냅샷을 계속 사용한다.
+
+환경 변수:
+    GRAPH_SNAPSHOT_ENABLED         1/0 (기본 0)
+"""
+
+import os
+import time
+import threading
+from array import array
+from collections.abc import Mapping
+
+# 라벨별 조회 키 - Cause만 code, 나머지는 id (neo4j/schema.cypher 제약과 동일)
+NODE_KEYS = {'Cause': 'code'}
+
+SNAPSHOT_VERSION_QUERY = """
+OPTIONAL MATCH (m:DataVersion {id: 'current'})
+RETURN m.version as version
+"""
+
+SNAPSHOT_NODES_QUERY = """
+MATCH (n) WHERE NOT n:DataVersion
+RETURN elementId(n) as id, labels(n) as labels, properties(n) as props
+"""
+
+SNAPSHOT_RELATIONSHIPS_QUERY = """
+MATCH (a)-[r]->(b)
+RETURN elementId(r) as id, type(r) as type, elementId(a) as start, elementId(b) as end,
+       properties(r) as props
+"""
+
+
+def _env_flag(name, default='0'):
+    return os.getenv(name, default) not in ('0', 'false', 'False', '')
+
+
+def read_snapshot(tx):
+    """읽기 트랜잭션 작업 함수 - 마커 버전과 노드/관계를 한 트랜잭션에서 스트리밍으로 읽는다"""
+    started = time.perf_counter()
+    record = tx.run(SNAPSHOT_VERSION_QUERY).single()
+    snapshot = GraphSnapshot(record['version'] if record else None)
+    for record in tx.run(SNAPSHOT_NODES_QUERY):
+        snapshot.add_node(record['id'], record['labels'], record['props'])
+    for record in tx.run(SNAPSHOT_RELATIONSHIPS_QUERY):
+        snapshot.add_relationship(record['id'], record['type'], record['start'], record['end'],
+                                  record['props'])
+    snapshot.freeze()
+    snapshot.build_ms = round((time.perf_counter() - started) * 1000, 1)
+    return snapshot
+
+
+class SnapshotNode(Mapping):
+    """neo4j Node 호환 읽기 전용 뷰"""
+    __slots__ = ('_snapshot', 'index')
+
+    def __init__(self, snapshot, index):
+        self._snapshot = snapshot
+        self.index = index
+
+    @property
+    def labels(self):
+        return self._snapshot.node_labels(self.index)
+
+    @property
+    def element_id(self):
+        return self._snapshot.element_id(self.index)
+
+    def _columns(self):
+        snapshot = self._snapshot
+        return snapshot.node_columns[snapshot.node_label[self.index]], snapshot.node_row[self.index]
+
+    def __getitem__(self, key):
+        columns, row = self._columns()
+        value = columns[key][row] if key in columns else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        columns, row = self._columns()
+        return (name for name, values in columns.items() if values[row] is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class SnapshotRelationship(Mapping):
+    """neo4j Relationship 호환 읽기 전용 뷰"""
+    __slots__ = ('_snapshot', '_table', 'index')
+
+    def __init__(self, snapshot, table, index):
+        self._snapshot = snapshot
+        self._table = table
+        self.index = index
+
+    @property
+    def type(self):
+        return self._table.rel_type
+
+    @property
+    def element_id(self):
+        return self._table.element_ids[self.index]
+
+    @property
+    def start_node(self):
+        return SnapshotNode(self._snapshot, self._table.src[self.index])
+
+    @property
+    def end_node(self):
+        return SnapshotNode(self._snapshot, self._table.dst[self.index])
+
+    def __getitem__(self, key):
+        values = self._table.columns.get(key)
+        value = values[self.index] if values is not None else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return (name for name, values in self._table.columns.items() if values[self.index] is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class RelationshipTable:
+    """관계 타입 하나의 엣지 목록 + CSR 인덱스"""
+
+    def __init__(self, rel_type, code):
+        self.rel_type = rel_type
+        self.code = code
+        self.element_ids = []
+        self.src = array('I')
+        self.dst = array('I')
+        self.columns = {}
+        self.out_offsets = self.out_edges = None
+        self.in_offsets = self.in_edges = None
+
+    def __len__(self):
+        return len(self.src)
+
+    def append(self, element_id, src, dst, props):
+        index = len(self.src)
+        self.element_ids.append(element_id)
+        self.src.append(src)
+        self.dst.append(dst)
+        for name, value in props.items():
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = [None] * index
+            column.append(value)
+        for column in self.columns.values():
+            if len(column) <= index:
+                column.append(None)
+
+    @staticmethod
+    def _csr(endpoints, node_count):
+        """엣지 끝점 배열 → (offsets[N+1], 노드 순으로 정렬된 엣지 인덱스)"""
+        offsets = array('I', bytes(4 * (node_count + 1)))
+        for n in endpoints:
+            offsets[n + 1] += 1
+        for n in range(node_count):
+            offsets[n + 1] += offsets[n]
+        cursor = array('I', offsets[:-1])
+        edges = array('I', bytes(4 * len(endpoints)))
+        for edge, n in enumerate(endpoints):
+            edges[cursor[n]] = edge
+            cursor[n] += 1
+        return offsets, edges
+
+    def freeze(self, node_count):
+        self.out_offsets, self.out_edges = self._csr(self.src, node_count)
+        self.in_offsets, self.in_edges = self._csr(self.dst, node_count)
+
+
+class GraphSnapshot:
+    """Neo4j 읽기 트랜잭션 하나에서 만든 불변 그래프 스냅샷 (add_node/add_relationship 후 freeze)"""
+
+    def __init__(self, version=None):
+        self.version = version
+        self.built_at = None
+        self.build_ms = None
+        self.labels = []             # 라벨 코드 → 라벨
+        self.label_codes = {}        # 라벨 → 코드
+        self.node_ids = []           # 노드 → elementId
+        self.node_label = array('H')  # 노드 → 첫 라벨 코드 (속성 컬럼 위치)
+        self.node_key = []           # 노드 → id (Cause는 code)
+        self.node_row = array('I')   # 라벨별 속성 컬럼의 행 번호
+        self.node_columns = []       # 라벨 코드 → {속성: [값...]}
+        self._extra_labels = {}      # 라벨이 여러 개인 노드 → 전체 라벨 frozenset
+        self._label_rows = []        # 라벨 코드 → 행 수
+        self._by_element_id = {}     # elementId → 노드
+        self._by_label_key = {}      # (라벨 코드, 키) → 노드
+        self._by_key = {}            # 키 → 첫 노드 (라벨 없이 찾을 때)
+        self.relationships = {}      # 관계 타입 → RelationshipTable
+
+    @classmethod
+    def from_records(cls, nodes, relationships, version=None):
+        """(elementId, labels, props) / (elementId, type, 시작 elementId, 끝 elementId, props) 목록으로 생성"""
+        snapshot = cls(version)
+        for element_id, labels, props in nodes:
+            snapshot.add_node(element_id, labels, props)
+        for element_id, rel_type, start, end, props in relationships:
+            snapshot.add_relationship(element_id, rel_type, start, end, props)
+        return snapshot.freeze()
+
+    # ---------- 적재 ----------
+
+    def _label_code(self, label):
+        code = self.label_codes.get(label)
+        if code is None:
+            code = self.label_codes[label] = len(self.labels)
+            self.labels.append(label)
+            self.node_columns.append({})
+            self._label_rows.append(0)
+        return code
+
+    def add_node(self, element_id, labels, props):
+        labels = list(labels) or ['']
+        code = self._label_code(labels[0])
+        key = props.get(NODE_KEYS.get(labels[0], 'id'))
+        n = len(self.node_ids)
+        self._by_element_id[element_id] = n
+        if len(labels) > 1:
+            self._extra_labels[n] = frozenset(labels)
+        for label in labels:
+            if key is not None:
+                self._by_label_key.setdefault((self._label_code(label), key), n)
+        if key is not None:
+            self._by_key.setdefault(key, n)
+        self.node_ids.append(element_id)
+        self.node_label.append(code)
+        self.node_key.append(key)
+        row = self._label_rows[code]
+        self.node_row.append(row)
+        self._label_rows[code] += 1
+        columns = self.node_columns[code]
+        for name, value in props.items():
+            values = columns.get(name)
+            if values is None:
+                values = columns[name] = [None] * row
+            values.append(value)
+        for values in columns.values():
+            if len(values) <= row:
+                values.append(None)
+        return n
+
+    def add_relationship(self, element_id, rel_type, start, end, props):
+        src = self._by_element_id.get(start)
+        dst = self._by_element_id.get(end)
+        if src is None or dst is None:
+            return
+        table = self.relationships.get(rel_type)
+        if table is None:
+            table = self.relationships[rel_type] = RelationshipTable(rel_type, len(self.relationships))
+        table.append(element_id, src, dst, props)
+
+    def freeze(self):
+        """CSR 인덱스 생성 - 이후 읽기 전용"""
+        node_count = len(self.node_ids)
+        for table in self.relationships.values():
+            table.freeze(node_count)
+        self.built_at = time.time()
+        return self
+
+    # ---------- 조회 ----------
+
+    @property
+    def node_count(self):
+        return len(self.node_ids)
+
+    @property
+    def relationship_count(self):
+        return sum(len(table) for table in self.relationships.values())
+
+    def label(self, n):
+        return self.labels[self.node_label[n]]
+
+    def node_labels(self, n):
+        labels = self._extra_labels.get(n)
+        return labels if labels is not None else frozenset((self.labels[self.node_label[n]],))
+
+    def element_id(self, n):
+        return self.node_ids[n]
+
+    def find_labeled(self, label, key):
+        code = self.label_codes.get(label)
+        if code is None or key is None:
+            return None
+        return self._by_label_key.get((code, key))
+
+    def find(self, node_id):
+        """elementId 또는 id(Cause는 code) → 노드 인덱스"""
+        if node_id is None:
+            return None
+        n = self._by_element_id.get(node_id)
+        if n is not None:
+            return n
+        return self._by_key.get(node_id)
+
+    def node(self, n):
+        return SnapshotNode(self, n)
+
+    def relationship(self, rel_type, edge):
+        return SnapshotRelationship(self, self.relationships[rel_type], edge)
+
+    def edges(self, n, rel_type, direction, start=0, stop=None):
+        """(엣지 인덱스, 반대편 노드) - direction은 'out' 또는 'in', start/stop은 CSR 구간 안 위치"""
+        table = self.relationships.get(rel_type)
+        if table is None:
+            return
+        if direction == 'out':
+            offsets, edges, other = table.out_offsets, table.out_edges, table.dst
+        else:
+            offsets, edges, other = table.in_offsets, table.in_edges, table.src
+        begin, end = offsets[n], offsets[n + 1]
+        if stop is not None:
+            end = min(end, begin + stop)
+        for i in range(begin + start, end):
+            edge = edges[i]
+            yield edge, other[edge]
+
+    def degree(self, n, rel_type, direction):
+        table = self.relationships.get(rel_type)
+        if table is None:
+            return 0
+        offsets = table.out_offsets if direction == 'out' else table.in_offsets
+        return offsets[n + 1] - offsets[n]
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'built_at': self.built_at,
+            'build_ms': self.build_ms,
+            'nodes': self.node_count,
+            'relationships': self.relationship_count,
+            'labels': len(self.labels),
+            'relationship_types': len(self.relationships)
+        }
+
+
+class SnapshotEngine:
+    """현재 스냅샷 보관 + 데이터 버전이 바뀌면 백그라운드 재구축 후 원자적 교체
+
+    load()는 새 GraphSnapshot을 돌려주는 함수 (graph_api_server가 읽기 세션으로 read_snapshot 실행).
+    """
+
+    def __init__(self, load=None, enabled=None, on_swap=None):
+        self.enabled = _env_flag('GRAPH_SNAPSHOT_ENABLED') if enabled is None else enabled
+        self.load = load
+        self.on_swap = on_swap
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._building = False
+        self._pending = False
+        self.rebuilds = 0
+        self.last_error = None
+
+    def start(self):
+        """기동 시 첫 스냅샷은 동기로 만든다 (실패하면 Neo4j 경로로 동작)"""
+        if self.enabled and self.load is not None:
+            self._rebuild()
+        return self._snapshot
+
+    @property
+    def current(self):
+        """요청 경로에서 사용할 스냅샷 (비활성/미구축이면 None)"""
+        if not self.enabled:
+            return None
+        return self._snapshot
+
+    def refresh(self, version=None):
+        """마커 버전이 현재 스냅샷과 다르면 백그라운드 재구축 시작 (None이면 무조건) - 요청을 막지 않음"""
+        if not self.enabled or self.load is None:
+            return False
+        with self._lock:
+            current = self._snapshot
+            if version is not None and current is not None and current.version == version:
+                return False
+            if self._building:
+                # 진행 중인 구축은 이전 데이터를 읽었을 수 있음 - 끝나면 한 번 더 만든다
+                self._pending = True
+                return False
+            self._building = True
+        threading.Thread(target=self._run, name='graph-snapshot', daemon=True).start()
+        return True
+
+    def _run(self):
+        while True:
+            self._rebuild()
+            with self._lock:
+                if not self._pending:
+                    self._building = False
+                    return
+                self._pending = False
+
+    def _rebuild(self):
+        try:
+            snapshot = self.load()
+            previous = self._snapshot
+            self._snapshot = snapshot  # 참조 교체 한 번 - 진행 중인 요청은 이전 스냅샷을 계속 사용
+            self.rebuilds += 1
+            self.last_error = None
+            print(f"Graph snapshot built: {snapshot.node_count} nodes, "
+                  f"{snapshot.relationship_count} relationships ({snapshot.build_ms} ms)")
+            if previous is not None and self.on_swap:
+                self.on_swap()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Warning: graph snapshot build failed: {e}")
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'enabled': self.enabled,
+            'rebuilds': self.rebuilds,
+            'building': self._building,
+            'last_error': self.last_error,
+            'snapshot': snapshot.stats() if snapshot else None
+        }
@@ -0,0 +1,156 @@
+"""
+그래프 응답 압축 포맷 (format=compact) + 속성 프로젝션 (fields=)
+
+기본 그래프 응답은 노드마다 type/color/size/properties 전체를, 엣지마다 문자열 id와
+라벨을 반복한다. ?format=compact 요청은 같은 내용을 열(column) 단위 표로 보낸다.
+
+    {
+      "format": "compact",
+      "types": ["Variance", ...],          노드 타입 코드표
+      "rel_types": ["HAS_VARIANCE", ...],  엣지 라벨 코드표
+      "palette": ["#98D8C8", ...],         색상 코드표
+      "nodes": {"id": [...], "label": [...], "type": [0, ...], "color": [0, ...],
+                "size": [...], "props": {"variance_amount": [...], ...}},
+      "edges": {"from": [0, ...], "to": [3, ...], "label": [0, ...], "color": [1, ...],
+                "props": {...}},
+      "center": ..., (그 외 최상위 키는 그대로)
+    }
+
+엣지의 from/to는 nodes 표의 행 번호다. 노드 표에 없는 끝점을 가리키는 엣지는 그릴 수 없으므로
+제외하고 개수를 dropped_edges로 알린다.
+?fields=a,b 는 두 포맷 모두에서 properties를 지정한 속성으로 줄인다.
+nodes/edges 리스트가 없는 응답(오류, 목록 API)은 그대로 통과한다.
+"""
+
+# 값이 코드표로 바뀌는 열: 열 이름 → 코드표 이름
+_NODE_CODED = {'type': 'types', 'color': 'palette'}
+_EDGE_CODED = {'label': 'rel_types', 'color': 'palette'}
+
+
+def parse_graph_format(args):
+    """요청 인자 → (compact 여부, 속성 필드 리스트 또는 None). 둘 다 없으면 None"""
+    compact = (args.get('format') or '').lower() == 'compact'
+    fields = None
+    raw = args.get('fields')
+    if raw is not None:
+        fields = [name.strip() for name in raw.split(',') if name.strip()]
+    if not compact and fields is None:
+        return None
+    return compact, fields
+
+
+def is_graph_payload(payload):
+    return (isinstance(payload, dict)
+            and isinstance(payload.get('nodes'), list)
+            and isinstance(payload.get('edges'), list))
+
+
+def project_properties(properties, fields):
+    if fields is None or not isinstance(properties, dict):
+        return properties
+    return {name: properties[name] for name in fields if name in properties}
+
+
+class _CodeTable:
+    """문자열 인턴 - 처음 나온 순서대로 코드 부여"""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def code(self, value):
+        if value is None:
+            return None
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _columns(rows, coded, tables, fields):
+    """dict 행 리스트 → 열 dict (코드표 열 인턴, properties는 props 하위 열)"""
+    count = len(rows)
+    columns = {}
+    props = {}
+    for i, row in enumerate(rows):
+        for key, value in row.items():
+            if key == 'properties':
+                for name, prop in (project_properties(value, fields) or {}).items():
+                    column = props.get(name)
+                    if column is None:
+                        column = props[name] = [None] * count
+                    column[i] = prop
+                continue
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [None] * count
+            table = coded.get(key)
+            column[i] = tables[table].code(value) if table else value
+    if props:
+        columns['props'] = props
+    return columns
+
+
+def compact_graph(payload, fields=None):
+    """그래프 응답 dict → 열 단위 compact dict"""
+    tables = {'types': _CodeTable(), 'rel_types': _CodeTable(), 'palette': _CodeTable()}
+
+    nodes = payload['nodes']
+    node_index = {}
+    for i, node in enumerate(nodes):
+        node_index.setdefault(node.get('id'), i)
+
+    edges = []
+    dropped = 0
+    for edge in payload['edges']:
+        source = node_index.get(edge.get('from'))
+        target = node_index.get(edge.get('to'))
+        if source is None or target is None:
+            dropped += 1
+            continue
+        edges.append(dict(edge, **{'from': source, 'to': target}))
+
+    result = {key: value for key, value in payload.items() if key not in ('nodes', 'edges')}
+    result['format'] = 'compact'
+    result['nodes'] = _columns(nodes, _NODE_CODED, tables, fields)
+    result['edges'] = _columns(edges, _EDGE_CODED, tables, fields)
+    result['edges'].setdefault('from', [])
+    result['edges'].setdefault('to', [])
+    result.update({name: table.values for name, table in tables.items()})
+    if dropped:
+        result['dropped_edges'] = dropped
+
+    # /api/graph/batch 중심별 소속 목록도 행 번호로
+    if isinstance(result.get('centers'), list):
+        edge_index = {}
+        for i, edge in enumerate(edges):
+            if 'id' in edge:
+                edge_index.setdefault(edge['id'], i)
+        centers = []
+        for entry in result['centers']:
+            entry = dict(entry)
+            if isinstance(entry.get('nodes'), list):
+                entry['nodes'] = [node_index[n] for n in entry['nodes'] if n in node_index]
+            if isinstance(entry.get('edges'), list):
+                entry['edges'] = [edge_index[e] for e in entry['edges'] if e in edge_index]
+            centers.append(entry)
+        result['centers'] = centers
+    return result
+
+
+def format_graph_payload(payload, options):
+    """parse_graph_format() 결과에 따라 응답 변환 (그래프 응답이 아니면 그대로)"""
+    if options is None or not is_graph_payload(payload):
+        return payload
+    compact, fields = options
+    if compact:
+        return compact_graph(payload, fields)
+    if fields is None:
+        return payload
+    projected = dict(payload)
+    projected['nodes'] = [dict(node, properties=project_properties(node.get('properties'), fields))
+                          if 'properties' in node else node for node in payload['nodes']]
+    projected['edges'] = [dict(edge, properties=project_properties(edge.get('properties'), fields))
+                          if 'properties' in edge else edge for edge in payload['edges']]
+    return projected
@@ -0,0 +1,144 @@
+"""
+HTTP 응답 압축 + 조건부 GET (ETag)
+
+모든 응답에 after_request 훅으로 적용된다.
+- 본문 내용 해시로 약한 ETag를 만들고, If-None-Match가 일치하면 304로 응답한다.
+- Accept-Encoding 협상으로 brotli(설치된 경우) 또는 gzip으로 압축한다.
+- 같은 본문의 압축 결과는 LRU에 보관하여 캐시 히트 응답을 다시 압축하지 않는다.
+스트리밍 응답(NDJSON)과 200이 아닌 응답은 건드리지 않는다.
+
+환경 변수:
+    HTTP_COMPRESSION_ENABLED     1/0 (기본 1)
+    HTTP_COMPRESSION_MIN_BYTES   이 크기 미만 본문은 압축하지 않음 (기본 1024)
+    HTTP_GZIP_LEVEL              gzip 압축 레벨 (기본 6)
+    HTTP_BROTLI_QUALITY          brotli 품질 (기본 5)
+    HTTP_ETAG_ENABLED            1/0 (기본 1)
+    HTTP_COMPRESSION_MEMO_ENTRIES 압축 결과 보관 개수 (기본 256)
+"""
+
+import os
+import gzip
+import hashlib
+
+from flask import request
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+
+from response_cache import LRUCacheBackend
+
+try:
+    import brotli
+except ImportError:  # brotli는 선택 의존성
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/csv',
+    'application/javascript',
+    'text/javascript',
+    'image/svg+xml'
+}
+
+# 압축 결과는 본문 해시가 같으면 항상 같으므로 길게 보관
+_COMPRESSED_TTL = 3600
+
+
+def _env_flag(name, default='1'):
+    return os.getenv(name, default) not in ('0', 'false', 'False')
+
+
+class ConditionalCompression:
+    def __init__(self, app=None, enabled=None, etag_enabled=None, min_bytes=None):
+        self.enabled = _env_flag('HTTP_COMPRESSION_ENABLED') if enabled is None else enabled
+        self.etag_enabled = _env_flag('HTTP_ETAG_ENABLED') if etag_enabled is None else etag_enabled
+        self.min_bytes = min_bytes if min_bytes is not None else int(os.getenv('HTTP_COMPRESSION_MIN_BYTES', '1024'))
+        self.gzip_level = int(os.getenv('HTTP_GZIP_LEVEL', '6'))
+        self.brotli_quality = int(os.getenv('HTTP_BROTLI_QUALITY', '5'))
+        self._compressed = LRUCacheBackend(int(os.getenv('HTTP_COMPRESSION_MEMO_ENTRIES', '256')))
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self.process_response)
+
+    @staticmethod
+    def content_etag(body):
+        return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    def negotiate_encoding(self, accept):
+        """Accept-Encoding 품질값 기준으로 br > gzip 순서로 선택"""
+        candidates = []
+        if brotli is not None and accept['br']:
+            candidates.append((accept['br'], 1, 'br'))
+        if accept['gzip']:
+            candidates.append((accept['gzip'], 0, 'gzip'))
+        if not candidates:
+            return None
+        return max(candidates)[2]
+
+    def compress(self, body, encoding, etag):
+        key = (etag, encoding)
+        compressed = self._compressed.get(key)
+        if compressed is None:
+            if encoding == 'br':
+                compressed = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+            self._compressed.set(key, compressed, _COMPRESSED_TTL)
+        return compressed
+
+    def process_response(self, response):
+        if response.status_code != 200 or 'Content-Encoding' in response.headers:
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        # send_file 응답은 파일 래퍼(direct_passthrough)이므로 본문을 읽어 일반 응답으로 전환
+        if response.direct_passthrough:
+            response.direct_passthrough = False
+            response.make_sequence()
+        if response.is_streamed:
+            return response
+
+        body = response.get_data()
+        etag = self.content_etag(body)
+
+        if self.etag_enabled and request.method in ('GET', 'HEAD'):
+            response.set_etag(etag, weak=True)
+            if 'Cache-Control' not in response.headers:
+                response.headers['Cache-Control'] = 'no-cache'
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+
+        response.vary.add('Accept-Encoding')
+        if not self.enabled or len(body) < self.min_bytes:
+            return response
+        encoding = self.negotiate_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        response.set_data(self.compress(body, encoding, etag))
+        response.headers['Content-Encoding'] = encoding
+        response.headers.pop('Accept-Ranges', None)
+        return response
+
+    def prepare(self, body, method, if_none_match=None, accept_encoding=None):
+        """Flask 밖(ASGI 서버)에서 같은 규칙 적용 → (status, headers, body)"""
+        headers = {}
+        etag = self.content_etag(body)
+        if self.etag_enabled and method in ('GET', 'HEAD'):
+            headers['ETag'] = quote_etag(etag, weak=True)
+            headers['Cache-Control'] = 'no-cache'
+            if if_none_match and parse_etags(if_none_match).contains_weak(etag):
+                return 304, headers, b''
+
+        headers['Vary'] = 'Accept-Encoding'
+        if self.enabled and len(body) >= self.min_bytes:
+            encoding = self.negotiate_encoding(parse_accept_header(accept_encoding or ''))
+            if encoding is not None:
+                body = self.compress(body, encoding, etag)
+                headers['Content-Encoding'] = encoding
+        return 200, headers, body
@@ -0,0 +1,88 @@
+"""
+Neo4j 타입 전용 JSON 인코더
+
+neo4j DateTime/Date/Time/Duration, Node, Relationship, Path 객체를
+재귀 변환 없이 한 번의 패스로 바로 bytes로 직렬화한다.
+orjson이 설치되어 있으면 orjson의 default 훅을 사용하고,
+없으면 표준 json 모듈로 동일한 결과를 만든다.
+"""
+
+import json
+import time
+
+from flask import g, has_request_context
+from flask.json.provider import DefaultJSONProvider
+from neo4j.graph import Node, Relationship, Path
+from neo4j.time import DateTime, Date, Time, Duration
+
+try:
+    import orjson
+except ImportError:  # orjson은 선택 의존성
+    orjson = None
+
+from metrics import observe_serialization
+
+
+def neo4j_default(obj):
+    """JSON 기본 타입이 아닌 객체 변환 훅"""
+    if isinstance(obj, (DateTime, Date, Time, Duration)):
+        return obj.iso_format()
+    if isinstance(obj, Node):
+        return {
+            'id': obj.element_id,
+            'labels': sorted(obj.labels),
+            'properties': dict(obj)
+        }
+    if isinstance(obj, Relationship):
+        return {
+            'id': obj.element_id,
+            'type': obj.type,
+            'start': obj.start_node.element_id if obj.start_node is not None else None,
+            'end': obj.end_node.element_id if obj.end_node is not None else None,
+            'properties': dict(obj)
+        }
+    if isinstance(obj, Path):
+        return {'nodes': list(obj.nodes), 'relationships': list(obj.relationships)}
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps_bytes(obj):
+        return orjson.dumps(obj, default=neo4j_default, option=_ORJSON_OPTIONS)
+else:
+    class _FallbackEncoder(json.JSONEncoder):
+        def default(self, obj):
+            return neo4j_default(obj)
+
+    _fallback_encoder = _FallbackEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def dumps_bytes(obj):
+        return _fallback_encoder.encode(obj).encode('utf-8')
+
+
+class Neo4jJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider - jsonify()가 dumps_bytes()로 바로 응답 본문을 만든다
+
+    요청 중 g.response_transform이 설정되어 있으면 직렬화 전에 응답 객체에 적용한다
+    (그래프 응답 compact 포맷 등 - 직렬화는 그대로 한 번).
+    변환과 직렬화에 걸린 시간은 라우트별 직렬화 지표로 집계한다.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        started = time.perf_counter()
+        transform = g.get('response_transform') if has_request_context() else None
+        if transform is not None:
+            obj = transform(obj)
+        body = dumps_bytes(obj)
+        observe_serialization(time.perf_counter() - started)
+        return self._app.response_class(body, mimetype=self.mimetype)
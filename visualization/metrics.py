@@ -0,0 +1,269 @@
+"""
+API 지표 수집 + Prometheus 텍스트 포맷 출력 (/metrics)
+
+라우트 코드를 고치지 않고 공통 지점의 훅으로만 수집한다.
+- RequestMetrics: Flask before/after_request 훅 - 라우트별 지연 히스토그램, 응답 바이트
+- observe_query: query_executor.read_transaction - 이름 붙은 쿼리별 Neo4j 실행 시간과 반환 행 수
+- observe_serialization: JSON provider - 응답 직렬화 시간
+- register_collector: 스크레이프 시점에 읽는 게이지 (연결 풀 사용률, 캐시 통계 등)
+- observe_request: ASGI 공유 라우트처럼 Flask 훅을 거치지 않는 처리기에서 직접 호출
+
+쿼리 이름은 "라우트 엔드포인트:계획 쿼리 이름" 형식이다. 라우트 엔드포인트는 요청 시작 시
+query_scope 컨텍스트 변수에 저장되며 fan-out 스레드/비동기 태스크로 전달된다.
+지표는 프로세스(워커)별로 집계된다.
+
+환경 변수:
+    METRICS_ENABLED   1/0 (기본 1)
+"""
+
+import os
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+
+from flask import request, g
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') not in ('0', 'false', 'False')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+ROWS_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+
+# 현재 요청의 라우트 엔드포인트 (쿼리 지표 이름 앞부분)
+query_scope = contextvars.ContextVar('query_scope', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    def add(self, *labels, amount=1):
+        self.inc(*labels, amount=amount)
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels → [버킷별 개수..., 합계, 개수]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            inf_labels = _format_labels(self.label_names, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf_labels} {series[-1]}")
+            lines.append(f"{self.name}_sum{label_text} {_format_value(float(series[-2]))}")
+            lines.append(f"{self.name}_count{label_text} {series[-1]}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    'graph_api_request_duration_seconds', 'API request latency by route',
+    ('route', 'method', 'status'))
+RESPONSE_BYTES = Histogram(
+    'graph_api_response_bytes', 'Response body size in bytes (after compression)',
+    ('route',), BYTES_BUCKETS)
+SERIALIZATION_DURATION = Histogram(
+    'graph_api_serialization_seconds', 'JSON serialization time by route', ('route',))
+QUERY_DURATION = Histogram(
+    'graph_api_neo4j_query_duration_seconds', 'Neo4j read transaction time by named query', ('query',))
+QUERY_ROWS = Histogram(
+    'graph_api_neo4j_query_rows', 'Rows returned by named query', ('query',), ROWS_BUCKETS)
+QUERY_ERRORS = Counter(
+    'graph_api_neo4j_query_errors_total', 'Failed Neo4j read transactions by named query', ('query',))
+QUERIES_IN_FLIGHT = Gauge(
+    'graph_api_neo4j_queries_in_flight', 'Neo4j read transactions currently running')
+
+_METRICS = [REQUEST_DURATION, RESPONSE_BYTES, SERIALIZATION_DURATION,
+            QUERY_DURATION, QUERY_ROWS, QUERY_ERRORS, QUERIES_IN_FLIGHT]
+
+# 스크레이프 시점 수집 함수: () → [(이름, 타입, 설명, 라벨 이름 튜플, [(라벨 값 튜플, 값)])]
+_collectors = []
+
+
+def register_collector(collector):
+    _collectors.append(collector)
+
+
+def query_name(name=None):
+    scope = query_scope.get() or 'unscoped'
+    return f"{scope}:{name}" if name else scope
+
+
+def row_count(value):
+    """fetch 결과 → 행 수 (Record 리스트 / data() 리스트 / single())"""
+    if value is None:
+        return 0
+    if isinstance(value, list):
+        return len(value)
+    return 1
+
+
+def observe_query(name, seconds, rows=None, error=False):
+    if not METRICS_ENABLED:
+        return
+    label = query_name(name)
+    QUERY_DURATION.observe(seconds, label)
+    if error:
+        QUERY_ERRORS.inc(label)
+    elif rows is not None:
+        QUERY_ROWS.observe(rows, label)
+
+
+def observe_serialization(seconds):
+    if METRICS_ENABLED:
+        SERIALIZATION_DURATION.observe(seconds, query_scope.get() or 'unscoped')
+
+
+def observe_request(route, method, status, seconds, nbytes=None):
+    if not METRICS_ENABLED:
+        return
+    REQUEST_DURATION.observe(seconds, route, method, str(status))
+    if nbytes is not None:
+        RESPONSE_BYTES.observe(nbytes, route)
+
+
+def driver_pool_metrics(driver, kind):
+    """Neo4j 드라이버 연결 풀 사용률 게이지 (kind: sync/async)
+
+    드라이버 내부 구조(_pool.connections, connection.in_use)를 읽으므로
+    드라이버 버전에 따라 없으면 빈 목록을 반환한다.
+    """
+    pool = getattr(driver, '_pool', None) if driver else None
+    if pool is None:
+        return []
+    in_use = idle = 0
+    for connections in list(getattr(pool, 'connections', {}).values()):
+        for connection in list(connections):
+            if getattr(connection, 'in_use', False):
+                in_use += 1
+            else:
+                idle += 1
+    families = [('graph_api_neo4j_pool_connections', 'gauge',
+                 'Neo4j driver pool connections by state', ('driver', 'state'),
+                 [((kind, 'in_use'), in_use), ((kind, 'idle'), idle)])]
+    max_size = getattr(getattr(pool, 'pool_config', None), 'max_connection_pool_size', None)
+    if max_size is not None:
+        families.append(('graph_api_neo4j_pool_max_connections', 'gauge',
+                         'Neo4j driver pool size limit per server', ('driver',), [((kind,), max_size)]))
+    return families
+
+
+def render():
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    # 같은 이름의 게이지(예: sync/async 드라이버 풀)는 한 패밀리로 합쳐 출력
+    families = {}
+    for collector in _collectors:
+        try:
+            collected = collector()
+        except Exception as e:
+            print(f"Warning: metrics collector failed: {e}")
+            continue
+        for name, metric_type, help_text, label_names, samples in collected:
+            family = families.setdefault(name, (metric_type, help_text, label_names, []))
+            family[3].extend(samples)
+    for name, (metric_type, help_text, label_names, samples) in families.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            lines.append(f"{name}{_format_labels(label_names, labels)} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    """Flask 훅 - 압축 훅보다 먼저 등록해야 after_request에서 최종 응답 크기/상태를 본다"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not METRICS_ENABLED:
+            return
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+
+    @staticmethod
+    def before_request():
+        g.metrics_started = time.perf_counter()
+        g.metrics_scope_token = query_scope.set(request.endpoint or 'unmatched')
+
+    @staticmethod
+    def after_request(response):
+        started = g.pop('metrics_started', None)
+        token = g.pop('metrics_scope_token', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            nbytes = None if response.is_streamed else response.calculate_content_length()
+            observe_request(route, request.method, response.status_code,
+                            time.perf_counter() - started, nbytes)
+        if token is not None:
+            query_scope.reset(token)
+        return response
@@ -0,0 +1,230 @@
+"""
+그래프 경로 탐색 (/api/path)
+
+graph_snapshot의 관계 타입별 CSR 인접 배열 위에서 두 노드 사이 경로를 찾는다.
+- 최단 경로 1개 (홉 기준): 양방향 BFS - 양쪽 프론티어 중 작은 쪽을 한 단계씩 넓힌다
+- k개 경로 / 금액 가중치: Yen k-최단 경로 (spur 경로는 홉 수 제한 Dijkstra로 계산)
+
+모든 탐색은 관계 타입 허용 목록, 방향(out / in / both), 최대 홉 수 안에서만 진행한다.
+
+금액 가중치 (weighted=True):
+ALLOCATES / ALLOCATES_TO / CONTRIBUTES_TO 관계의 amount를 시작 노드에서 나가는 같은 타입 관계
+amount 합계 대비 비율(share)로 바꿔 한 단계 비용을 1 + ln(1 / share)로 둔다.
+가중치 없는 관계는 비용 1(한 홉)이므로 비용 합이 작을수록 홉이 적고 배부/기여 비중이 큰 흐름을 따른다.
+amount가 0인 관계는 흐름이 없으므로 가중치 탐색에서 지나가지 않는다.
+
+경로는 (비용, 노드 튜플, 단계 튜플)이며 단계는 (관계 타입, 엣지 인덱스)이다.
+"""
+
+import math
+import heapq
+import weakref
+from itertools import count
+
+# 관계 타입 → 가중치 속성
+PATH_WEIGHT_PROPERTIES = {
+    'ALLOCATES': 'amount',
+    'ALLOCATES_TO': 'amount',
+    'CONTRIBUTES_TO': 'amount'
+}
+
+_REVERSE_DIRECTION = {'out': 'in', 'in': 'out', 'both': 'both'}
+
+
+def step_cost(amount, total):
+    """관계 한 단계 비용 - 가중치 값이 없으면 1, 흐름이 0이면 None (통과 불가)"""
+    if amount is None or not total:
+        return 1.0
+    amount = abs(amount)
+    if amount == 0:
+        return None
+    return 1.0 + math.log(total / amount)
+
+
+class PathIndex:
+    """스냅샷 하나에 대한 경로 탐색 (가중치 타입별 시작 노드 합계는 처음 쓸 때 계산해 보관)"""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._outflow = {}
+
+    def rel_types(self, allowed=None):
+        types = sorted(self.snapshot.relationships)
+        return types if allowed is None else [t for t in types if t in allowed]
+
+    def _totals(self, rel_type, column):
+        totals = self._outflow.get(rel_type)
+        if totals is None:
+            src = self.snapshot.relationships[rel_type].src
+            totals = [0.0] * self.snapshot.node_count
+            for edge, amount in enumerate(column):
+                if isinstance(amount, (int, float)):
+                    totals[src[edge]] += abs(amount)
+            self._outflow[rel_type] = totals
+        return totals
+
+    def cost(self, rel_type, edge, weighted=True):
+        prop = PATH_WEIGHT_PROPERTIES.get(rel_type) if weighted else None
+        if prop is None:
+            return 1.0
+        table = self.snapshot.relationships[rel_type]
+        column = table.columns.get(prop)
+        if column is None:
+            return 1.0
+        amount = column[edge]
+        if not isinstance(amount, (int, float)):
+            return 1.0
+        return step_cost(amount, self._totals(rel_type, column)[table.src[edge]])
+
+    def neighbors(self, n, rel_types, direction):
+        """(관계 타입, 엣지, 반대편 노드)"""
+        directions = ('out', 'in') if direction == 'both' else (direction,)
+        for rel_type in rel_types:
+            for rel_direction in directions:
+                for edge, other in self.snapshot.edges(n, rel_type, rel_direction):
+                    yield rel_type, edge, other
+
+    # ---------- 최단 경로 (홉) ----------
+
+    def shortest_path(self, source, target, rel_types, direction='both', max_hops=6):
+        """양방향 BFS → (홉 수, 노드 튜플, 단계 튜플) 또는 None"""
+        if source == target:
+            return 0.0, (source,), ()
+        # 노드 → (한 단계 가까운 쪽 노드, 관계 타입, 엣지) - 0: source 쪽, 1: target 쪽
+        parents = ({source: None}, {target: None})
+        frontiers = [[source], [target]]
+        directions = (direction, _REVERSE_DIRECTION[direction])
+        hops = 0
+        while frontiers[0] and frontiers[1] and hops < max_hops:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            mine, theirs = parents[side], parents[1 - side]
+            next_frontier = []
+            meet = None
+            for n in frontiers[side]:
+                for rel_type, edge, m in self.neighbors(n, rel_types, directions[side]):
+                    if m in mine:
+                        continue
+                    mine[m] = (n, rel_type, edge)
+                    next_frontier.append(m)
+                    if m in theirs:
+                        meet = m
+                        break
+                if meet is not None:
+                    break
+            hops += 1
+            if meet is not None:
+                nodes, steps = self._join(parents, meet)
+                return float(len(steps)), nodes, steps
+            frontiers[side] = next_frontier
+        return None
+
+    @staticmethod
+    def _join(parents, meet):
+        nodes, steps = [meet], []
+        n = meet
+        while parents[0][n] is not None:
+            n, rel_type, edge = parents[0][n]
+            nodes.append(n)
+            steps.append((rel_type, edge))
+        nodes.reverse()
+        steps.reverse()
+        n = meet
+        while parents[1][n] is not None:
+            n, rel_type, edge = parents[1][n]
+            nodes.append(n)
+            steps.append((rel_type, edge))
+        return tuple(nodes), tuple(steps)
+
+    # ---------- k-최단 경로 ----------
+
+    def cheapest_path(self, source, target, rel_types, direction='both', max_hops=6, weighted=False,
+                      blocked_nodes=frozenset(), blocked_steps=frozenset()):
+        """홉 수 제한 Dijkstra ((노드, 홉) 상태) → (비용, 노드 튜플, 단계 튜플) 또는 None
+
+        비용이 단계마다 1 이상이므로 같은 노드를 더 많은 홉으로 다시 꺼내면 이미 꺼낸 상태에 지배된다.
+        """
+        tie = count()
+        heap = [(0.0, 0, next(tie), source)]
+        best = {(source, 0): 0.0}
+        parents = {(source, 0): None}
+        settled = {}  # 노드 → 꺼낸 최소 홉 수
+        while heap:
+            cost, hops, _, n = heapq.heappop(heap)
+            if n == target:
+                nodes, steps = [n], []
+                state = (n, hops)
+                while parents[state] is not None:
+                    state, rel_type, edge = parents[state]
+                    nodes.append(state[0])
+                    steps.append((rel_type, edge))
+                return cost, tuple(reversed(nodes)), tuple(reversed(steps))
+            if settled.get(n, max_hops + 1) <= hops:
+                continue
+            settled[n] = hops
+            if hops >= max_hops:
+                continue
+            for rel_type, edge, m in self.neighbors(n, rel_types, direction):
+                if m in blocked_nodes or (rel_type, edge) in blocked_steps:
+                    continue
+                if settled.get(m, max_hops + 1) <= hops + 1:
+                    continue
+                step = self.cost(rel_type, edge, weighted)
+                if step is None:
+                    continue
+                state = (m, hops + 1)
+                if cost + step < best.get(state, math.inf):
+                    best[state] = cost + step
+                    parents[state] = ((n, hops), rel_type, edge)
+                    heapq.heappush(heap, (cost + step, hops + 1, next(tie), m))
+        return None
+
+    def k_shortest_paths(self, source, target, rel_types, k=3, direction='both', max_hops=6, weighted=False):
+        """Yen k-최단 단순 경로 (비용 오름차순, 같은 비용은 홉 수 순)"""
+        first = self.cheapest_path(source, target, rel_types, direction, max_hops, weighted)
+        if first is None:
+            return []
+        paths = [first]
+        candidates = []
+        seen = {first[2]}
+        tie = count()
+        while len(paths) < k:
+            _, last_nodes, last_steps = paths[-1]
+            root_cost = 0.0
+            for i in range(len(last_steps)):
+                root_nodes, root_steps = last_nodes[:i + 1], last_steps[:i]
+                blocked_steps = {steps[i] for _, nodes, steps in paths
+                                 if len(steps) > i and steps[:i] == root_steps and nodes[:i + 1] == root_nodes}
+                spur = self.cheapest_path(root_nodes[-1], target, rel_types, direction, max_hops - i, weighted,
+                                          frozenset(root_nodes[:-1]), blocked_steps)
+                if spur is not None:
+                    spur_cost, spur_nodes, spur_steps = spur
+                    steps = root_steps + spur_steps
+                    if steps not in seen:
+                        seen.add(steps)
+                        heapq.heappush(candidates, (root_cost + spur_cost, len(steps), next(tie),
+                                                    root_nodes[:-1] + spur_nodes, steps))
+                root_cost += self.cost(*last_steps[i], weighted)
+            if not candidates:
+                break
+            cost, _, _, nodes, steps = heapq.heappop(candidates)
+            paths.append((cost, nodes, steps))
+        return paths
+
+    def find_paths(self, source, target, rel_types=None, direction='both', max_hops=6, k=1, weighted=False):
+        """→ (알고리즘 이름, 경로 리스트) - 홉 기준 최단 1개는 양방향 BFS, 나머지는 Yen"""
+        types = self.rel_types(rel_types)
+        if k == 1 and not weighted:
+            path = self.shortest_path(source, target, types, direction, max_hops)
+            return 'bidirectional_bfs', [path] if path is not None else []
+        return 'yen_k_shortest', self.k_shortest_paths(source, target, types, k, direction, max_hops, weighted)
+
+
+# 스냅샷별 인덱스 (스냅샷이 교체되면 함께 사라짐)
+_indexes = weakref.WeakKeyDictionary()
+
+
+def path_index(snapshot):
+    index = _indexes.get(snapshot)
+    if index is None:
+        index = _indexes[snapshot] = PathIndex(snapshot)
+    return index
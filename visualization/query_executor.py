@@ -0,0 +1,324 @@
+"""
+병렬 쿼리 실행기 (Fan-out Executor)
+
+하나의 API 요청 안에서 서로 독립적인 Cypher 쿼리들을
+제한된 스레드 풀에서 각자 별도의 드라이버 세션으로 동시에 실행한다.
+요청 전체 지연은 쿼리 합계가 아니라 가장 느린 쿼리 시간으로 줄어든다.
+
+환경 변수:
+    QUERY_POOL_WORKERS    동시 실행 스레드 수 (기본 8)
+    QUERY_TIMEOUT_SEC     쿼리별 타임아웃 (기본 30초, 서버 트랜잭션 타임아웃으로도 전달)
+    REQUEST_DEADLINE_SEC  요청 전체 마감 시간 (기본 60초)
+
+AsyncQueryFanOut은 같은 쿼리 명세를 neo4j AsyncDriver 위에서 asyncio로 실행한다 (ASGI 서버용).
+run_plan / run_plan_async는 쿼리 계획 제너레이터를 각 실행기로 구동한다.
+
+모든 쿼리는 읽기 세션의 관리형 트랜잭션(execute_read)으로 실행되어 읽기 복제본으로 라우팅되고,
+일시적 오류 시 드라이버가 재시도한다.
+실행 시간/행 수는 metrics로 집계되고, QUERY_PROFILE_ENABLED=1 이면 느린 쿼리는
+query_profiler에 PROFILE 계획과 함께 기록된다.
+"""
+
+import os
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from neo4j import unit_of_work
+
+from driver_config import read_session_config
+from metrics import observe_query, query_name, row_count, QUERIES_IN_FLIGHT
+from query_profiler import slow_query_log, profile_query
+
+
+class QueryDeadlineExceeded(TimeoutError):
+    """쿼리 타임아웃 또는 요청 마감 시간 초과"""
+
+
+def fetch_records(result):
+    """기본 결과 변환 - Node/Relationship 객체를 유지한 Record 리스트"""
+    return list(result)
+
+
+def fetch_single(result):
+    return result.single()
+
+
+def fetch_data(result):
+    return result.data()
+
+
+async def afetch_records(result):
+    return [record async for record in result]
+
+
+async def afetch_single(result):
+    return await result.single()
+
+
+async def afetch_data(result):
+    return await result.data()
+
+
+# 동기 fetch 함수 → 비동기 대응 함수 (같은 쿼리 명세를 두 실행기에서 공유)
+ASYNC_FETCH = {
+    fetch_records: afetch_records,
+    fetch_single: afetch_single,
+    fetch_data: afetch_data
+}
+
+
+def read_transaction(session, query, params, fetch=fetch_records, timeout=None, name=None):
+    """관리형 읽기 트랜잭션 - 결과는 트랜잭션 안에서 fetch로 모두 읽는다
+
+    name: 지표용 쿼리 이름 (쿼리 계획의 키, 없으면 라우트 이름으로만 집계)
+    """
+    @unit_of_work(timeout=timeout)
+    def work(tx):
+        return fetch(tx.run(query, params or {}))
+    started = time.perf_counter()
+    QUERIES_IN_FLIGHT.add(amount=1)
+    try:
+        value = session.execute_read(work)
+    except Exception as e:
+        elapsed = time.perf_counter() - started
+        observe_query(name, elapsed, error=True)
+        if slow_query_log.is_slow(elapsed):
+            slow_query_log.record(query_name(name), query, params, elapsed, error=str(e))
+        raise
+    finally:
+        QUERIES_IN_FLIGHT.add(amount=-1)
+    elapsed = time.perf_counter() - started
+    rows = row_count(value)
+    observe_query(name, elapsed, rows)
+    if slow_query_log.is_slow(elapsed):
+        _record_slow_query(session, name, query, params, timeout, elapsed, rows)
+    return value
+
+
+def _record_slow_query(session, name, query, params, timeout, elapsed, rows):
+    """느린 쿼리 기록 - 쿨다운이 지났으면 같은 세션에서 PROFILE로 재실행해 계획을 함께 남긴다"""
+    label = query_name(name)
+    profile = error = None
+    if slow_query_log.should_profile(label):
+        @unit_of_work(timeout=timeout)
+        def work(tx):
+            return tx.run(profile_query(query), params or {}).consume().profile
+        try:
+            profile = session.execute_read(work)
+        except Exception as e:
+            error = f"PROFILE failed: {e}"
+    slow_query_log.record(label, query, params, elapsed, rows, profile, error)
+
+
+async def async_read_transaction(session, query, params, fetch=fetch_records, timeout=None, name=None):
+    """read_transaction의 AsyncSession 버전"""
+    @unit_of_work(timeout=timeout)
+    async def work(tx):
+        return await ASYNC_FETCH.get(fetch, fetch)(await tx.run(query, params or {}))
+    started = time.perf_counter()
+    QUERIES_IN_FLIGHT.add(amount=1)
+    try:
+        value = await session.execute_read(work)
+    except BaseException as e:
+        # 취소(마감 시간 초과)도 실패로 집계
+        elapsed = time.perf_counter() - started
+        observe_query(name, elapsed, error=True)
+        if slow_query_log.is_slow(elapsed):
+            slow_query_log.record(query_name(name), query, params, elapsed, error=repr(e))
+        raise
+    finally:
+        QUERIES_IN_FLIGHT.add(amount=-1)
+    elapsed = time.perf_counter() - started
+    rows = row_count(value)
+    observe_query(name, elapsed, rows)
+    if slow_query_log.is_slow(elapsed):
+        await _async_record_slow_query(session, name, query, params, timeout, elapsed, rows)
+    return value
+
+
+async def _async_record_slow_query(session, name, query, params, timeout, elapsed, rows):
+    """_record_slow_query의 AsyncSession 버전"""
+    label = query_name(name)
+    profile = error = None
+    if slow_query_log.should_profile(label):
+        @unit_of_work(timeout=timeout)
+        async def work(tx):
+            result = await tx.run(profile_query(query), params or {})
+            return (await result.consume()).profile
+        try:
+            profile = await session.execute_read(work)
+        except Exception as e:
+            error = f"PROFILE failed: {e}"
+    slow_query_log.record(label, query, params, elapsed, rows, profile, error)
+
+
+class BufferedResult:
+    """트랜잭션 안에서 모두 읽어 둔 결과 - Result의 반복 / data() / single()만 제공"""
+
+    def __init__(self, records):
+        self._records = records
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def data(self):
+        return [record.data() for record in self._records]
+
+    def single(self):
+        return self._records[0] if self._records else None
+
+
+class ReadSession:
+    """session.run()을 관리형 읽기 트랜잭션으로 실행하는 세션 래퍼 (라우트용)"""
+
+    def __init__(self, session, timeout=None):
+        self._session = session
+        self.timeout = timeout
+
+    def run(self, query, parameters=None, **kwargs):
+        params = dict(parameters or {}, **kwargs)
+        return BufferedResult(read_transaction(self._session, query, params, fetch_records, self.timeout))
+
+    def close(self):
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class QueryFanOut:
+    def __init__(self, max_workers=None, query_timeout=None, request_deadline=None):
+        self.max_workers = max_workers or int(os.getenv('QUERY_POOL_WORKERS', '8'))
+        self.query_timeout = query_timeout or float(os.getenv('QUERY_TIMEOUT_SEC', '30'))
+        self.request_deadline = request_deadline or float(os.getenv('REQUEST_DEADLINE_SEC', '60'))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                        thread_name_prefix='neo4j-fanout')
+
+    def _run_one(self, driver, name, query, params, fetch):
+        with driver.session(**read_session_config()) as session:
+            return read_transaction(session, query, params, fetch, self.query_timeout, name)
+
+    def run(self, driver, queries, deadline=None):
+        """독립 쿼리 묶음을 병렬 실행
+
+        queries: {name: (query, params)} 또는 {name: (query, params, fetch)}
+        deadline: 이 묶음에 쓸 수 있는 남은 초 (run_plan이 요청 전체 마감까지 남은 시간을 넘김)
+        반환: {name: fetch(result)} - fetch 기본값은 Record 리스트
+        """
+        deadline_at = time.monotonic() + (deadline or self.request_deadline)
+        futures = {}
+        for name, spec in queries.items():
+            query, params = spec[0], spec[1]
+            fetch = spec[2] if len(spec) > 2 else fetch_records
+            # 요청 컨텍스트(지표용 라우트 이름)를 작업 스레드로 전달
+            context = contextvars.copy_context()
+            futures[name] = self._pool.submit(context.run, self._run_one, driver, name, query, params, fetch)
+
+        results = {}
+        try:
+            for name, future in futures.items():
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    raise QueryDeadlineExceeded(f"Request deadline exceeded before '{name}' finished")
+                try:
+                    # 서버 측 타임아웃 외에 네트워크 지연 등을 고려한 클라이언트 측 대기 한도
+                    results[name] = future.result(timeout=min(remaining, self.query_timeout + 1))
+                except FutureTimeoutError:
+                    raise QueryDeadlineExceeded(f"Query '{name}' timed out")
+        except Exception:
+            for future in futures.values():
+                future.cancel()
+            raise
+        return results
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class AsyncQueryFanOut:
+    """QueryFanOut과 같은 {name: (query, params[, fetch])} 명세를 AsyncDriver 세션으로 동시 실행"""
+
+    def __init__(self, query_timeout=None, request_deadline=None):
+        self.query_timeout = query_timeout or float(os.getenv('QUERY_TIMEOUT_SEC', '30'))
+        self.request_deadline = request_deadline or float(os.getenv('REQUEST_DEADLINE_SEC', '60'))
+
+    async def _run_one(self, driver, name, query, params, fetch):
+        async def execute():
+            async with driver.session(**read_session_config()) as session:
+                return await async_read_transaction(session, query, params, fetch, self.query_timeout, name)
+        try:
+            return await asyncio.wait_for(execute(), timeout=self.query_timeout + 1)
+        except asyncio.TimeoutError:
+            raise QueryDeadlineExceeded(f"Query '{name}' timed out")
+
+    async def run(self, driver, queries, deadline=None):
+        names = list(queries)
+        tasks = []
+        for name in names:
+            spec = queries[name]
+            fetch = spec[2] if len(spec) > 2 else fetch_records
+            tasks.append(asyncio.ensure_future(self._run_one(driver, name, spec[0], spec[1], fetch)))
+        try:
+            results = await asyncio.wait_for(asyncio.gather(*tasks), timeout=deadline or self.request_deadline)
+        except asyncio.TimeoutError:
+            raise QueryDeadlineExceeded('Request deadline exceeded')
+        finally:
+            for task in tasks:
+                task.cancel()
+        return dict(zip(names, results))
+
+
+def _plan_deadline(fanout, deadline):
+    return time.monotonic() + (deadline or fanout.request_deadline)
+
+
+def _remaining(deadline_at):
+    """요청 마감까지 남은 초 - 이미 지났으면 QueryDeadlineExceeded"""
+    remaining = deadline_at - time.monotonic()
+    if remaining <= 0:
+        raise QueryDeadlineExceeded('Request deadline exceeded')
+    return remaining
+
+
+def run_plan(fanout, driver, plan, deadline=None):
+    """쿼리 계획 제너레이터 실행
+
+    plan은 {name: (query, params[, fetch])}를 yield하고 결과 dict를 받아
+    다음 단계를 진행하며, 최종 응답 본문을 return한다.
+    실행 중 발생한 예외는 plan 안으로 다시 던져 계획이 직접 처리할 수 있게 한다.
+    마감 시간(기본 REQUEST_DEADLINE_SEC)은 계획 전체에 한 번 정하고, 단계마다 남은 시간만 넘긴다.
+    """
+    deadline_at = _plan_deadline(fanout, deadline)
+    try:
+        queries = next(plan)
+        while True:
+            try:
+                results = fanout.run(driver, queries, deadline=_remaining(deadline_at)) if queries else {}
+            except Exception as e:
+                queries = plan.throw(e)
+            else:
+                queries = plan.send(results)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def run_plan_async(fanout, driver, plan, deadline=None):
+    """run_plan의 asyncio 버전 (AsyncQueryFanOut + AsyncDriver)"""
+    deadline_at = _plan_deadline(fanout, deadline)
+    try:
+        queries = next(plan)
+        while True:
+            try:
+                results = (await fanout.run(driver, queries, deadline=_remaining(deadline_at))
+                           if queries else {})
+            except Exception as e:
+                queries = plan.throw(e)
+            else:
+                queries = plan.send(results)
+    except StopIteration as stop:
+        return stop.value
@@ -0,0 +1,189 @@
+"""
+느린 쿼리 프로파일링 (opt-in)
+
+QUERY_PROFILE_ENABLED=1 이면 API 세션으로 실행되는 모든 읽기 쿼리(read_transaction)의
+실행 시간을 확인하고, 임계값을 넘은 쿼리는 같은 세션에서 PROFILE로 한 번 더 실행해
+연산자 트리(연산자, db hits, 행 수, 상세)와 전체 db hits, CartesianProduct 연산자 수를 남긴다.
+기록에는 쿼리 이름("라우트 엔드포인트:계획 쿼리 이름"), 파라미터, 실행 시간이 함께 들어간다.
+
+- 회전 JSONL 로그 파일 (한 줄에 한 건)
+- 최근 기록은 메모리에 보관해 /api/_debug/slow-queries 로 조회
+
+PROFILE 재실행은 해당 요청의 응답 시간을 늘리므로 같은 쿼리 이름은 QUERY_PROFILE_COOLDOWN 동안
+한 번만 프로파일링한다 (그 사이 느린 실행은 파라미터/시간만 기록). 실패한 느린 쿼리(타임아웃 등)는
+PROFILE 없이 오류와 함께 기록한다.
+
+환경 변수:
+    QUERY_PROFILE_ENABLED        1/0 (기본 0)
+    QUERY_PROFILE_THRESHOLD_MS   느린 쿼리 기준 밀리초 (기본 500)
+    QUERY_PROFILE_COOLDOWN       같은 쿼리 이름 PROFILE 재실행 간격 초 (기본 60)
+    QUERY_PROFILE_LOG            JSONL 로그 경로 (기본 <repo>/logs/slow_queries.jsonl, 빈 값이면 파일 기록 안 함)
+    QUERY_PROFILE_LOG_MAX_BYTES  로그 파일 회전 크기 (기본 5MB)
+    QUERY_PROFILE_LOG_BACKUPS    보관할 회전 파일 수 (기본 3)
+    QUERY_PROFILE_KEEP           메모리에 보관할 최근 기록 수 (기본 200)
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+DEFAULT_PROFILE_LOG = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs', 'slow_queries.jsonl')
+
+# 로그에 남길 파라미터 리스트 최대 길이 (id 목록 등은 앞부분과 길이만)
+_PARAM_LIST_LIMIT = 20
+
+
+def profile_query(query):
+    return 'PROFILE ' + query.lstrip()
+
+
+def summarize_params(params):
+    summary = {}
+    for key, value in (params or {}).items():
+        if isinstance(value, (list, tuple)) and len(value) > _PARAM_LIST_LIMIT:
+            summary[key] = {'head': list(value[:_PARAM_LIST_LIMIT]), 'length': len(value)}
+        else:
+            summary[key] = value
+    return summary
+
+
+def plan_tree(profile):
+    """ResultSummary.profile dict → (연산자 트리, 전체 db hits, CartesianProduct 수)"""
+    if not profile:
+        return None, 0, 0
+    args = profile.get('args') or {}
+    operator = (profile.get('operatorType') or '').split('@')[0]
+    children = []
+    db_hits = profile.get('dbHits') or 0
+    cartesian = 1 if operator == 'CartesianProduct' else 0
+    for child in profile.get('children') or []:
+        tree, child_hits, child_cartesian = plan_tree(child)
+        children.append(tree)
+        db_hits += child_hits
+        cartesian += child_cartesian
+    node = {
+        'operator': operator,
+        'db_hits': profile.get('dbHits'),
+        'rows': profile.get('rows'),
+        'estimated_rows': args.get('EstimatedRows'),
+        'details': args.get('Details'),
+        'identifiers': profile.get('identifiers'),
+        'children': children
+    }
+    return node, db_hits, cartesian
+
+
+class SlowQueryLog:
+    def __init__(self, enabled=None, threshold_ms=None, cooldown=None, path=None):
+        self.enabled = (os.getenv('QUERY_PROFILE_ENABLED', '0') in ('1', 'true', 'True')
+                        if enabled is None else enabled)
+        self.threshold = (threshold_ms if threshold_ms is not None
+                          else float(os.getenv('QUERY_PROFILE_THRESHOLD_MS', '500'))) / 1000.0
+        self.cooldown = cooldown if cooldown is not None else float(os.getenv('QUERY_PROFILE_COOLDOWN', '60'))
+        self.path = path if path is not None else os.getenv('QUERY_PROFILE_LOG', DEFAULT_PROFILE_LOG)
+        self.entries = deque(maxlen=int(os.getenv('QUERY_PROFILE_KEEP', '200')))
+        self.slow_count = 0
+        self.profiled_count = 0
+        self._profiled_at = {}
+        self._lock = threading.Lock()
+        self._logger = None
+
+    def is_slow(self, seconds):
+        return self.enabled and seconds >= self.threshold
+
+    def should_profile(self, name):
+        """쿼리 이름별 쿨다운 - True면 이번 실행을 PROFILE로 재실행"""
+        now = time.monotonic()
+        with self._lock:
+            last = self._profiled_at.get(name)
+            if last is not None and now - last < self.cooldown:
+                return False
+            self._profiled_at[name] = now
+            return True
+
+    def _file_logger(self):
+        if self._logger is None and self.path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                handler = RotatingFileHandler(
+                    self.path, maxBytes=int(os.getenv('QUERY_PROFILE_LOG_MAX_BYTES', str(5 * 1024 * 1024))),
+                    backupCount=int(os.getenv('QUERY_PROFILE_LOG_BACKUPS', '3')), encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger = logging.getLogger('graph_api.slow_queries')
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                logger.addHandler(handler)
+                self._logger = logger
+            except OSError as e:
+                print(f"Warning: slow query log {self.path} unavailable: {e}")
+                self.path = None
+        return self._logger
+
+    def record(self, name, query, params, seconds, rows=None, profile=None, error=None):
+        tree, db_hits, cartesian = plan_tree(profile)
+        entry = {
+            'at': time.time(),
+            'name': name,
+            'duration_ms': round(seconds * 1000, 1),
+            'rows': rows,
+            'params': summarize_params(params),
+            'query': query.strip(),
+            'profiled': profile is not None,
+            'db_hits': db_hits if profile is not None else None,
+            'cartesian_products': cartesian if profile is not None else None,
+            'plan': tree,
+            'error': error
+        }
+        with self._lock:
+            self.entries.append(entry)
+            self.slow_count += 1
+            if profile is not None:
+                self.profiled_count += 1
+        logger = self._file_logger()
+        if logger is not None:
+            logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+        return entry
+
+    def recent(self, limit=50, name=None):
+        """최근 기록 (최신 순), name은 쿼리 이름 부분 문자열 필터"""
+        with self._lock:
+            entries = list(self.entries)
+        entries.reverse()
+        if name:
+            entries = [e for e in entries if name in e['name']]
+        return entries[:limit]
+
+    def by_query(self):
+        """쿼리 이름별 느린 실행 수 / 최대 시간 / 최대 db hits (최대 시간 역순)"""
+        with self._lock:
+            entries = list(self.entries)
+        summary = {}
+        for entry in entries:
+            item = summary.setdefault(entry['name'], {
+                'name': entry['name'], 'count': 0, 'max_ms': 0.0, 'max_db_hits': None,
+                'cartesian_products': None})
+            item['count'] += 1
+            item['max_ms'] = max(item['max_ms'], entry['duration_ms'])
+            if entry['db_hits'] is not None:
+                item['max_db_hits'] = max(item['max_db_hits'] or 0, entry['db_hits'])
+                item['cartesian_products'] = entry['cartesian_products']
+        return sorted(summary.values(), key=lambda item: item['max_ms'], reverse=True)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'threshold_ms': self.threshold * 1000,
+            'cooldown': self.cooldown,
+            'log': self.path,
+            'slow': self.slow_count,
+            'profiled': self.profiled_count
+        }
+
+
+# 프로세스 전역 기록 (query_executor의 읽기 트랜잭션이 사용)
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,163 @@
+"""
+읽기 전용 API 응답 캐시 (TTL + LRU)
+
+그래프 데이터는 로더가 실행될 때만 바뀌므로 같은 요청은 Neo4j를 거치지 않고
+메모리에서 응답한다. 캐시 키는 라우트 이름 + 경로 파라미터 + 쿼리 스트링 +
+정규화된 JSON 본문으로 구성된다.
+
+환경 변수:
+    RESPONSE_CACHE_ENABLED       1/0 (기본 1)
+    RESPONSE_CACHE_MAX_ENTRIES   최대 항목 수 (기본 512)
+    RESPONSE_CACHE_DEFAULT_TTL   기본 TTL 초 (기본 300)
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, Response, current_app, g
+
+
+class LRUCacheBackend:
+    """크기 제한 LRU 저장소 - 항목별 만료 시각을 함께 보관"""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, prefix=None):
+        with self._lock:
+            if prefix is None:
+                count = len(self._data)
+                self._data.clear()
+                return count
+            keys = [k for k in self._data if k[0] == prefix]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ResponseCache:
+    def __init__(self, backend=None, enabled=None, default_ttl=None):
+        if enabled is None:
+            enabled = os.getenv('RESPONSE_CACHE_ENABLED', '1') not in ('0', 'false', 'False')
+        self.enabled = enabled
+        self.default_ttl = default_ttl or float(os.getenv('RESPONSE_CACHE_DEFAULT_TTL', '300'))
+        self.backend = backend or LRUCacheBackend(int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '512')))
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+
+    def set_backend(self, backend):
+        """다른 저장소(예: 공유 캐시)로 교체"""
+        self.backend = backend
+
+    @staticmethod
+    def build_key(endpoint, view_args, query_items, payload=None):
+        """라우트 + 경로 파라미터 + 쿼리 인자 + 정규화된 JSON 본문 (프레임워크 비의존)"""
+        body = ''
+        if payload is not None:
+            body = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return (endpoint, tuple(sorted((view_args or {}).items())), tuple(sorted(query_items)), body)
+
+    @classmethod
+    def make_key(cls, endpoint):
+        """현재 Flask 요청의 캐시 키"""
+        payload = request.get_json(silent=True) if request.method != 'GET' else None
+        return cls.build_key(endpoint, request.view_args, request.args.items(multi=True), payload)
+
+    @staticmethod
+    def skip():
+        """현재 요청의 응답을 캐시하지 않음 (DB 오류 시 빈 응답 등)"""
+        g.response_cache_skip = True
+
+    def _count(self, counter, endpoint):
+        with self._lock:
+            counter[endpoint] = counter.get(endpoint, 0) + 1
+
+    def lookup(self, endpoint, key):
+        """저장된 (body, status, mimetype) 또는 None - 히트/미스 집계 포함"""
+        entry = self.backend.get(key)
+        self._count(self.hits if entry is not None else self.misses, endpoint)
+        return entry
+
+    def store(self, key, body, status, mimetype, ttl=None):
+        self.backend.set(key, (body, status, mimetype), ttl or self.default_ttl)
+
+    def cached(self, ttl=None):
+        """라우트 데코레이터 - 200 응답만 저장"""
+        def decorator(view):
+            endpoint = view.__name__
+
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+                key = self.make_key(endpoint)
+                entry = self.lookup(endpoint, key)
+                if entry is not None:
+                    body, status, mimetype = entry
+                    response = Response(body, status=status, mimetype=mimetype)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                response = current_app.make_response(view(*args, **kwargs))
+                if (response.status_code == 200 and not response.is_streamed
+                        and not g.get('response_cache_skip')):
+                    self.store(key, response.get_data(), response.status_code, response.mimetype, ttl)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def clear(self, endpoint=None):
+        return self.backend.clear(endpoint)
+
+    def stats(self):
+        with self._lock:
+            hits = dict(self.hits)
+            misses = dict(self.misses)
+        total_hits = sum(hits.values())
+        total_misses = sum(misses.values())
+        total = total_hits + total_misses
+        return {
+            'enabled': self.enabled,
+            'entries': len(self.backend),
+            'max_entries': getattr(self.backend, 'max_entries', None),
+            'evictions': getattr(self.backend, 'evictions', 0),
+            'hits': total_hits,
+            'misses': total_misses,
+            'hit_ratio': (total_hits / total) if total else 0.0,
+            'by_route': {
+                name: {'hits': hits.get(name, 0), 'misses': misses.get(name, 0)}
+                for name in sorted(set(hits) | set(misses))
+            }
+        }
@@ -0,0 +1,344 @@
+"""
+상위 원가차이 인덱스 (Variance / 생산오더 차이 합계)
+
+/api/variances/top 과 대시보드 top_orders를 매 요청 전체 스캔 + ORDER BY abs(...) LIMIT 대신
+프로세스 메모리의 정렬 배열로 답한다.
+
+구조 (Variance, 생산오더 각각):
+- |금액| 내림차순 (-|금액|, id) 정렬 배열 - 전체 1개 + 필터 차원(제품 / 공정 / 기간) 값별 1개씩
+- 필터 조합 조회: 지정된 차원 값 배열 중 가장 짧은 것을 앞에서부터 읽으며 나머지 조건을 확인하고
+  k개를 채우면 중단 → 조회 비용은 전체 Variance 수가 아니라 k와 필터 선택도에 비례
+
+변경 확인은 FilterCatalog와 같은 방식 (TOP_VARIANCE_CHECK_INTERVAL마다 상태 쿼리).
+변경 신호는 DataVersion 마커 버전(data_version.py)이고, Variance 개수 / 마지막 id는 마커를 쓰지 않는
+쓰기를 위한 보조 신호다 (마커 없이 삭제 + 추가로 개수와 마지막 id가 그대로면 알 수 없다):
+- 마커 변경, invalidate() 후: 전체 다시 조회
+- 마커도 보조 신호도 그대로: 보관한 인덱스 그대로 사용
+- 마커 그대로, 마지막 Variance id 이후 Variance만 추가됨: 추가분이 속한 오더만 다시 조회해 해당 오더와
+  그 Variance 항목을 bisect로 교체 (오더 합계도 함께 갱신). "id > 마지막 id"는 문자열 비교이므로
+  모든 id가 "접두어 + 고정 자리 숫자"(VAR-00001) 형식일 때만 사용한다 (전체 적재 때 확인)
+- 그 외(삭제, 형식이 다른 id): 전체 다시 조회
+
+refresh_step()은 graph_api_server의 쿼리 계획 단계로 yield from 으로 사용한다.
+
+환경 변수:
+    TOP_VARIANCE_CHECK_INTERVAL   변경 확인 주기 초 (기본 60)
+"""
+
+import os
+import re
+import time
+import threading
+from bisect import bisect_left, insort
+
+from query_executor import fetch_single, fetch_data
+
+# 오더 단위 행 (오더 속성 + 공정 목록 + 오더의 Variance 목록) - (po, v) 행을 받아 오더별로 묶는다
+# 오더에 연결되지 않은 Variance는 po가 null인 한 행으로 모인다 (Variance 인덱스에만 들어감)
+_ORDER_ROWS = """
+WITH po, collect(v {.id, .cost_element, .variance_type, .variance_amount, .variance_percent, .severity,
+                    element_id: elementId(v)}) as variances
+RETURN po.id as order_no,
+       po.product_cd as product,
+       po.month as month,
+       CASE WHEN po IS NULL THEN [] ELSE [(po)-[:WORKS_AT]->(wc:WorkCenter) | wc.id] END as work_centers,
+       variances
+"""
+
+# Variance 기준으로 읽고 오더는 선택 매칭 - HAS_VARIANCE가 없는 Variance도 인덱스에 포함
+TOP_VARIANCE_FULL_QUERY = """
+MATCH (v:Variance)
+OPTIONAL MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(v)
+WITH po, v
+""" + _ORDER_ROWS
+
+# 마지막으로 본 Variance 이후 추가된 Variance - 오더가 있으면 오더의 기존 Variance까지 (합계 재계산용)
+TOP_VARIANCE_DELTA_QUERY = """
+MATCH (added:Variance)
+WHERE added.id > $after
+OPTIONAL MATCH (po:ProductionOrder)-[:HAS_VARIANCE]->(added)
+WITH po, collect(added) as added
+UNWIND CASE WHEN po IS NULL THEN added ELSE [(po)-[:HAS_VARIANCE]->(member:Variance) | member] END as v
+WITH po, v
+""" + _ORDER_ROWS
+
+# 변경 확인 - 마커 버전, 개수는 카운트 저장소, 마지막 id는 제약조건 인덱스 역순 조회로 읽는다
+TOP_VARIANCE_STATE_QUERY = """
+CALL {
+    OPTIONAL MATCH (m:DataVersion {id: 'current'})
+    RETURN m.version as data_version
+}
+CALL {
+    MATCH (v:Variance)
+    RETURN count(v) as variance_count
+}
+CALL {
+    OPTIONAL MATCH (v:Variance)
+    WHERE v.id IS NOT NULL
+    RETURN v.id as max_variance
+    ORDER BY v.id DESC
+    LIMIT 1
+}
+RETURN data_version, variance_count, max_variance
+"""
+
+_SEQUENTIAL_ID = re.compile(r'^(\D*)(\d+)$')
+
+DIMENSIONS = ('product', 'work_center', 'month')
+KINDS = ('variance', 'order')
+
+
+class RankedIndex:
+    """|금액| 내림차순 정렬 배열 - 전체 + 필터 차원 값별"""
+
+    def __init__(self, amount_key):
+        self.amount_key = amount_key
+        self.records = {}
+        self.ranked = []
+        self.by_dimension = {dimension: {} for dimension in DIMENSIONS}
+
+    def _entry(self, key, record):
+        return -abs(record.get(self.amount_key) or 0), key
+
+    @staticmethod
+    def _dimension_values(record):
+        yield 'product', {record.get('product')}
+        yield 'work_center', set(record.get('work_centers') or [])
+        yield 'month', {record.get('month')}
+
+    def load(self, records):
+        """전체 적재 - 모아서 한 번 정렬"""
+        self.records = dict(records)
+        self.ranked = []
+        self.by_dimension = {dimension: {} for dimension in DIMENSIONS}
+        for key, record in self.records.items():
+            entry = self._entry(key, record)
+            self.ranked.append(entry)
+            for dimension, values in self._dimension_values(record):
+                for value in values:
+                    if value is not None:
+                        self.by_dimension[dimension].setdefault(value, []).append(entry)
+        self.ranked.sort()
+        for lists in self.by_dimension.values():
+            for entries in lists.values():
+                entries.sort()
+
+    def add(self, key, record):
+        self.remove(key)
+        self.records[key] = record
+        entry = self._entry(key, record)
+        insort(self.ranked, entry)
+        for dimension, values in self._dimension_values(record):
+            for value in values:
+                if value is not None:
+                    insort(self.by_dimension[dimension].setdefault(value, []), entry)
+
+    def remove(self, key):
+        record = self.records.pop(key, None)
+        if record is None:
+            return
+        entry = self._entry(key, record)
+        _discard(self.ranked, entry)
+        for dimension, values in self._dimension_values(record):
+            lists = self.by_dimension[dimension]
+            for value in values:
+                entries = lists.get(value)
+                if entries is not None:
+                    _discard(entries, entry)
+                    if not entries:
+                        del lists[value]
+
+    def top(self, k, product='', work_center='', month=''):
+        filters = {'product': product, 'work_center': work_center, 'month': month}
+        active = {dimension: value for dimension, value in filters.items() if value}
+        candidates = self.ranked
+        for dimension, value in active.items():
+            entries = self.by_dimension[dimension].get(value, [])
+            if len(entries) < len(candidates):
+                candidates = entries
+        results = []
+        for _, key in candidates:
+            record = self.records[key]
+            if active.get('product') and record.get('product') != active['product']:
+                continue
+            if active.get('work_center') and active['work_center'] not in (record.get('work_centers') or []):
+                continue
+            if active.get('month') and record.get('month') != active['month']:
+                continue
+            results.append(record)
+            if len(results) >= k:
+                break
+        return results
+
+    def __len__(self):
+        return len(self.records)
+
+
+def _sequential_id_format(ids):
+    """모든 id가 같은 접두어 + 같은 자리수 숫자면 (접두어, 자리수), 아니면 None
+
+    이 형식이어야 문자열 순서가 번호 순서와 같아 "id > 마지막 id"로 추가분을 찾을 수 있다.
+    """
+    shape = None
+    for key in ids:
+        match = _SEQUENTIAL_ID.match(key) if isinstance(key, str) else None
+        if match is None:
+            return None
+        current = (match.group(1), len(match.group(2)))
+        if shape is None:
+            shape = current
+        elif current != shape:
+            return None
+    return shape
+
+
+def _discard(entries, entry):
+    position = bisect_left(entries, entry)
+    if position < len(entries) and entries[position] == entry:
+        del entries[position]
+
+
+def _order_records(row):
+    """오더 행 → (오더 항목, [(Variance id, Variance 항목)])"""
+    order_no = row['order_no']
+    dimensions = {
+        'order_no': order_no,
+        'product': row['product'],
+        'work_centers': list(row['work_centers'] or []),
+        'month': row['month']
+    }
+    variances = []
+    total = 0
+    for v in row['variances'] or []:
+        amount = v.get('variance_amount') or 0
+        total += amount
+        variances.append((v.get('id') or v.get('element_id'), {
+            'element_id': v.get('element_id'),
+            'id': v.get('id'),
+            'cost_element': v.get('cost_element'),
+            'variance_type': v.get('variance_type'),
+            'amount': v.get('variance_amount'),
+            'percent': v.get('variance_percent'),
+            'severity': v.get('severity'),
+            **dimensions
+        }))
+    order = {**dimensions, 'total_variance': total, 'variance_count': len(variances)}
+    return order, variances
+
+
+class TopVarianceIndex:
+    def __init__(self, check_interval=None):
+        self.check_interval = (check_interval if check_interval is not None
+                               else float(os.getenv('TOP_VARIANCE_CHECK_INTERVAL', '60')))
+        self.variances = RankedIndex('amount')
+        self.orders = RankedIndex('total_variance')
+        self._order_variances = {}  # 오더 → Variance 키 목록 (증분 교체용)
+        self._loaded = False
+        self._stale = False
+        self._data_version = None
+        self._variance_count = 0
+        self._max_variance = None
+        self._id_format = None      # 증분 조회 가능한 id 형식 (_sequential_id_format)
+        self._checked_at = 0.0
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self.full_loads = 0
+        self.delta_loads = 0
+
+    def invalidate(self):
+        """데이터 재적재 후 - 같은 id의 금액이 바뀌었을 수 있으므로 다음 요청에서 전체 다시 조회"""
+        self._stale = True
+        self._checked_at = 0.0
+
+    def _apply(self, rows, full):
+        # order_no가 None인 행은 오더 없는 Variance 묶음 - Variance 인덱스에만 반영
+        if full:
+            orders = {}
+            variances = {}
+            self._order_variances = {}
+            for row in rows:
+                order, items = _order_records(row)
+                variances.update(items)
+                if order['order_no'] is not None:
+                    orders[order['order_no']] = order
+                    self._order_variances[order['order_no']] = [key for key, _ in items]
+            self.orders.load(orders)
+            self.variances.load(variances)
+            self._id_format = _sequential_id_format(variances)
+            return
+        for row in rows:
+            order, items = _order_records(row)
+            if order['order_no'] is not None:
+                for key in self._order_variances.pop(order['order_no'], []):
+                    self.variances.remove(key)
+            for key, record in items:
+                self.variances.add(key, record)
+            if order['order_no'] is not None:
+                self.orders.add(order['order_no'], order)
+                self._order_variances[order['order_no']] = [key for key, _ in items]
+
+    def refresh_step(self):
+        """쿼리 계획 단계 - 필요할 때만 상태/증분/전체 쿼리를 yield하고 인덱스 반환"""
+        now = time.monotonic()
+        if self._loaded and not self._stale and now - self._checked_at < self.check_interval:
+            return self
+        try:
+            probe = (yield {'state': (TOP_VARIANCE_STATE_QUERY, None, fetch_single)})['state']
+            data_version = probe['data_version'] if probe else None
+            count = probe['variance_count'] if probe else 0
+            max_variance = probe['max_variance'] if probe else None
+            full = not self._loaded or self._stale or data_version != self._data_version
+            rows = None
+            if not full and (count, max_variance) == (self._variance_count, self._max_variance):
+                with self._lock:
+                    self._checked_at = now
+                return self
+            if (not full and self._id_format is not None and self._max_variance is not None
+                    and max_variance is not None and count > self._variance_count):
+                rows = (yield {'delta': (TOP_VARIANCE_DELTA_QUERY, {'after': self._max_variance},
+                                         fetch_data)})['delta']
+                added = {v['id'] for row in rows for v in row['variances'] or []
+                         if v.get('id') is not None and v['id'] > self._max_variance}
+                # 마지막 id 이후에, 같은 형식의 id로만 추가된 경우에만 병합 (중간 삽입/삭제는 전체 조회)
+                if (self._variance_count + len(added) != count
+                        or _sequential_id_format(added) != self._id_format):
+                    rows = None
+            if rows is None:
+                full = True
+                rows = (yield {'rows': (TOP_VARIANCE_FULL_QUERY, None, fetch_data)})['rows']
+        except Exception as e:
+            if not self._loaded:
+                raise
+            # 확인 실패 시 이전 인덱스로 응답 (다음 요청에서 다시 확인)
+            print(f"Warning: top variance index refresh failed: {e}")
+            return self
+        with self._lock:
+            self._apply(rows, full)
+            if full:
+                self.full_loads += 1
+            else:
+                self.delta_loads += 1
+            self._data_version = data_version
+            self._variance_count = count
+            self._max_variance = max_variance
+            self._loaded = True
+            self._stale = False
+            self._checked_at = now
+            self._loaded_at = time.time()
+        return self
+
+    def top(self, kind, k, product='', work_center='', month=''):
+        """kind(variance / order) 상위 k개 - |금액| 내림차순, 필터는 빈 값이면 전체"""
+        index = self.variances if kind == 'variance' else self.orders
+        with self._lock:
+            return [dict(record) for record in index.top(k, product, work_center, month)]
+
+    def stats(self):
+        return {
+            'loaded': self._loaded,
+            'loaded_at': self._loaded_at,
+            'full_loads': self.full_loads,
+            'delta_loads': self.delta_loads,
+            'variances': len(self.variances),
+            'orders': len(self.orders)
+        }